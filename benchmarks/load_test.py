@@ -0,0 +1,347 @@
+import argparse
+import http.cookiejar
+import json
+import os
+import platform
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+
+import numpy as np
+
+# Lasttest für den Koordinator: startet server.py in einer leeren Kopie des
+# server/-Ordners und simuliert N Browser-Tabs wie in static/script.js: ein kleiner
+# Vorrat an Batches, Abgabe über /submit_and_fetch ohne Pause, Live-Daten über einen
+# offenen /events-Stream, und ab und zu werden die Diagramme als PNG mit ETag geladen.
+# Ausgabe: Durchsatz und p50/p95/p99-Latenz pro Route, zusätzlich als JSON.
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SERVER_DIR = os.path.join(ROOT_DIR, "server")
+RESULTS_DIR = os.path.join(ROOT_DIR, "benchmarks", "results")
+sys.path.insert(0, os.path.join(ROOT_DIR, "worker"))
+
+sys.path.insert(0, SERVER_DIR)
+
+from prime_worker import MIMETYPE, encode_bitmap, sieve_batch  # noqa: E402
+from prime_protocol import encode_submission  # noqa: E402
+
+# Verhalten eines Browser-Tabs (siehe static/script.js)
+BATCH_QUEUE_SIZE = 2  # vorgeholte Batches
+RETRY_DELAY = 1  # in Sek, nach einer fehlgeschlagenen Anfrage
+VIEW_INTERVAL = 30  # in Sek, so oft lädt ein Tab im Schnitt die Diagramme neu
+DIAGRAM_TYPES = ["clients", "batches", "primes", "numbers", "processed_vs_primes", "batches_vs_clients"]
+REQUEST_TIMEOUT = 60  # in Sek
+STARTUP_TIMEOUT = 60  # in Sek
+SERVER_STATE = ["primes", "journal", "stats_log", "server_state.json", "stats_log.json", "users.db", "__pycache__"]
+SERVER_BOOT = "import sys, server; server.app.run(host='127.0.0.1', port=int(sys.argv[1]), threaded=True)"
+
+
+class Recorder:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = {}
+        self.errors = {}
+        self.bytes_sent = {}
+        self.batches = 0
+        self.numbers = 0
+        self.events = 0
+
+    def record(self, route, seconds, ok, sent=0):
+        with self.lock:
+            self.latencies.setdefault(route, []).append(seconds)
+            self.errors[route] = self.errors.get(route, 0) + (0 if ok else 1)
+            self.bytes_sent[route] = self.bytes_sent.get(route, 0) + sent
+
+    def batch_done(self, numbers):
+        with self.lock:
+            self.batches += 1
+            self.numbers += numbers
+
+    def event_received(self):
+        with self.lock:
+            self.events += 1
+
+    def summary(self, duration):
+        routes = {}
+        with self.lock:
+            for route, values in sorted(self.latencies.items()):
+                values = np.array(values) * 1000
+                routes[route] = {
+                    "requests": len(values),
+                    "errors": self.errors[route],
+                    "throughput": round(len(values) / duration, 2),
+                    "p50_ms": round(float(np.percentile(values, 50)), 2),
+                    "p95_ms": round(float(np.percentile(values, 95)), 2),
+                    "p99_ms": round(float(np.percentile(values, 99)), 2),
+                    "max_ms": round(float(values.max()), 2),
+                    "avg_request_bytes": round(self.bytes_sent[route] / len(values))
+                }
+            return {
+                "duration": round(duration, 2),
+                "batches": self.batches,
+                "batches_per_second": round(self.batches / duration, 2),
+                "numbers_per_second": round(self.numbers / duration),
+                "events_received": self.events,
+                "routes": routes
+            }
+
+
+class Session:
+    def __init__(self, server, recorder):
+        self.server = server
+        self.recorder = recorder
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+
+    def request(self, route, data=None, content_type="application/json", query="", etags=None, label=None):
+        # etags: gespeicherte ETags pro Route; ein 304 zählt als Erfolg und liefert b""
+        req = urllib.request.Request(self.server + route + query, data=data)
+        if data is not None:
+            req.add_header("Content-Type", content_type)
+        if etags is not None and route in etags:
+            req.add_header("If-None-Match", etags[route])
+        started = time.perf_counter()
+        try:
+            with self.opener.open(req, timeout=REQUEST_TIMEOUT) as response:
+                body = response.read()
+                if etags is not None and response.headers.get("ETag"):
+                    etags[route] = response.headers["ETag"]
+            ok = True
+        except urllib.error.HTTPError as e:
+            body, ok = (b"", True) if e.code == 304 else (None, False)
+        except (urllib.error.URLError, OSError):
+            body, ok = None, False
+        self.recorder.record(label or route, time.perf_counter() - started, ok, len(data) if data else 0)
+        return body
+
+    def stream_events(self, stop):
+        # Zeit bis zum ersten Ereignis zählt als Latenz von /events, danach nur noch die Anzahl
+        req = urllib.request.Request(self.server + "/events", headers={"Accept": "text/event-stream"})
+        started = time.perf_counter()
+        first = True
+        try:
+            with self.opener.open(req, timeout=REQUEST_TIMEOUT) as response:
+                for line in response:
+                    if not line.startswith(b"data:"):
+                        continue
+                    if first:
+                        self.recorder.record("/events", time.perf_counter() - started, True)
+                        first = False
+                    self.recorder.event_received()
+                    if stop.is_set():
+                        return
+        except (urllib.error.URLError, OSError):
+            if first:
+                self.recorder.record("/events", time.perf_counter() - started, False)
+
+    def post_json(self, route, payload):
+        return self.request(route, json.dumps(payload).encode())
+
+
+def run_client(index, server, recorder, stop, args):
+    client = Session(server, recorder)
+    if args.login:
+        credentials = {"username": f"bench_{index}", "password": "bench"}
+        client.post_json("/register", credentials)
+        client.post_json("/login", credentials)
+    if args.batch_size:
+        client.post_json("/set_batch_size", {"size": args.batch_size})
+
+    queue = []
+    while not stop.is_set():
+        if not queue:
+            if args.combined:
+                body = client.request("/get_batches", query=f"?n={BATCH_QUEUE_SIZE}")
+            else:
+                body = client.request("/get_batch")
+            if body is None:
+                stop.wait(RETRY_DELAY)
+                continue
+            body = json.loads(body)
+            queue = [batch["range"] for batch in body["batches"]] if args.combined else [body["range"]]
+        start, end = queue.pop(0)
+        start, end, count, payload, _elapsed = sieve_batch(start, end)
+
+        # Nutzdaten in der Größe, die ein echter Client schicken würde
+        if args.format == "binary":
+            data, content_type = encode_bitmap(start, end, count, payload), MIMETYPE
+        else:
+            odds = np.unpackbits(np.frombuffer(payload, dtype=np.uint8), bitorder="little")
+            primes = np.flatnonzero(odds) * 2 + (start | 1)
+            primes = np.concatenate(([2] * (start <= 2 <= end), primes[primes <= end])).astype(np.int64)
+            if args.format == "varint":
+                data, content_type = encode_submission(start, end, primes), MIMETYPE
+            else:
+                data, content_type = json.dumps({"range": [start, end], "primes": primes.tolist()}).encode(), "application/json"
+
+        # Wie im Browser: die Abgabe füllt den Vorrat wieder auf, das nächste Batch startet ohne Pause
+        if args.combined:
+            body = client.request("/submit_and_fetch", data, content_type, query=f"?n={BATCH_QUEUE_SIZE - len(queue)}")
+        else:
+            body = client.request("/submit_primes", data, content_type)
+        if body is None:
+            stop.wait(RETRY_DELAY)
+            continue
+        recorder.batch_done(end - start + 1)
+        if args.combined:
+            queue += [batch["range"] for batch in json.loads(body).get("batches", [])]
+
+
+def run_events(server, recorder, stop):
+    # Statistik, Rangliste und eigener Fortschritt kommen als Server-Sent Events statt per Abfrage
+    client = Session(server, recorder)
+    while not stop.is_set():
+        client.stream_events(stop)
+        stop.wait(RETRY_DELAY)
+
+
+def run_viewer(server, recorder, stop, clients):
+    # Diagramme lädt der Browser nur auf Knopfdruck; erneutes Laden fragt mit If-None-Match nach
+    client = Session(server, recorder)
+    etags = {}
+    while not stop.wait(VIEW_INTERVAL / clients):
+        for diagram_type in DIAGRAM_TYPES:
+            client.request(f"/diagram/{diagram_type}.png", etags=etags, label="/diagram/<type>.png")
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(port):
+    workdir = tempfile.mkdtemp(prefix="prime_bench_")
+    shutil.copytree(SERVER_DIR, workdir, dirs_exist_ok=True, ignore=shutil.ignore_patterns(*SERVER_STATE))
+    process = subprocess.Popen([sys.executable, "-c", SERVER_BOOT, str(port)], cwd=workdir,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + STARTUP_TIMEOUT
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("Server konnte nicht gestartet werden")
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/get_stats", timeout=1).close()
+            return process, workdir
+        except (urllib.error.URLError, OSError):
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError("Server antwortet nicht")
+
+
+def stop_server(process, workdir):
+    process.send_signal(signal.SIGINT)
+    try:
+        process.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        process.kill()
+    shutil.rmtree(workdir, ignore_errors=True)
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR, text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_summary(summary, baseline=None):
+    print(f"{summary['batches']} Batches in {summary['duration']} Sek "
+          f"({summary['batches_per_second']} Batches/s, {summary['numbers_per_second']:,} Zahlen/s)")
+    print(f"{'Route':<20}{'Anfragen':>10}{'Fehler':>8}{'pro Sek':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for route, r in summary["routes"].items():
+        line = (f"{route:<20}{r['requests']:>10}{r['errors']:>8}{r['throughput']:>10}"
+                f"{r['p50_ms']:>10}{r['p95_ms']:>10}{r['p99_ms']:>10}{r['max_ms']:>10}")
+        old = (baseline or {}).get("routes", {}).get(route)
+        if old and old["p95_ms"]:
+            line += f"   p95 {r['p95_ms'] / old['p95_ms']:.2f}x, Durchsatz {r['throughput'] / max(old['throughput'], 0.01):.2f}x"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Lasttest für die Koordinator-Endpunkte")
+    parser.add_argument("--clients", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=30, help="in Sek")
+    parser.add_argument("--batch-size", type=int, help="feste Batch-Größe (sonst automatisch)")
+    parser.add_argument("--format", choices=["varint", "binary", "json"], default="varint",
+                        help="varint wie der Browser, binary = Bitmap wie der Kommandozeilen-Worker")
+    parser.add_argument("--no-login", dest="login", action="store_false")
+    parser.add_argument("--separate", dest="combined", action="store_false",
+                        help="alter Ablauf /get_batch + /submit_primes statt /get_batches + /submit_and_fetch")
+    parser.add_argument("--no-events", dest="events", action="store_false", help="keine /events-Streams offen halten")
+    parser.add_argument("--server", help="laufenden Server verwenden statt einen eigenen zu starten")
+    parser.add_argument("--output", help="Pfad für die JSON-Ergebnisse")
+    parser.add_argument("--compare", help="frühere JSON-Ergebnisse zum Vergleich")
+    args = parser.parse_args()
+
+    if args.server:
+        server, process = args.server.rstrip("/"), None
+    else:
+        port = free_port()
+        process, workdir = start_server(port)
+        server = f"http://127.0.0.1:{port}"
+
+    recorder = Recorder()
+    stop = threading.Event()
+    threads = [threading.Thread(target=run_client, args=(i, server, recorder, stop, args), daemon=True)
+               for i in range(args.clients)]
+    threads.append(threading.Thread(target=run_viewer, args=(server, recorder, stop, args.clients), daemon=True))
+    # Die Streams enden erst mit dem nächsten Ereignis oder Keepalive, darauf wird nicht gewartet
+    streams = [threading.Thread(target=run_events, args=(server, recorder, stop), daemon=True)
+               for _ in range(args.clients if args.events else 0)]
+
+    started = time.perf_counter()
+    try:
+        for thread in threads + streams:
+            thread.start()
+        stop.wait(args.duration)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join(REQUEST_TIMEOUT)
+        duration = time.perf_counter() - started
+        if process:
+            stop_server(process, workdir)
+
+    summary = recorder.summary(duration)
+    result = {
+        "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "cpu_count": os.cpu_count(),
+        "parameters": {
+            "clients": args.clients,
+            "duration": args.duration,
+            "batch_size": args.batch_size or "auto",
+            "format": args.format,
+            "combined": args.combined,
+            "events": args.events,
+            "login": args.login
+        },
+        **summary
+    }
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, "r") as f:
+            baseline = json.load(f)
+    print_summary(summary, baseline)
+
+    output = args.output or os.path.join(RESULTS_DIR, f"load_{time.strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(result, f, indent=2)
+    print(f"Ergebnisse gespeichert: {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,176 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from load_test import RESULTS_DIR, SERVER_DIR, SERVER_STATE, git_revision
+
+# Kaltstart-Messung: importiert server.py in einer Kopie des server/-Ordners
+# (mit dem vorhandenen oder einem künstlich erzeugten Zustand) in einem frischen
+# Prozess und misst Startzeit, Zeit bis zur ersten Antwort und Speicherbedarf (RSS),
+# zusätzlich nach dem ersten Diagramm-Abruf.
+
+STATE_FILES = ["server_state.json", "stats_log", "stats_log.json", "journal", "primes", "users.db"]
+RUN_TIMEOUT = 300  # in Sek
+
+PROBE = r"""
+import json, os, sys, time
+started = time.perf_counter()
+
+def rss_mb():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+
+import server
+imported = time.perf_counter()
+client = server.app.test_client()
+client.get("/get_stats")
+ready = time.perf_counter()
+result = {"import_seconds": imported - started, "ready_seconds": ready - started, "rss_mb": rss_mb(),
+          "matplotlib_loaded": "matplotlib" in sys.modules}
+if sys.argv[1] == "1":
+    client.get("/diagram_live_all")
+    result["diagram_seconds"] = time.perf_counter() - ready
+    result["rss_after_diagram_mb"] = rss_mb()
+print("RESULT " + json.dumps(result), flush=True)
+os._exit(0)
+"""
+
+
+def prepare_workdir(server_dir, state_dir, history, batches):
+    workdir = tempfile.mkdtemp(prefix="prime_startup_")
+    shutil.copytree(server_dir, workdir, dirs_exist_ok=True, ignore=shutil.ignore_patterns(*SERVER_STATE))
+    if state_dir:
+        for name in STATE_FILES:
+            source = os.path.join(state_dir, name)
+            if os.path.isdir(source):
+                shutil.copytree(source, os.path.join(workdir, name))
+            elif os.path.exists(source):
+                shutil.copy2(source, workdir)
+    if history:
+        write_history(os.path.join(workdir, "stats_log"), history)
+    if batches:
+        write_batches(workdir, batches)
+    return workdir
+
+
+def write_history(directory, minutes):
+    # Minutenwerte wie aus save_stats_log, endend jetzt
+    os.makedirs(directory, exist_ok=True)
+    now = int(time.time()) // 60 * 60
+    with open(os.path.join(directory, "minute.jsonl"), "w") as f:
+        for i in range(minutes):
+            t = now - (minutes - i) * 60
+            f.write(json.dumps({
+                "timestamp": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(t)),
+                "total_primes_found": i * 4000,
+                "total_batches_completed": i * 10,
+                "total_numbers_processed": i * 100000,
+                "active_clients": i % 7
+            }) + "\n")
+
+
+def write_batches(workdir, count):
+    # Kleine Blöcke im Primzahl-Speicher, damit der Index die Größe eines lange laufenden Servers hat
+    sys.path.insert(0, workdir)
+    try:
+        from prime_store import PrimeStoreAppender
+        store = PrimeStoreAppender(os.path.join(workdir, "primes"))
+        for i in range(count):
+            store.append(i * 10, i * 10 + 9, [])
+        store.close()
+    finally:
+        sys.path.remove(workdir)
+
+
+def run_once(workdir, diagrams):
+    started = time.perf_counter()
+    output = subprocess.run([sys.executable, "-c", PROBE, "1" if diagrams else "0"], cwd=workdir, capture_output=True,
+                            text=True, timeout=RUN_TIMEOUT)
+    wall = time.perf_counter() - started
+    for line in output.stdout.splitlines():
+        if line.startswith("RESULT "):
+            result = json.loads(line[len("RESULT "):])
+            result["process_seconds"] = wall
+            return result
+    raise RuntimeError(f"Start fehlgeschlagen:\n{output.stderr[-2000:]}")
+
+
+def summarize(runs):
+    summary = {}
+    for key in runs[0]:
+        values = [run[key] for run in runs]
+        if isinstance(values[0], bool):
+            summary[key] = values[0]
+        else:
+            summary[key] = round(statistics.median(values), 4)
+    return summary
+
+
+def print_summary(summary, baseline=None):
+    for key, value in summary.items():
+        line = f"{key:<24}{value!s:>12}"
+        old = (baseline or {}).get("summary", {}).get(key)
+        if isinstance(value, (int, float)) and not isinstance(value, bool) and old:
+            line += f"   {value / old:.2f}x (vorher {old})"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Startzeit und Speicherbedarf des Servers messen")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--server-dir", default=SERVER_DIR, help="zu messender server/-Ordner")
+    parser.add_argument("--state-dir", default=SERVER_DIR, help="Zustand von hier übernehmen ('' = leerer Start)")
+    parser.add_argument("--history", type=int, default=0, help="künstliches Statistik-Log mit so vielen Minuten")
+    parser.add_argument("--batches", type=int, default=0, help="künstliche Blöcke im Primzahl-Speicher")
+    parser.add_argument("--diagrams", action="store_true", help="zusätzlich den ersten Diagramm-Abruf messen")
+    parser.add_argument("--output", help="Pfad für die JSON-Ergebnisse")
+    parser.add_argument("--compare", help="frühere JSON-Ergebnisse zum Vergleich")
+    args = parser.parse_args()
+
+    workdir = prepare_workdir(args.server_dir, args.state_dir, args.history, args.batches)
+    try:
+        # Erster Lauf wärmt Seiten-Cache und __pycache__ an und zählt nicht
+        run_once(workdir, args.diagrams)
+        runs = [run_once(workdir, args.diagrams) for _ in range(max(args.runs, 1))]
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    summary = summarize(runs)
+    result = {
+        "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "parameters": {
+            "runs": args.runs,
+            "history": args.history,
+            "batches": args.batches,
+            "state": bool(args.state_dir),
+            "diagrams": args.diagrams
+        },
+        "summary": summary,
+        "runs": runs
+    }
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, "r") as f:
+            baseline = json.load(f)
+    print_summary(summary, baseline)
+
+    output = args.output or os.path.join(RESULTS_DIR, f"startup_{time.strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(result, f, indent=2)
+    print(f"Ergebnisse gespeichert: {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,144 @@
+import heapq
+import time
+from bisect import bisect_right
+
+LEASE_TIMEOUT = 600  # in Sek
+
+
+class IntervalSet:
+    def __init__(self, intervals=None):
+        self.starts = []
+        self.ends = []
+        for start, end in intervals or []:
+            self.add(start, end)
+
+    def add(self, start, end):
+        i = bisect_right(self.starts, start)
+        # Mit linkem Nachbarn verschmelzen, falls überlappend oder angrenzend
+        if i > 0 and self.ends[i - 1] >= start - 1:
+            i -= 1
+            start = self.starts[i]
+            end = max(end, self.ends[i])
+        j = i
+        while j < len(self.starts) and self.starts[j] <= end + 1:
+            end = max(end, self.ends[j])
+            j += 1
+        self.starts[i:j] = [start]
+        self.ends[i:j] = [end]
+
+    def remove(self, start, end):
+        # Nur Bereiche, die vollständig in einem Intervall liegen; das Intervall wird bei Bedarf geteilt
+        i = bisect_right(self.starts, start) - 1
+        if i < 0 or self.ends[i] < end:
+            return False
+        pieces = [(a, b) for a, b in ((self.starts[i], start - 1), (end + 1, self.ends[i])) if a <= b]
+        self.starts[i:i + 1] = [a for a, _b in pieces]
+        self.ends[i:i + 1] = [b for _a, b in pieces]
+        return True
+
+    def contains(self, start, end):
+        i = bisect_right(self.starts, start) - 1
+        return i >= 0 and self.ends[i] >= end
+
+    def gaps(self, lo, hi):
+        gaps = []
+        current = lo
+        for start, end in zip(self.starts, self.ends):
+            if end < current:
+                continue
+            if start > hi:
+                break
+            if start > current:
+                gaps.append((current, start - 1))
+            current = end + 1
+        if current <= hi:
+            gaps.append((current, hi))
+        return gaps
+
+    def to_list(self):
+        return [[s, e] for s, e in zip(self.starts, self.ends)]
+
+    def __len__(self):
+        return len(self.starts)
+
+
+class BatchScheduler:
+    def __init__(self, next_number=0, lease_timeout=LEASE_TIMEOUT):
+        self.next_number = next_number
+        self.lease_timeout = lease_timeout
+        self.leases = {}      # start -> (end, deadline, client)
+        self.deadlines = []   # Heap aus (deadline, start)
+        self.completed = IntervalSet()
+
+    def _lease(self, start, end, client, now):
+        deadline = now + self.lease_timeout
+        self.leases[start] = (end, deadline, client)
+        heapq.heappush(self.deadlines, (deadline, start))
+
+    def _pop_expired(self, now):
+        while self.deadlines and self.deadlines[0][0] <= now:
+            deadline, start = heapq.heappop(self.deadlines)
+            lease = self.leases.get(start)
+            # Veraltete Heap-Einträge (abgeschlossen oder neu vergeben) überspringen
+            if lease is None or lease[1] != deadline:
+                continue
+            return start, lease[0]
+        return None
+
+    def acquire(self, size, client=None, now=None):
+        now = time.time() if now is None else now
+        expired = self._pop_expired(now)
+        if expired:
+            start, end = expired
+        else:
+            start = self.next_number
+            end = start + size - 1
+            self.next_number = end + 1
+        self._lease(start, end, client, now)
+        return start, end
+
+    def restore_lease(self, start, end, deadline, client=None):
+        self.leases[start] = (end, deadline, client)
+        heapq.heappush(self.deadlines, (deadline, start))
+        self.next_number = max(self.next_number, end + 1)
+
+    def complete(self, start, end):
+        lease = self.leases.get(start)
+        if lease is not None and lease[0] == end:
+            del self.leases[start]
+        if self.completed.contains(start, end):
+            return False
+        self.completed.add(start, end)
+        return True
+
+    def reopen(self, start, end):
+        # Bereich wieder freigeben, als abgelaufene Lease wird er als Nächstes vergeben. Beim Einlesen
+        # des Journals fehlt der Abschluss meist schon, dann bleibt nur die Lease.
+        # -> True, wenn der Bereich als abgeschlossen gezählt war
+        removed = self.completed.remove(start, end)
+        if removed or self.leases.get(start, (None,))[0] == end:
+            self.restore_lease(start, end, 0)
+        return removed
+
+    def is_completed(self, start, end):
+        return self.completed.contains(start, end)
+
+    def outstanding(self):
+        return len(self.leases)
+
+    def to_dict(self):
+        return {
+            "next_number": self.next_number,
+            "leases": [[start, end, deadline] for start, (end, deadline, _client) in self.leases.items()],
+            "completed": self.completed.to_list()
+        }
+
+    @classmethod
+    def from_dict(cls, data, next_number=0, lease_timeout=LEASE_TIMEOUT):
+        scheduler = cls(data.get("next_number", next_number), lease_timeout)
+        for start, end, deadline in data.get("leases", []):
+            scheduler.leases[start] = (end, deadline, None)
+            scheduler.deadlines.append((deadline, start))
+        heapq.heapify(scheduler.deadlines)
+        scheduler.completed = IntervalSet(data.get("completed", []))
+        return scheduler
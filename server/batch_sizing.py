@@ -0,0 +1,27 @@
+# Adaptive Batch-Größe: aus der gemessenen Zeit zwischen Ausgabe und Abgabe eines
+# Batches wird der Durchsatz des Clients geschätzt (EWMA) und das nächste Batch so
+# bemessen, dass es ungefähr TARGET_BATCH_SECONDS dauert.
+
+TARGET_BATCH_SECONDS = 30
+MIN_BATCH_SIZE = 100
+MAX_BATCH_SIZE = 5000000
+DEFAULT_BATCH_SIZE = 100000
+EWMA_ALPHA = 0.3
+SIZE_STEP = 100
+MAX_GROWTH = 4  # höchstens Faktor 4 pro Schritt, damit Ausreißer nicht durchschlagen
+
+
+def update_throughput(previous, numbers, elapsed, alpha=EWMA_ALPHA):
+    sample = numbers / max(elapsed, 0.001)
+    if not previous:
+        return sample
+    return alpha * sample + (1 - alpha) * previous
+
+
+def next_batch_size(throughput, previous=None, target=TARGET_BATCH_SECONDS):
+    if not throughput:
+        return DEFAULT_BATCH_SIZE
+    size = int(throughput * target) // SIZE_STEP * SIZE_STEP
+    if previous:
+        size = max(previous // MAX_GROWTH, min(previous * MAX_GROWTH, size))
+    return max(MIN_BATCH_SIZE, min(MAX_BATCH_SIZE, size))
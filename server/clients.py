@@ -0,0 +1,150 @@
+import base64
+import hashlib
+import heapq
+import math
+import time
+
+# Aktive Clients laufen über einen Heap mit Ablaufzeitpunkten ab, statt alle
+# bekannten Clients regelmäßig durchzugehen. Die Zahl verschiedener Clients
+# schätzt ein HyperLogLog mit fester Größe (4 KB, ca. 1,6 % Fehler) statt einer
+# Menge aller jemals gesehenen IP-Adressen. Beides ist nicht threadsicher und
+# wird im Server nur unter dem globalen Lock benutzt.
+
+HLL_PRECISION = 12
+WINDOWS = {"hour": "%Y-%m-%d %H", "day": "%Y-%m-%d"}
+
+
+class ActiveClients:
+    def __init__(self, timeout):
+        self.timeout = timeout
+        self.last_seen = {}
+        self.heap = []      # (Ablaufzeitpunkt, IP), höchstens ein Eintrag pro Client
+
+    def touch(self, ip, now):
+        if ip not in self.last_seen:
+            heapq.heappush(self.heap, (now + self.timeout, ip))
+        self.last_seen[ip] = now
+
+    def expire(self, now):
+        # Nur fällige Einträge ansehen; wer inzwischen wieder aktiv war, wird neu einsortiert
+        expired = 0
+        while self.heap and self.heap[0][0] < now:
+            _deadline, ip = heapq.heappop(self.heap)
+            deadline = self.last_seen[ip] + self.timeout
+            if deadline < now:
+                del self.last_seen[ip]
+                expired += 1
+            else:
+                heapq.heappush(self.heap, (deadline, ip))
+        return expired
+
+    def __len__(self):
+        return len(self.last_seen)
+
+
+class HyperLogLog:
+    def __init__(self, precision=HLL_PRECISION, registers=None):
+        self.precision = precision
+        self.m = 1 << precision
+        self.registers = bytearray(registers) if registers is not None else bytearray(self.m)
+        self.estimate = None
+
+    def position(self, value):
+        # -> (Register, Rang); verrät den Wert nicht und reicht, um ihn erneut einzutragen
+        h = int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "big")
+        index = h >> (64 - self.precision)
+        rest = h & ((1 << (64 - self.precision)) - 1)
+        return index, 64 - self.precision - rest.bit_length() + 1
+
+    def add(self, value):
+        # -> True, wenn sich die Schätzung dadurch ändern kann
+        return self.update(*self.position(value))
+
+    def update(self, index, rank):
+        if rank <= self.registers[index]:
+            return False
+        self.registers[index] = rank
+        self.estimate = None
+        return True
+
+    def count(self):
+        if self.estimate is None:
+            m = self.m
+            alpha = 0.7213 / (1 + 1.079 / m)
+            raw = alpha * m * m / sum(2.0 ** -r for r in self.registers)
+            zeros = self.registers.count(0)
+            if raw <= 2.5 * m and zeros:
+                raw = m * math.log(m / zeros)   # kleine Mengen: lineares Zählen
+            self.estimate = int(round(raw))
+        return self.estimate
+
+    def merge(self, other):
+        self.registers = bytearray(map(max, self.registers, other.registers))
+        self.estimate = None
+
+    def to_string(self):
+        return base64.b64encode(bytes(self.registers)).decode("ascii")
+
+    @classmethod
+    def from_string(cls, data, precision=HLL_PRECISION):
+        registers = base64.b64decode(data)
+        if len(registers) != 1 << precision:
+            return cls(precision)
+        return cls(precision, registers)
+
+
+class DistinctClients:
+    # Verschiedene Clients insgesamt und pro Stunde/Tag (laufendes und vorheriges Fenster)
+    def __init__(self):
+        self.total = HyperLogLog()
+        self.windows = {name: [None, HyperLogLog(), None] for name in WINDOWS}  # Schlüssel, Sketch, vorherige Anzahl
+
+    def _roll(self, now):
+        for name, fmt in WINDOWS.items():
+            key = time.strftime(fmt, time.localtime(now))
+            window = self.windows[name]
+            if window[0] != key:
+                if window[0] is not None:
+                    window[2] = window[1].count()
+                window[0], window[1] = key, HyperLogLog()
+
+    def position(self, ip):
+        # Alle Sketches haben dieselbe Größe und Hashfunktion
+        return self.total.position(ip)
+
+    def add(self, ip, now):
+        # -> True, wenn sich die Gesamtzahl ändern kann
+        return self.update(*self.position(ip), now)
+
+    def update(self, index, rank, now):
+        self._roll(now)
+        for window in self.windows.values():
+            window[1].update(index, rank)
+        return self.total.update(index, rank)
+
+    def count(self):
+        return self.total.count()
+
+    def window_counts(self, now):
+        self._roll(now)
+        return {
+            name: {"window": key, "count": sketch.count(), "previous": previous}
+            for name, (key, sketch, previous) in self.windows.items()
+        }
+
+    def to_dict(self):
+        return {
+            "total": self.total.to_string(),
+            "windows": {name: {"key": key, "sketch": sketch.to_string(), "previous": previous}
+                        for name, (key, sketch, previous) in self.windows.items()}
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        distinct = cls()
+        if data.get("total"):
+            distinct.total = HyperLogLog.from_string(data["total"])
+        for name, window in data.get("windows", {}).items():
+            if name in distinct.windows:
+                distinct.windows[name] = [window.get("key"), HyperLogLog.from_string(window["sketch"]), window.get("previous")]
+        return distinct
@@ -0,0 +1,208 @@
+import fcntl
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+
+from batch_scheduler import LEASE_TIMEOUT, IntervalSet
+from clients import HyperLogLog
+from db_pool import ConnectionPool
+
+# Gemeinsamer Koordinator-Zustand für den Betrieb mit mehreren Prozessen
+# (z.B. gunicorn -w 4): Bereichsvergabe, Leases, abgeschlossene Batches, Zähler
+# und Clients liegen in einer SQLite-Datei. Jede Änderung läuft in einer
+# BEGIN-IMMEDIATE-Transaktion, damit kein Bereich doppelt vergeben wird.
+
+MAX_SLOTS = 64
+COUNTER_KEYS = ["total_primes_found", "highest_prime_found", "total_batches_completed", "total_numbers_processed", "last_update"]
+
+
+def claim_slot(directory, max_slots=MAX_SLOTS):
+    # Jeder Prozess belegt den kleinsten freien Slot (per flock, wird beim Beenden frei);
+    # Slot 0 übernimmt die Aufgaben, die nur einmal laufen dürfen
+    os.makedirs(directory, exist_ok=True)
+    for slot in range(max_slots):
+        f = open(os.path.join(directory, f"worker_{slot:02d}.lock"), "a")
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            f.close()
+            continue
+        return slot, f
+    raise RuntimeError("Kein freier Worker-Slot")
+
+
+class SharedCoordinator:
+    def __init__(self, path, lease_timeout=LEASE_TIMEOUT):
+        self.path = path
+        self.lease_timeout = lease_timeout
+        self.pool = ConnectionPool(self.connect)
+        with self.transaction("init") as conn:
+            conn.execute('CREATE TABLE IF NOT EXISTS allocator (id INTEGER PRIMARY KEY CHECK (id = 1), next_number INTEGER NOT NULL)')
+            conn.execute('CREATE TABLE IF NOT EXISTS leases (range_start INTEGER PRIMARY KEY, range_end INTEGER NOT NULL, deadline REAL NOT NULL, client TEXT)')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_leases_deadline ON leases(deadline)')
+            conn.execute('CREATE TABLE IF NOT EXISTS completed (range_start INTEGER PRIMARY KEY, range_end INTEGER NOT NULL)')
+            conn.execute('CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value)')
+            conn.execute('CREATE TABLE IF NOT EXISTS clients (ip TEXT PRIMARY KEY, last_seen REAL NOT NULL)')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_clients_seen ON clients(last_seen)')
+            # Verschiedene Clients insgesamt als HyperLogLog, die Tabelle clients hält nur die aktiven
+            conn.execute('CREATE TABLE IF NOT EXISTS client_sketch (id INTEGER PRIMARY KEY CHECK (id = 1), registers BLOB NOT NULL, estimate INTEGER NOT NULL)')
+
+    def connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, cached_statements=256, check_same_thread=False)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+
+    @contextmanager
+    def transaction(self, call, mode="IMMEDIATE"):
+        # Die Zeit enthält auch das Warten auf die Schreibsperre anderer Prozesse
+        with self.pool.connection(f"coordinator_{call}") as conn:
+            conn.execute(f"BEGIN {mode}")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    def import_state(self, scheduler, stats):
+        # Übernimmt beim ersten Start den Zustand des Einzelprozess-Betriebs
+        with self.transaction("import_state") as conn:
+            if conn.execute('SELECT COUNT(*) FROM allocator').fetchone()[0]:
+                return False
+            conn.execute('INSERT INTO allocator VALUES (1, ?)', (scheduler.next_number,))
+            conn.executemany('INSERT INTO leases VALUES (?, ?, ?, NULL)',
+                             [(start, end, deadline) for start, (end, deadline, _client) in scheduler.leases.items()])
+            conn.executemany('INSERT INTO completed VALUES (?, ?)', scheduler.completed.to_list())
+            conn.executemany('INSERT INTO counters VALUES (?, ?)', [(key, stats.get(key)) for key in COUNTER_KEYS])
+            return True
+
+    def _touch(self, conn, client, now):
+        if client:
+            conn.execute('INSERT INTO clients VALUES (?, ?) ON CONFLICT(ip) DO UPDATE SET last_seen = excluded.last_seen',
+                         (client, now))
+
+    def acquire(self, size, client=None, now=None):
+        return self.acquire_many(size, 1, client, now)[0]
+
+    def acquire_many(self, size, count, client=None, now=None):
+        now = time.time() if now is None else now
+        deadline = now + self.lease_timeout
+        ranges = []
+        with self.transaction("acquire_many") as conn:
+            # Abgelaufene Leases zuerst neu vergeben
+            expired = conn.execute('SELECT range_start, range_end FROM leases WHERE deadline <= ? ORDER BY deadline LIMIT ?',
+                                   (now, count)).fetchall()
+            for start, end in expired:
+                conn.execute('UPDATE leases SET deadline = ?, client = ? WHERE range_start = ?', (deadline, client, start))
+                ranges.append((start, end))
+            if len(ranges) < count:
+                start = conn.execute('SELECT next_number FROM allocator WHERE id = 1').fetchone()[0]
+                for _ in range(count - len(ranges)):
+                    end = start + size - 1
+                    conn.execute('INSERT OR REPLACE INTO leases VALUES (?, ?, ?, ?)', (start, end, deadline, client))
+                    ranges.append((start, end))
+                    start = end + 1
+                conn.execute('UPDATE allocator SET next_number = ? WHERE id = 1', (start,))
+            self._touch(conn, client, now)
+        return ranges
+
+    def _contains(self, conn, start, end):
+        row = conn.execute('SELECT range_end FROM completed WHERE range_start <= ? ORDER BY range_start DESC LIMIT 1',
+                           (start,)).fetchone()
+        return row is not None and row[0] >= end
+
+    def is_completed(self, start, end):
+        with self.pool.connection("coordinator_is_completed") as conn:
+            return self._contains(conn, start, end)
+
+    def complete(self, record, client=None, owned=False, now=None):
+        # -> ("completed" | "duplicate" | "not_leased", Deadline des Leases oder None)
+        now = time.time() if now is None else now
+        start, end = record["start"], record["end"]
+        with self.transaction("complete") as conn:
+            self._touch(conn, client, now)
+            if self._contains(conn, start, end):
+                return "duplicate", None
+            lease = conn.execute('SELECT deadline, client FROM leases WHERE range_start = ? AND range_end = ?',
+                                 (start, end)).fetchone()
+            if not lease or not (owned or lease[1] in (None, client)):
+                return "not_leased", None
+            conn.execute('DELETE FROM leases WHERE range_start = ?', (start,))
+            conn.execute('INSERT OR REPLACE INTO completed VALUES (?, ?)', (start, end))
+            conn.executemany('UPDATE counters SET value = value + ? WHERE name = ?', [
+                (record["primes"], "total_primes_found"),
+                (record["numbers"], "total_numbers_processed"),
+                (1, "total_batches_completed")
+            ])
+            conn.execute('UPDATE counters SET value = MAX(value, ?) WHERE name = ?', (record["highest"], "highest_prime_found"))
+            conn.execute('UPDATE counters SET value = ? WHERE name = ?', (record["time"], "last_update"))
+        return "completed", lease[0]
+
+    def reopen(self, record):
+        # Gegenstück zu complete für Batches, die nicht gespeichert werden konnten
+        start, end = record["start"], record["end"]
+        with self.transaction("reopen") as conn:
+            if not conn.execute('DELETE FROM completed WHERE range_start = ? AND range_end = ?', (start, end)).rowcount:
+                return False
+            conn.execute('INSERT OR REPLACE INTO leases VALUES (?, ?, 0, NULL)', (start, end))
+            conn.executemany('UPDATE counters SET value = value - ? WHERE name = ?', [
+                (record["primes"], "total_primes_found"),
+                (record["numbers"], "total_numbers_processed"),
+                (1, "total_batches_completed")
+            ])
+        return True
+
+    def stats(self, client_timeout, now=None):
+        now = time.time() if now is None else now
+        with self.transaction("stats", "DEFERRED") as conn:
+            result = dict(conn.execute('SELECT name, value FROM counters'))
+            result["active_clients"] = conn.execute('SELECT COUNT(*) FROM clients WHERE last_seen > ?',
+                                                    (now - client_timeout,)).fetchone()[0]
+            row = conn.execute('SELECT estimate FROM client_sketch WHERE id = 1').fetchone()
+            result["total_clients"] = row[0] if row else 0
+        return result
+
+    def merge_client_sketch(self, sketch):
+        # Führt den Sketch dieses Prozesses mit dem gemeinsamen zusammen und liefert das Ergebnis
+        with self.transaction("merge_client_sketch") as conn:
+            row = conn.execute('SELECT registers FROM client_sketch WHERE id = 1').fetchone()
+            if row:
+                sketch.merge(HyperLogLog(registers=row[0]))
+            else:
+                # Erster Abgleich: bisher gespeicherte Clients übernehmen, bevor sie gelöscht werden
+                for (ip,) in conn.execute('SELECT ip FROM clients'):
+                    sketch.add(ip)
+            conn.execute('INSERT OR REPLACE INTO client_sketch VALUES (1, ?, ?)', (bytes(sketch.registers), sketch.count()))
+        return sketch
+
+    def prune_clients(self, before):
+        with self.transaction("prune_clients") as conn:
+            return conn.execute('DELETE FROM clients WHERE last_seen < ?', (before,)).rowcount
+
+    def scheduler_stats(self):
+        with self.transaction("scheduler_stats", "DEFERRED") as conn:
+            return {
+                "next_number": conn.execute('SELECT next_number FROM allocator WHERE id = 1').fetchone()[0],
+                "outstanding_leases": conn.execute('SELECT COUNT(*) FROM leases').fetchone()[0],
+                "completed_ranges": conn.execute('SELECT COUNT(*) FROM completed').fetchone()[0],
+                "lease_timeout": self.lease_timeout
+            }
+
+    def export_state(self):
+        # Gleiches Format wie server_state.json, damit ein Wechsel zurück zum Einzelprozess möglich bleibt
+        with self.transaction("export_state", "DEFERRED") as conn:
+            next_number = conn.execute('SELECT next_number FROM allocator WHERE id = 1').fetchone()[0]
+            leases = [list(row) for row in conn.execute('SELECT range_start, range_end, deadline FROM leases')]
+            completed = IntervalSet(conn.execute('SELECT range_start, range_end FROM completed ORDER BY range_start'))
+            counters = dict(conn.execute('SELECT name, value FROM counters'))
+        return {
+            "current_number": next_number,
+            "stats": counters,
+            "scheduler": {
+                "next_number": next_number,
+                "leases": leases,
+                "completed": completed.to_list()
+            }
+        }
@@ -1,104 +1,146 @@
-import json
-import matplotlib.pyplot as plt
+import matplotlib.style
+from matplotlib.figure import Figure
 import matplotlib.dates as mdates
 from datetime import datetime
+import io
 import os
 import sys
+import threading
+import zipfile
+from diagram_cache import DIAGRAM_TYPES
+from stats_store import read_entries
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-STATS_LOG_PATH = os.path.join(BASE_DIR, "stats_log.json")
-
-DIAGRAM_PATHS = {
-    "clients": os.path.join(BASE_DIR, "clients_over_time.png"),
-    "batches": os.path.join(BASE_DIR, "batches_over_time.png"),
-    "primes": os.path.join(BASE_DIR, "primes_over_time.png"),
-    "numbers": os.path.join(BASE_DIR, "numbers_processed_over_time.png"),
-    "processed_vs_primes": os.path.join(BASE_DIR, "processed_vs_primes.png"),
-    "batches_vs_clients": os.path.join(BASE_DIR, "batches_vs_clients.png")
+STATS_LOG_PATH = os.path.join(BASE_DIR, "stats_log", "minute.jsonl")
+
+DIAGRAM_FILES = {
+    "clients": "clients_over_time.png",
+    "batches": "batches_over_time.png",
+    "primes": "primes_over_time.png",
+    "numbers": "numbers_processed_over_time.png",
+    "processed_vs_primes": "processed_vs_primes.png",
+    "batches_vs_clients": "batches_vs_clients.png"
 }
 
+DIAGRAM_PATHS = {key: os.path.join(BASE_DIR, name) for key, name in DIAGRAM_FILES.items()}
+
+# Stil-Einstellungen (rcParams) sind global, daher wird immer nur ein Diagramm gleichzeitig gezeichnet
+RENDER_LOCK = threading.Lock()
+
 def load_stats():
     try:
-        with open(STATS_LOG_PATH, "r") as f:
-            return json.load(f)
+        return read_entries(STATS_LOG_PATH)
     except Exception as e:
         print(f"Fehler beim Laden der Statistiken: {str(e)}")
         sys.exit(1)
 
+def series_from_entries(stats):
+    timestamps = [datetime.strptime(entry["timestamp"], "%Y-%m-%d %H:%M:%S") for entry in stats]
+    data = {
+        "clients": [entry["active_clients"] for entry in stats],
+        "batches": [entry["total_batches_completed"] for entry in stats],
+        "primes": [entry["total_primes_found"] for entry in stats],
+        "numbers": [entry["total_numbers_processed"] for entry in stats]
+    }
+    return timestamps, data
+
+def plot_diagram(ax, timestamps, data, diagram_type, fontsize=None):
+    title_args = {"fontsize": fontsize} if fontsize else {}
+
+    if diagram_type == "clients":
+        ax.plot(timestamps, data["clients"], "b-o", linewidth=2)
+        ax.set_title("Aktive Clients über die Zeit", **title_args)
+        ax.set_ylabel("Anzahl Clients")
+
+    elif diagram_type == "batches":
+        ax.plot(timestamps, data["batches"], "g--s", linewidth=2)
+        ax.set_title("Abgeschlossene Batches", **title_args)
+        ax.set_ylabel("Anzahl Batches")
+
+    elif diagram_type == "primes":
+        ax.plot(timestamps, data["primes"], "r-^", linewidth=2)
+        ax.set_title("Gefundene Primzahlen", **title_args)
+        ax.set_ylabel("Anzahl Primzahlen")
+
+    elif diagram_type == "numbers":
+        ax.plot(timestamps, data["numbers"], "m-D", linewidth=2)
+        ax.set_title("Verarbeitete Zahlen", **title_args)
+        ax.set_ylabel("Anzahl Zahlen")
+
+    elif diagram_type == "processed_vs_primes":
+        ax.plot(timestamps, data["numbers"], "m--", label="Verarbeitete Zahlen", linewidth=2)
+        ax.plot(timestamps, data["primes"], "r-", label="Gefundene Primzahlen", linewidth=2)
+        ax.set_title("Effizienzvergleich", **title_args)
+        ax.set_ylabel("Anzahl")
+        ax.legend()
+
+    elif diagram_type == "batches_vs_clients":
+        ax.plot(timestamps, data["batches"], "g-", label="Batches", linewidth=2)
+        ax.plot(timestamps, data["clients"], "b--", label="Aktive Clients", linewidth=2)
+        ax.set_title("Auslastung der Clients", **title_args)
+        ax.set_ylabel("Anzahl")
+        ax.legend()
+
+def render_live_diagram(timestamps, data, diagram_type):
+    with RENDER_LOCK:
+        fig = Figure(figsize=(10, 5))
+        ax = fig.add_subplot(111)
+        ax.xaxis.set_major_formatter(mdates.DateFormatter("%d.%m %H:%M"))
+        ax.tick_params(axis="x", labelrotation=45)
+
+        plot_diagram(ax, timestamps, data, diagram_type)
+
+        ax.set_xlabel("Zeit")
+        ax.grid(True, alpha=0.3)
+        fig.tight_layout()
+
+        buf = io.BytesIO()
+        fig.savefig(buf, format="png", bbox_inches="tight")
+        return buf.getvalue()
+
+def render_diagram(timestamps, data, diagram_type):
+    with RENDER_LOCK, matplotlib.style.context("ggplot"):
+        fig = Figure(figsize=(12, 6))
+        ax = fig.add_subplot(111)
+        ax.xaxis.set_major_formatter(mdates.DateFormatter("%D %H:%M"))
+        ax.tick_params(axis="x", labelrotation=45)
+
+        plot_diagram(ax, timestamps, data, diagram_type, fontsize=14)
+
+        ax.set_xlabel("Zeit", fontsize=12)
+        ax.grid(True, alpha=0.3)
+        fig.tight_layout()
+
+        buf = io.BytesIO()
+        fig.savefig(buf, format="png", dpi=100, bbox_inches="tight")
+        return buf.getvalue()
+
+def render_all(timestamps, data):
+    return {DIAGRAM_FILES[diagram_type]: render_diagram(timestamps, data, diagram_type) for diagram_type in DIAGRAM_TYPES}
+
+def build_zip(images):
+    buf = io.BytesIO()
+    # PNGs sind bereits komprimiert
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_STORED) as zipf:
+        for name, png in images.items():
+            zipf.writestr(name, png)
+    return buf.getvalue()
+
 def create_diagram(timestamps, data, diagram_type):
     try:
-        plt.style.use("ggplot")
-        fig = plt.figure(figsize=(12, 6))
-        ax = fig.add_subplot(111)
-        
-        date_formatter = mdates.DateFormatter("%D %H:%M")
-        ax.xaxis.set_major_formatter(date_formatter)
-        plt.xticks(rotation=45)
-        plt.tight_layout()
-
-        if diagram_type == "clients":
-            plt.plot(timestamps, data, "b-o", linewidth=2)
-            plt.title("Aktive Clients über die Zeit", fontsize=14)
-            plt.ylabel("Anzahl Clients")
-        
-        elif diagram_type == "batches":
-            plt.plot(timestamps, data, "g--s", linewidth=2)
-            plt.title("Abgeschlossene Batches", fontsize=14)
-            plt.ylabel("Anzahl Batches")
-        
-        elif diagram_type == "primes":
-            plt.plot(timestamps, data, "r-^", linewidth=2)
-            plt.title("Gefundene Primzahlen", fontsize=14)
-            plt.ylabel("Anzahl Primzahlen")
-        
-        elif diagram_type == "numbers":
-            plt.plot(timestamps, data, "m-D", linewidth=2)
-            plt.title("Verarbeitete Zahlen", fontsize=14)
-            plt.ylabel("Anzahl Zahlen")
-        
-        elif diagram_type == "processed_vs_primes":
-            plt.plot(timestamps, data["numbers"], "m--", label="Verarbeitete Zahlen", linewidth=2)
-            plt.plot(timestamps, data["primes"], "r-", label="Gefundene Primzahlen", linewidth=2)
-            plt.title("Effizienzvergleich", fontsize=14)
-            plt.ylabel("Anzahl")
-            plt.legend()
-        
-        elif diagram_type == "batches_vs_clients":
-            plt.plot(timestamps, data["batches"], "g-", label="Batches", linewidth=2)
-            plt.plot(timestamps, data["clients"], "b--", label="Aktive Clients", linewidth=2)
-            plt.title("Auslastung der Clients", fontsize=14)
-            plt.ylabel("Anzahl")
-            plt.legend()
-
-        plt.xlabel("Zeit", fontsize=12)
-        plt.grid(True, alpha=0.3)
-        plt.savefig(DIAGRAM_PATHS[diagram_type], dpi=100, bbox_inches="tight")
-        plt.close(fig)
+        with open(DIAGRAM_PATHS[diagram_type], "wb") as f:
+            f.write(render_diagram(timestamps, data, diagram_type))
         return True
-    
+
     except Exception as e:
         print(f"Fehler bei {diagram_type}-Diagramm: {str(e)}")
         return False
 
 def main():
     stats = load_stats()
-    
-    timestamps = [datetime.strptime(entry["timestamp"], "%Y-%m-%d %H:%M:%S") for entry in stats]
-    data = {
-        "clients": [entry["active_clients"] for entry in stats],
-        "batches": [entry["total_batches_completed"] for entry in stats],
-        "primes": [entry["total_primes_found"] for entry in stats],
-        "numbers": [entry["total_numbers_processed"] for entry in stats]
-    }
+    timestamps, data = series_from_entries(stats)
 
-    results = {
-        "clients": create_diagram(timestamps, data["clients"], "clients"),
-        "batches": create_diagram(timestamps, data["batches"], "batches"),
-        "primes": create_diagram(timestamps, data["primes"], "primes"),
-        "numbers": create_diagram(timestamps, data["numbers"], "numbers"),
-        "processed_vs_primes": create_diagram(timestamps, data, "processed_vs_primes"),
-        "batches_vs_clients": create_diagram(timestamps, data, "batches_vs_clients")
-    }
+    results = {diagram_type: create_diagram(timestamps, data, diagram_type) for diagram_type in DIAGRAM_TYPES}
 
     successful = sum(results.values())
     print(f"Erfolgreich generierte Diagramme: {successful}/6")
@@ -110,4 +152,4 @@ if __name__ == "__main__":
         sys.exit(0)
     else:
         print("Einige Diagramme konnten nicht generiert werden!")
-        sys.exit(1)
\ No newline at end of file
+        sys.exit(1)
@@ -1,10 +1,30 @@
 import sqlite3
+import threading
 from werkzeug.security import generate_password_hash, check_password_hash
+from leaderboard import Leaderboard
+from db_pool import ConnectionPool
 
 DATABASE = 'users.db'
+PROGRESS_FLUSH_INTERVAL = 2  # in Sek
+PROGRESS_FLUSH_SIZE = 500
+
+leaderboard_cache = Leaderboard()
+
+
+def _connect():
+    conn = sqlite3.connect(DATABASE, timeout=30, cached_statements=256, check_same_thread=False)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    return conn
+
+
+_pool = ConnectionPool(_connect)
+
+def db_connection(call):
+    return _pool.connection(call)
 
 def init_db():
-    with sqlite3.connect(DATABASE) as conn:
+    with db_connection("init_db") as conn, conn:
         conn.execute('''
             CREATE TABLE IF NOT EXISTS users (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -27,57 +47,223 @@ def init_db():
         columns = [row[1] for row in cursor.fetchall()]
         if 'total_numbers_processed' not in columns:
             conn.execute('ALTER TABLE progress ADD COLUMN total_numbers_processed INTEGER DEFAULT 0')
+        if 'batches_verified' not in columns:
+            conn.execute('ALTER TABLE progress ADD COLUMN batches_verified INTEGER DEFAULT 0')
+            conn.execute('ALTER TABLE progress ADD COLUMN batches_rejected INTEGER DEFAULT 0')
+
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS batch_checks (
+                range_start INTEGER PRIMARY KEY,
+                range_end INTEGER NOT NULL,
+                user_id INTEGER,
+                verified INTEGER NOT NULL,
+                submitted_count INTEGER,
+                expected_count INTEGER,
+                checked_at TEXT
+            )
+        ''')
+        # Eigene fortlaufende id: mit range_start als INTEGER PRIMARY KEY wäre rowid der Bereichsanfang
+        # und nach Bereichsanfang nachladen würde später abgeschlossene frühere Batches übergehen
+        summary_columns = [row[1] for row in conn.execute("PRAGMA table_info(batch_summary)")]
+        if summary_columns and 'id' not in summary_columns:
+            conn.execute('ALTER TABLE batch_summary RENAME TO batch_summary_old')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS batch_summary (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                range_start INTEGER UNIQUE NOT NULL,
+                range_end INTEGER NOT NULL,
+                prime_count INTEGER NOT NULL,
+                twin_pairs INTEGER NOT NULL,
+                max_gap INTEGER NOT NULL,
+                max_gap_after INTEGER,
+                first_prime INTEGER,
+                last_prime INTEGER
+            )
+        ''')
+        if summary_columns and 'id' not in summary_columns:
+            conn.execute('''
+                INSERT INTO batch_summary (range_start, range_end, prime_count, twin_pairs, max_gap, max_gap_after, first_prime, last_prime)
+                SELECT * FROM batch_summary_old ORDER BY range_start
+            ''')
+            conn.execute('DROP TABLE batch_summary_old')
+
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_progress_user ON progress(user_id)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_progress_numbers ON progress(total_numbers_processed DESC)')
+
+    load_leaderboard()
+
+def load_leaderboard():
+    with db_connection("load_leaderboard") as conn:
+        rows = conn.execute('''
+            SELECT users.id, users.username,
+                   progress.total_numbers_processed,
+                   progress.total_primes_found
+            FROM users
+            JOIN progress ON progress.user_id = users.id
+        ''').fetchall()
+    leaderboard_cache.load(rows)
 
 def create_user(username, password):
     password_hash = generate_password_hash(password)
-    with sqlite3.connect(DATABASE) as conn:
-        try:
+    try:
+        with db_connection("create_user") as conn, conn:
             cursor = conn.cursor()
             cursor.execute('INSERT INTO users (username, password_hash) VALUES (?, ?)', (username, password_hash))
             user_id = cursor.lastrowid
             cursor.execute('INSERT INTO progress (user_id) VALUES (?)', (user_id,))
-            conn.commit()
-            return True
-        except sqlite3.IntegrityError:
-            return False
+        leaderboard_cache.add_user(user_id, username)
+        return True
+    except sqlite3.IntegrityError:
+        return False
 
 def verify_user(username, password):
-    with sqlite3.connect(DATABASE) as conn:
-        cursor = conn.cursor()
-        cursor.execute('SELECT id, password_hash FROM users WHERE username = ?', (username,))
-        user = cursor.fetchone()
-        if user and check_password_hash(user[1], password):
-            return user[0]
-        return None
+    with db_connection("verify_user") as conn:
+        user = conn.execute('SELECT id, password_hash FROM users WHERE username = ?', (username,)).fetchone()
+    if user and check_password_hash(user[1], password):
+        return user[0]
+    return None
 
 def get_user_progress(user_id):
-    with sqlite3.connect(DATABASE) as conn:
-        cursor = conn.cursor()
-        cursor.execute('SELECT total_primes_found, total_numbers_processed FROM progress WHERE user_id = ?', (user_id,))
-        return cursor.fetchone()
+    with db_connection("get_user_progress") as conn:
+        row = conn.execute('SELECT total_primes_found, total_numbers_processed FROM progress WHERE user_id = ?',
+                           (user_id,)).fetchone()
+    pending = progress_aggregator.pending_for(user_id)
+    if row and pending:
+        return (row[0] + pending[0], row[1] + pending[1])
+    return row
+
+
+class ProgressAggregator:
+    # Sammelt Fortschritts-Deltas pro Benutzer und schreibt sie gebündelt in einer Transaktion
+    def __init__(self, interval=PROGRESS_FLUSH_INTERVAL, max_pending=PROGRESS_FLUSH_SIZE):
+        self.interval = interval
+        self.max_pending = max_pending
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.pending = {}
+        self.thread = None
+
+    def add(self, user_id, primes_found, numbers_processed):
+        with self.lock:
+            delta = self.pending.setdefault(user_id, [0, 0, 0])
+            delta[0] += primes_found
+            delta[1] += numbers_processed
+            delta[2] += 1
+            if len(self.pending) >= self.max_pending:
+                self.wakeup.set()
+        if self.thread is None:
+            self.start()
+
+    def pending_for(self, user_id):
+        with self.lock:
+            delta = self.pending.get(user_id)
+            return tuple(delta) if delta else None
+
+    def flush(self):
+        with self.flush_lock:
+            with self.lock:
+                batch, self.pending = self.pending, {}
+            if not batch:
+                return 0
+            try:
+                with db_connection("flush_progress") as conn, conn:
+                    conn.executemany('''
+                        UPDATE progress
+                        SET total_primes_found = total_primes_found + ?,
+                            total_numbers_processed = total_numbers_processed + ?,
+                            total_batches_completed = total_batches_completed + ?
+                        WHERE user_id = ?
+                    ''', [(d[0], d[1], d[2], user_id) for user_id, d in batch.items()])
+            except sqlite3.Error:
+                # Deltas für den nächsten Versuch zurücklegen
+                with self.lock:
+                    for user_id, d in batch.items():
+                        delta = self.pending.setdefault(user_id, [0, 0, 0])
+                        for i in range(3):
+                            delta[i] += d[i]
+                raise
+            return len(batch)
+
+    def _run(self):
+        while True:
+            self.wakeup.wait(self.interval)
+            self.wakeup.clear()
+            try:
+                self.flush()
+            except sqlite3.Error as e:
+                print(f"Fehler beim Speichern des Fortschritts: {str(e)}")
+
+    def start(self):
+        with self.lock:
+            if self.thread is not None:
+                return
+            self.thread = threading.Thread(target=self._run, name="progress-writer", daemon=True)
+        self.thread.start()
+
+
+progress_aggregator = ProgressAggregator()
 
 def update_user_progress(user_id, primes_found, numbers_processed):
-    with sqlite3.connect(DATABASE) as conn:
-        conn.execute('''
-            UPDATE progress 
-            SET total_primes_found = total_primes_found + ?,
-                total_numbers_processed = total_numbers_processed + ?
-            WHERE user_id = ?
-        ''', (primes_found, numbers_processed, user_id))
-        conn.commit()
-
-def get_leaderboard():
-    with sqlite3.connect(DATABASE) as conn:
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT users.username, 
-                   progress.total_numbers_processed,
-                   progress.total_primes_found
-            FROM progress
-            JOIN users ON progress.user_id = users.id
-            ORDER BY total_numbers_processed DESC
-            LIMIT 10
-        ''')
-        return cursor.fetchall()
+    progress_aggregator.add(user_id, primes_found, numbers_processed)
+    leaderboard_cache.apply(user_id, primes_found, numbers_processed)
+
+def flush_user_progress():
+    return progress_aggregator.flush()
+
+def record_verification(range_start, range_end, user_id, verified, submitted_count, expected_count, checked_at):
+    with db_connection("record_verification") as conn, conn:
+        conn.execute('INSERT OR REPLACE INTO batch_checks VALUES (?, ?, ?, ?, ?, ?, ?)',
+                     (range_start, range_end, user_id, int(verified), submitted_count, expected_count, checked_at))
+        if user_id:
+            column = 'batches_verified' if verified else 'batches_rejected'
+            conn.execute(f'UPDATE progress SET {column} = {column} + 1 WHERE user_id = ?', (user_id,))
+
+def insert_batch_summaries(rows):
+    with db_connection("insert_batch_summaries") as conn, conn:
+        conn.executemany('''
+            INSERT OR IGNORE INTO batch_summary
+                (range_start, range_end, prime_count, twin_pairs, max_gap, max_gap_after, first_prime, last_prime)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', rows)
+
+def load_batch_summaries(after_id=0):
+    # id wächst mit jedem Eintrag in Schreibreihenfolge (SQLite erlaubt nur einen Schreiber),
+    # so lassen sich neue Zeilen auch anderer Prozesse nachladen, egal welchen Bereich sie betreffen
+    with db_connection("load_batch_summaries") as conn:
+        return conn.execute('SELECT * FROM batch_summary WHERE id > ? ORDER BY id', (after_id,)).fetchall()
+
+def count_batch_summaries():
+    with db_connection("count_batch_summaries") as conn:
+        return conn.execute('SELECT COUNT(*) FROM batch_summary').fetchone()[0]
+
+def get_summarized_starts():
+    with db_connection("get_summarized_starts") as conn:
+        return {row[0] for row in conn.execute('SELECT range_start FROM batch_summary')}
+
+def get_user_verification(user_id):
+    with db_connection("get_user_verification") as conn:
+        return conn.execute('SELECT batches_verified, batches_rejected FROM progress WHERE user_id = ?', (user_id,)).fetchone()
+
+def get_verification_summary(limit=20):
+    with db_connection("get_verification_summary") as conn:
+        verified, rejected = conn.execute(
+            'SELECT COALESCE(SUM(verified), 0), COUNT(*) - COALESCE(SUM(verified), 0) FROM batch_checks').fetchone()
+        rows = conn.execute('''
+            SELECT batch_checks.range_start, batch_checks.range_end, users.username,
+                   batch_checks.submitted_count, batch_checks.expected_count, batch_checks.checked_at
+            FROM batch_checks
+            LEFT JOIN users ON users.id = batch_checks.user_id
+            WHERE batch_checks.verified = 0
+            ORDER BY batch_checks.checked_at DESC
+            LIMIT ?
+        ''', (limit,)).fetchall()
+    return verified, rejected, rows
+
+def get_leaderboard(offset=0, limit=10):
+    return leaderboard_cache.page(offset, limit)
+
+def get_user_rank(user_id):
+    return leaderboard_cache.rank(user_id)
 
-init_db()
\ No newline at end of file
+init_db()
@@ -0,0 +1,60 @@
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+import metrics
+
+# Gemeinsamer Verbindungs-Pool für users.db und die Koordinator-Datenbank
+
+POOL_SIZE = 8
+POOL_TIMEOUT = 30  # in Sek
+
+
+class ConnectionPool:
+    # Begrenzte Zahl wiederverwendeter Verbindungen. Verbindungen pro Thread halfen nicht,
+    # weil der Entwicklungsserver für jede Anfrage einen neuen Thread startet.
+    def __init__(self, connect, size=POOL_SIZE):
+        self.connect = connect      # connect() -> neue sqlite3-Verbindung, check_same_thread=False
+        self.size = size
+        self.idle = queue.LifoQueue()
+        self.lock = threading.Lock()
+        self.created = 0
+
+    def _acquire(self):
+        try:
+            return self.idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self.lock:
+            create = self.created < self.size
+            if create:
+                self.created += 1
+        if create:
+            try:
+                return self.connect()
+            except BaseException:
+                with self.lock:
+                    self.created -= 1
+                raise
+        try:
+            return self.idle.get(timeout=POOL_TIMEOUT)
+        except queue.Empty:
+            raise sqlite3.OperationalError("Keine freie Datenbankverbindung") from None
+
+    @contextmanager
+    def connection(self, call):
+        # Misst Wartezeit auf die Verbindung und Dauer der Benutzung (unter dem Namen call)
+        started = time.perf_counter()
+        conn = self._acquire()
+        acquired = time.perf_counter()
+        metrics.SQLITE_POOL_WAIT_SECONDS.observe(acquired - started)
+        try:
+            yield conn
+        finally:
+            # Nicht abgeschlossene Transaktionen nicht an den nächsten Benutzer weitergeben
+            if conn.in_transaction:
+                conn.rollback()
+            self.idle.put(conn)
+            metrics.SQLITE_SECONDS.observe(time.perf_counter() - acquired, call=call)
@@ -0,0 +1,110 @@
+import base64
+import hashlib
+import threading
+import time
+from datetime import datetime
+
+# Die Diagramme selbst zeichnet create_diagrams.py; das Modul (und damit matplotlib)
+# wird erst beim ersten Abruf geladen, der Renderer-Thread läuft nur, solange
+# Diagramme abgefragt werden.
+
+REFRESH_INTERVAL = 5  # in Sek
+IDLE_TIMEOUT = 600  # in Sek
+DIAGRAM_TYPES = [
+    "clients",
+    "batches",
+    "primes",
+    "numbers",
+    "processed_vs_primes",
+    "batches_vs_clients"
+]
+
+
+class CachedDiagram:
+    def __init__(self, png):
+        self.png = png
+        self.etag = hashlib.sha1(png).hexdigest()[:16]
+        self.base64 = base64.b64encode(png).decode("utf-8")
+
+
+class DiagramCache:
+    def __init__(self, stats_store, interval=REFRESH_INTERVAL, idle_timeout=IDLE_TIMEOUT):
+        self.stats_store = stats_store
+        self.interval = interval
+        self.idle_timeout = idle_timeout
+        self.lock = threading.Lock()
+        self.thread_lock = threading.Lock()
+        self.thread = None
+        self.last_used = 0.0
+        self.stopped = threading.Event()
+        self.diagrams = {}
+        self.version = None
+
+        # Bereits eingelesene Zeitreihe, wird nur um neue Einträge ergänzt
+        self.last_timestamp = None
+        self.timestamps = []
+        self.data = {"clients": [], "batches": [], "primes": [], "numbers": []}
+
+    def _extend_series(self):
+        for entry in self.stats_store.query(since=self.last_timestamp):
+            if self.last_timestamp and entry["timestamp"] <= self.last_timestamp:
+                continue
+            self.timestamps.append(datetime.strptime(entry["timestamp"], "%Y-%m-%d %H:%M:%S"))
+            self.data["clients"].append(entry["active_clients"])
+            self.data["batches"].append(entry["total_batches_completed"])
+            self.data["primes"].append(entry["total_primes_found"])
+            self.data["numbers"].append(entry["total_numbers_processed"])
+            self.last_timestamp = entry["timestamp"]
+
+    def refresh(self):
+        from create_diagrams import render_live_diagram
+        with self.lock:
+            version = self.stats_store.version
+            if version == self.version:
+                return False
+            self._extend_series()
+            self.diagrams = {
+                diagram_type: CachedDiagram(render_live_diagram(self.timestamps, self.data, diagram_type))
+                for diagram_type in DIAGRAM_TYPES
+            }
+            self.version = version
+            return True
+
+    def series(self):
+        self.refresh()
+        with self.lock:
+            return self.version, list(self.timestamps), {key: list(values) for key, values in self.data.items()}
+
+    def get_all(self):
+        # Nach einer Ruhephase einmal direkt aktualisieren, statt alte Diagramme zu liefern
+        if self.start() or self.version is None:
+            self.refresh()
+        return self.diagrams
+
+    def get(self, diagram_type):
+        return self.get_all().get(diagram_type)
+
+    def _run(self):
+        while not self.stopped.is_set():
+            with self.thread_lock:
+                if time.monotonic() - self.last_used > self.idle_timeout:
+                    self.thread = None
+                    return
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"Fehler beim Rendern der Diagramme: {str(e)}")
+            self.stopped.wait(self.interval)
+
+    def start(self):
+        # Liefert True, wenn der Renderer-Thread (neu) gestartet wurde
+        with self.thread_lock:
+            self.last_used = time.monotonic()
+            if self.thread is not None or self.stopped.is_set():
+                return False
+            self.thread = threading.Thread(target=self._run, name="diagram-renderer", daemon=True)
+            self.thread.start()
+            return True
+
+    def stop(self):
+        self.stopped.set()
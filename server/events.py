@@ -0,0 +1,86 @@
+import json
+import threading
+import time
+
+# Live-Updates für die Webseite: ein Hintergrund-Thread fragt den Zustand höchstens
+# einmal pro Intervall ab und weckt alle wartenden Verbindungen (SSE und Long-Poll),
+# aber nur wenn sich etwas geändert hat. Die Last hängt damit von der Zahl der
+# Zuschauer ab, nicht davon, wie viele Batches abgegeben werden.
+
+PUBLISH_INTERVAL = 1  # in Sek
+KEEPALIVE_INTERVAL = 15  # in Sek
+LONG_POLL_TIMEOUT = 25  # in Sek
+MAX_SUBSCRIBERS = 200
+
+
+class Broadcaster:
+    def __init__(self, collect, interval=PUBLISH_INTERVAL, max_subscribers=MAX_SUBSCRIBERS):
+        self.collect = collect          # collect() -> dict, wird nur im Broadcaster-Thread aufgerufen
+        self.interval = interval
+        self.max_subscribers = max_subscribers
+        self.cond = threading.Condition()
+        self.seq = 0
+        self.snapshot = None
+        self.encoded = None
+        self.subscribers = 0
+        self.published = 0
+        self.thread = None
+
+    def _run(self):
+        while True:
+            with self.cond:
+                while not self.subscribers:
+                    self.cond.wait()
+            try:
+                snapshot = self.collect()
+                encoded = json.dumps(snapshot, sort_keys=True)
+            except Exception as e:
+                print(f"Fehler beim Erstellen der Live-Daten: {str(e)}")
+                encoded = None
+            if encoded is not None:
+                with self.cond:
+                    if encoded != self.encoded:
+                        self.seq += 1
+                        self.snapshot = snapshot
+                        self.encoded = encoded
+                        self.published += 1
+                        self.cond.notify_all()
+            time.sleep(self.interval)
+
+    def subscribe(self):
+        with self.cond:
+            if self.subscribers >= self.max_subscribers:
+                return False
+            self.subscribers += 1
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name="event-broadcaster", daemon=True)
+                self.thread.start()
+            self.cond.notify_all()
+            return True
+
+    def unsubscribe(self):
+        with self.cond:
+            self.subscribers -= 1
+
+    def wait(self, after_seq, timeout):
+        # -> (seq, snapshot), snapshot ist None, wenn es bis zum Timeout nichts Neues gab
+        with self.cond:
+            if after_seq > self.seq:
+                after_seq = 0   # Zähler stammt von vor einem Neustart
+            self.cond.wait_for(lambda: self.seq > after_seq, timeout)
+            if self.seq > after_seq:
+                return self.seq, self.snapshot
+            return self.seq, None
+
+    def metrics(self):
+        with self.cond:
+            return {
+                "subscribers": self.subscribers,
+                "seq": self.seq,
+                "published": self.published,
+                "interval": self.interval
+            }
+
+
+def format_event(seq, data, event="update"):
+    return f"id: {seq}\nevent: {event}\ndata: {json.dumps(data)}\n\n"
@@ -0,0 +1,413 @@
+import argparse
+import json
+import math
+import mmap
+import os
+import shutil
+import sqlite3
+import struct
+import sys
+import tempfile
+import time
+from bisect import bisect_right
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from batch_scheduler import IntervalSet
+
+# Offline-Werkzeug für die alte all_primes.txt (eine Primzahl pro Zeile, in
+# Abgabe-Reihenfolge angehängt): Die Datei wird per mmap in zeilengenaue Stücke
+# geteilt, die ein Prozess-Pool parst und als sortierte, duplikatfreie Läufe
+# ablegt. Ein blockweiser k-Wege-Merge schreibt daraus die sortierte Ausgabe,
+# eine Index-Datei mit Byte-Offsets und sucht Lücken in den vergebenen Bereichen.
+# Der Speicherbedarf hängt nur von --memory ab, nicht von der Dateigröße.
+#
+# Index-Datei (<Ausgabe>.idx): Kopf "<4sBxxxQ" (b"PIDX", Version, Abstand),
+# danach Einträge "<qq" (Primzahl, Byte-Offset ihrer Zeile) für jede
+# Abstand-te Primzahl der Ausgabe, beginnend mit der ersten.
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+INPUT_FILE = os.path.join(BASE_DIR, "all_primes.txt")
+STATE_FILE = os.path.join(BASE_DIR, "server_state.json")
+
+CHUNK_BYTES = 256 << 20    # Arbeitspaket pro Pool-Aufgabe
+BLOCK_BYTES = 8 << 20      # so viel wird auf einmal geparst
+MEMORY_MB = 512            # Richtwert pro Prozess für Läufe bzw. Merge-Puffer
+INDEX_STRIDE = 4096
+INDEX_MAGIC = b"PIDX"
+INDEX_VERSION = 1
+INDEX_HEADER = struct.Struct("<4sBxxxQ")
+INDEX_RECORD = np.dtype([("value", "<i8"), ("offset", "<i8")])
+MIN_SUSPICIOUS_GAP = 100   # unterhalb von e^10 sind alle Primzahllücken kleiner
+MAX_REPORTED_GAPS = 1000
+POWERS_OF_TEN = 10 ** np.arange(1, 19, dtype=np.int64)
+
+
+def split_chunks(mm, size, count):
+    # Grenzen jeweils hinter den nächsten Zeilenumbruch schieben
+    bounds = [0]
+    for i in range(1, count):
+        pos = mm.find(b"\n", max(size * i // count, bounds[-1]))
+        if pos < 0:
+            break
+        if pos + 1 > bounds[-1]:
+            bounds.append(pos + 1)
+    if bounds[-1] < size:
+        bounds.append(size)
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def parse_block(data):
+    # -> (Zahlen, Anzahl ungültiger Zeilen)
+    tokens = data.split()
+    try:
+        return np.array(tokens, dtype=np.int64), 0
+    except (ValueError, OverflowError):
+        values = []
+        for token in tokens:
+            try:
+                values.append(int(token))
+            except ValueError:
+                continue
+        values = [v for v in values if 0 <= v < 1 << 63]
+        return np.array(values, dtype=np.int64), len(tokens) - len(values)
+
+
+def sorted_unique(values):
+    # Timsort (kind="stable") nutzt die schon sortierten Abschnitte der Eingabe aus
+    values = np.sort(values, kind="stable")
+    keep = np.empty(values.size, dtype=bool)
+    keep[:1] = True
+    np.not_equal(values[1:], values[:-1], out=keep[1:])
+    return values[keep]
+
+
+class RunWriter:
+    # Sammelt Zahlen bis zur Laufgröße und legt sie sortiert und ohne Duplikate ab
+    def __init__(self, directory, prefix, run_values):
+        self.directory = directory
+        self.prefix = prefix
+        self.run_values = run_values
+        self.parts = []
+        self.buffered = 0
+        self.paths = []
+
+    def add(self, values):
+        self.parts.append(values)
+        self.buffered += values.size
+        if self.buffered >= self.run_values:
+            self.flush()
+
+    def flush(self):
+        if not self.buffered:
+            return
+        run = sorted_unique(np.concatenate(self.parts))
+        self.parts = []
+        self.buffered = 0
+        path = os.path.join(self.directory, f"{self.prefix}_{len(self.paths):04d}.run")
+        run.astype("<i8").tofile(path)
+        self.paths.append(path)
+
+
+def scan_chunk(path, index, start, end, run_dir, run_values):
+    result = {"index": index, "lines": 0, "invalid": 0, "descents": 0, "repeats": 0,
+              "first": None, "last": None, "min": None, "max": None, "first_descent": None}
+    runs = RunWriter(run_dir, f"chunk_{index:05d}", run_values)
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        if hasattr(mm, "madvise"):
+            mm.madvise(mmap.MADV_SEQUENTIAL, start - start % mmap.PAGESIZE, end - start + start % mmap.PAGESIZE)
+        pos = start
+        while pos < end:
+            limit = min(pos + BLOCK_BYTES, end)
+            if limit < end:
+                cut = mm.rfind(b"\n", pos, limit)
+                limit = cut + 1 if cut >= 0 else end
+            values, invalid = parse_block(mm[pos:limit])
+            pos = limit
+            result["invalid"] += invalid
+            if not values.size:
+                continue
+
+            # Reihenfolge in der Datei prüfen, auch über Blockgrenzen hinweg
+            sequence = values if result["last"] is None else np.concatenate(([result["last"]], values))
+            steps = np.diff(sequence)
+            descents = np.flatnonzero(steps < 0)
+            if descents.size and result["first_descent"] is None:
+                k = int(descents[0])
+                result["first_descent"] = [int(sequence[k]), int(sequence[k + 1])]
+            result["descents"] += int(descents.size)
+            result["repeats"] += int(np.count_nonzero(steps == 0))
+
+            if result["first"] is None:
+                result["first"] = int(values[0])
+            result["last"] = int(values[-1])
+            low, high = int(values.min()), int(values.max())
+            result["min"] = low if result["min"] is None else min(result["min"], low)
+            result["max"] = high if result["max"] is None else max(result["max"], high)
+            result["lines"] += int(values.size)
+            runs.add(values)
+    runs.flush()
+    result["runs"] = runs.paths
+    return result
+
+
+def line_offsets(values, base):
+    # Byte-Offset jeder Zeile, Zeilenlänge = Anzahl Ziffern + Zeilenumbruch
+    lengths = np.searchsorted(POWERS_OF_TEN, values, side="right") + 2
+    offsets = np.empty(values.size, dtype=np.int64)
+    offsets[0] = base
+    np.cumsum(lengths[:-1], out=offsets[1:])
+    offsets[1:] += base
+    return offsets, base + int(lengths.sum())
+
+
+class GapFinder:
+    # Primzahllücken über ln(p)² (bzw. --max-gap) innerhalb vergebener Bereiche
+    # deuten auf fehlende Batches hin; kürzere Ausfälle sind so nicht erkennbar
+    def __init__(self, ranges, max_gap=None):
+        self.ranges = ranges
+        self.max_gap = max_gap
+        self.count = 0
+        self.missing_numbers = 0
+        self.gaps = []
+
+    def threshold(self, at):
+        if self.max_gap:
+            return np.full(np.shape(at), self.max_gap, dtype=np.float64)
+        return np.maximum(np.log(np.maximum(at, 2).astype(np.float64)) ** 2, MIN_SUSPICIOUS_GAP)
+
+    def check(self, lo, hi):
+        # Fehlender Bereich [lo, hi] ohne Primzahlen, nur der Teil in vergebenen Bereichen zählt
+        i = max(bisect_right(self.ranges.starts, lo) - 1, 0)
+        for start, end in zip(self.ranges.starts[i:], self.ranges.ends[i:]):
+            if end < lo:
+                continue
+            if start > hi:
+                break
+            a, b = max(lo, start), min(hi, end)
+            self.count += 1
+            self.missing_numbers += b - a + 1
+            if len(self.gaps) < MAX_REPORTED_GAPS:
+                self.gaps.append([a, b])
+
+    def feed(self, previous, values):
+        if previous is None:
+            if values.size and values[0] - 1 >= self.threshold(values[0]):
+                self.check(0, int(values[0]) - 1)
+            previous, values = values[0], values[1:]
+        steps = np.diff(values, prepend=previous)
+        starts = np.concatenate(([previous], values[:-1]))
+        for k in np.flatnonzero(steps > self.threshold(starts)).tolist():
+            self.check(int(starts[k]) + 1, int(values[k]) - 1)
+
+    def finish(self, last):
+        if not self.ranges:
+            return
+        end = self.ranges.ends[-1]
+        if last is None:
+            self.check(0, end)
+        elif end - last >= self.threshold(last):
+            self.check(last + 1, end)
+
+
+def merge_runs(paths, output, index_path, gaps, memory_values, stride=INDEX_STRIDE):
+    runs = [np.memmap(p, dtype="<i8", mode="r") for p in paths if os.path.getsize(p)]
+    buffer_values = max(memory_values // max(len(runs), 1), 4096)
+    positions = [0] * len(runs)
+    unique = 0
+    offset = 0
+    last = None
+    out = open(output, "w", newline="\n") if output else None
+    index = open(index_path, "wb") if index_path else None
+    if index:
+        index.write(INDEX_HEADER.pack(INDEX_MAGIC, INDEX_VERSION, stride))
+    try:
+        while True:
+            buffers = [(i, runs[i][positions[i]:positions[i] + buffer_values])
+                       for i in range(len(runs)) if positions[i] < len(runs[i])]
+            if not buffers:
+                break
+            # Alles bis zum kleinsten Puffer-Ende ist vollständig bekannt
+            bound = min(buffer[-1] for _, buffer in buffers)
+            parts = []
+            for i, buffer in buffers:
+                n = int(np.searchsorted(buffer, bound, side="right"))
+                parts.append(buffer[:n])
+                positions[i] += n
+            block = sorted_unique(np.concatenate(parts))
+            if last is not None:
+                block = block[block > last]
+            if not block.size:
+                continue
+
+            gaps.feed(last, block)
+            offsets, next_offset = line_offsets(block, offset)
+            if index:
+                picks = np.flatnonzero((np.arange(unique, unique + block.size) % stride) == 0)
+                records = np.empty(picks.size, dtype=INDEX_RECORD)
+                records["value"] = block[picks]
+                records["offset"] = offsets[picks]
+                index.write(records.tobytes())
+            if out:
+                out.write("\n".join(map(str, block.tolist())))
+                out.write("\n")
+            offset = next_offset
+            unique += int(block.size)
+            last = int(block[-1])
+    finally:
+        if out:
+            out.close()
+        if index:
+            index.close()
+    gaps.finish(last)
+    return unique, offset
+
+
+def lookup(index_path, value):
+    # Byte-Offset, ab dem in der sortierten Ausgabe nach value gesucht werden muss
+    with open(index_path, "rb") as f:
+        magic, version, _stride = INDEX_HEADER.unpack(f.read(INDEX_HEADER.size))
+        if magic != INDEX_MAGIC or version != INDEX_VERSION:
+            raise ValueError(f"Keine Index-Datei: {index_path}")
+    records = np.memmap(index_path, dtype=INDEX_RECORD, mode="r", offset=INDEX_HEADER.size)
+    i = int(np.searchsorted(records["value"], value, side="right")) - 1
+    return int(records["offset"][i]) if i >= 0 else 0
+
+
+def load_ranges(state_file=None, coordinator_db=None, until=None):
+    # Vergebene Bereiche: alles unterhalb von next_number ohne noch offene Leases
+    leases = []
+    next_number = None
+    if coordinator_db:
+        conn = sqlite3.connect(f"file:{coordinator_db}?mode=ro", uri=True)
+        try:
+            next_number = conn.execute('SELECT next_number FROM allocator WHERE id = 1').fetchone()[0]
+            leases = conn.execute('SELECT range_start, range_end FROM leases').fetchall()
+        finally:
+            conn.close()
+    elif state_file and os.path.exists(state_file):
+        with open(state_file, "r") as f:
+            state = json.load(f)
+        scheduler = state.get("scheduler", {})
+        next_number = scheduler.get("next_number", state.get("current_number", 0))
+        leases = [(start, end) for start, end, _deadline in scheduler.get("leases", [])]
+    if until is not None:
+        next_number = until + 1
+    if not next_number:
+        return IntervalSet()
+    outstanding = IntervalSet(leases)
+    return IntervalSet(outstanding.gaps(0, next_number - 1))
+
+
+def run(path, output, processes, memory_mb, ranges, max_gap=None, tmpdir=None, stride=INDEX_STRIDE):
+    started = time.perf_counter()
+    size = os.path.getsize(path)
+    memory_values = memory_mb * (1 << 20) // 8 // 3   # Rohdaten, sortierte Kopie, Puffer
+    report = {"input": path, "bytes": size, "chunks": 0, "lines": 0, "invalid": 0, "descents": 0, "repeats": 0,
+              "first_descent": None, "min": None, "max": None}
+    run_dir = tempfile.mkdtemp(prefix="index_primes_", dir=tmpdir or os.path.dirname(os.path.abspath(output or path)))
+    try:
+        chunks = []
+        if size:
+            with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                chunks = split_chunks(mm, size, max(processes, math.ceil(size / CHUNK_BYTES)))
+        report["chunks"] = len(chunks)
+
+        runs = []
+        previous = None
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            futures = [pool.submit(scan_chunk, path, i, start, end, run_dir, memory_values) for i, (start, end) in enumerate(chunks)]
+            for future in futures:
+                result = future.result()
+                runs.extend(result["runs"])
+                for key in ("lines", "invalid", "descents", "repeats"):
+                    report[key] += result[key]
+                if result["first"] is None:
+                    continue
+                # Übergang vom vorherigen Stück
+                if previous is not None:
+                    if result["first"] < previous:
+                        report["descents"] += 1
+                        report["first_descent"] = report["first_descent"] or [previous, result["first"]]
+                    elif result["first"] == previous:
+                        report["repeats"] += 1
+                report["first_descent"] = report["first_descent"] or result["first_descent"]
+                previous = result["last"]
+                report["min"] = result["min"] if report["min"] is None else min(report["min"], result["min"])
+                report["max"] = result["max"] if report["max"] is None else max(report["max"], result["max"])
+        report["scan_seconds"] = round(time.perf_counter() - started, 3)
+
+        gaps = GapFinder(ranges, max_gap)
+        index_path = output + ".idx" if output else None
+        unique, written = merge_runs(runs, output, index_path, gaps, memory_values, stride)
+    finally:
+        shutil.rmtree(run_dir, ignore_errors=True)
+
+    report.update({
+        "sorted": report["descents"] == 0 and report["repeats"] == 0,
+        "unique": unique,
+        "duplicates": report["lines"] - unique,
+        "runs": len(runs),
+        "output": output,
+        "output_bytes": written if output else None,
+        "index": index_path,
+        "ranges": ranges.to_list() if len(ranges) <= MAX_REPORTED_GAPS else len(ranges),
+        "gap_count": gaps.count,
+        "missing_numbers": gaps.missing_numbers,
+        "gaps": gaps.gaps,
+        "seconds": round(time.perf_counter() - started, 3)
+    })
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sortiert, bereinigt und indiziert all_primes.txt und sucht Lücken")
+    parser.add_argument("input", nargs="?", default=INPUT_FILE)
+    parser.add_argument("--output", help="sortierte Ausgabe (Standard: <Eingabe>_sorted.txt, '-' = nur prüfen)")
+    parser.add_argument("--state", default=STATE_FILE, help="server_state.json mit den vergebenen Bereichen")
+    parser.add_argument("--coordinator-db", default=os.environ.get("PRIME_COORDINATOR_DB"))
+    parser.add_argument("--until", type=int, help="Bereiche bis zu dieser Zahl als vergeben ansehen")
+    parser.add_argument("--max-gap", type=int, help="feste Schwelle statt ln(p)²")
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--memory", type=int, default=MEMORY_MB, help="Speicher pro Prozess in MB")
+    parser.add_argument("--index-stride", type=int, default=INDEX_STRIDE)
+    parser.add_argument("--tmpdir", help="Verzeichnis für Zwischenläufe (Standard: neben der Ausgabe)")
+    parser.add_argument("--report", help="Bericht zusätzlich als JSON speichern")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.input):
+        sys.exit(f"Datei nicht gefunden: {args.input}")
+    output = args.output
+    if output is None:
+        output = os.path.splitext(args.input)[0] + "_sorted.txt"
+    elif output == "-":
+        output = None
+    if output and os.path.abspath(output) == os.path.abspath(args.input):
+        sys.exit("Ausgabe darf nicht die Eingabe überschreiben")
+
+    ranges = load_ranges(args.state, args.coordinator_db, args.until)
+    report = run(args.input, output, max(args.processes, 1), max(args.memory, 16), ranges, args.max_gap, args.tmpdir,
+                 max(args.index_stride, 1))
+
+    print(f"{report['lines']} Zeilen in {report['chunks']} Stücken, {report['invalid']} ungültig, "
+          f"{report['seconds']} s")
+    if report["sorted"]:
+        print("Datei ist sortiert und ohne Duplikate")
+    else:
+        print(f"{report['descents']} Rücksprünge (erster: {report['first_descent']}), "
+              f"{report['repeats']} direkte Wiederholungen, {report['duplicates']} Duplikate insgesamt")
+    print(f"{report['unique']} verschiedene Primzahlen von {report['min']} bis {report['max']}")
+    if len(ranges):
+        print(f"{report['gap_count']} Lücken in vergebenen Bereichen, {report['missing_numbers']} Zahlen fehlen")
+        for start, end in report["gaps"][:20]:
+            print(f"  {start} bis {end}")
+    if output:
+        print(f"Geschrieben: {output} ({report['output_bytes']} Bytes), Index: {report['index']}")
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+import queue
+import threading
+import time
+
+QUEUE_SIZE = 1000
+DRAIN_BATCH = 200
+RESERVE_TIMEOUT = 5  # in Sek
+MAX_ATTEMPTS = 3
+RETRY_DELAY = 1  # in Sek
+
+
+class IngestPipeline:
+    # Anfragen reservieren einen Platz und legen fertige Batches in die Warteschlange,
+    # ein Writer-Thread schreibt sie gesammelt weg (Primzahl-Speicher, Journal, Datenbank).
+    # handler(jobs) liefert die Jobs, die nicht geschrieben werden konnten; diese werden
+    # erneut versucht und nach MAX_ATTEMPTS an on_failure(job) übergeben.
+    def __init__(self, handler, on_failure=None, maxsize=QUEUE_SIZE, drain_batch=DRAIN_BATCH):
+        self.handler = handler
+        self.on_failure = on_failure
+        self.drain_batch = drain_batch
+        self.queue = queue.Queue()
+        self.slots = threading.BoundedSemaphore(maxsize)
+        self.maxsize = maxsize
+        self.cond = threading.Condition()
+        self.enqueued = 0
+        self.processed = 0
+        self.rejected = 0
+        self.retried = 0
+        self.failed = 0
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self.thread = threading.Thread(target=self._run, name="ingest-writer", daemon=True)
+        self.thread.start()
+
+    def reserve(self, timeout=RESERVE_TIMEOUT):
+        if self.slots.acquire(timeout=timeout):
+            return True
+        with self.cond:
+            self.rejected += 1
+        return False
+
+    def release(self):
+        self.slots.release()
+
+    def put(self, job):
+        with self.cond:
+            self.enqueued += 1
+            self.queue.put((time.monotonic(), job, 1))
+            return self.enqueued
+
+    def _run(self):
+        while True:
+            items = [self.queue.get()]
+            while len(items) < self.drain_batch:
+                try:
+                    items.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            jobs = [job for _queued_at, job, _attempt in items]
+            try:
+                failed = self.handler(jobs) or []
+            except Exception as e:
+                print(f"Fehler beim Schreiben der Batches: {str(e)}")
+                failed = jobs
+
+            failed_ids = {id(job) for job in failed}
+            retry = [item for item in items if id(item[1]) in failed_ids and item[2] < MAX_ATTEMPTS]
+            given_up = [item[1] for item in items if id(item[1]) in failed_ids and item[2] >= MAX_ATTEMPTS]
+            for job in given_up:
+                try:
+                    if self.on_failure:
+                        self.on_failure(job)
+                except Exception as e:
+                    print(f"Fehler beim Sichern eines fehlgeschlagenen Batches: {str(e)}")
+
+            done = len(items) - len(retry)
+            now = time.monotonic()
+            with self.cond:
+                self.processed += done
+                self.retried += len(retry)
+                self.failed += len(given_up)
+                self.last_lag = now - items[0][0]
+                self.max_lag = max(self.max_lag, self.last_lag)
+                self.cond.notify_all()
+            for _ in range(done):
+                self.slots.release()
+
+            # Fehlgeschlagene Jobs behalten ihren Platz und kommen nach einer Pause erneut dran
+            for queued_at, job, attempt in retry:
+                self.queue.put((queued_at, job, attempt + 1))
+            if retry:
+                time.sleep(RETRY_DELAY)
+
+    def wait_processed(self, ticket, timeout=None):
+        with self.cond:
+            return self.cond.wait_for(lambda: self.processed >= ticket, timeout)
+
+    def metrics(self):
+        with self.cond:
+            return {
+                "queue_depth": self.enqueued - self.processed,
+                "queue_capacity": self.maxsize,
+                "enqueued": self.enqueued,
+                "processed": self.processed,
+                "rejected": self.rejected,
+                "retried": self.retried,
+                "failed": self.failed,
+                "last_lag": round(self.last_lag, 4),
+                "max_lag": round(self.max_lag, 4)
+            }
@@ -0,0 +1,110 @@
+import heapq
+import random
+import threading
+import time
+
+import metrics
+
+# Ein einziger Hintergrund-Thread für alle regelmäßigen Aufgaben (Speichern,
+# Statistik-Log, abgelaufene Clients, Rangliste) statt einer Kette von Timern,
+# die sich jedes Mal selbst neu starten. Die Abstände werden leicht gestreut,
+# damit mehrere Prozesse nicht im selben Moment schreiben.
+
+JITTER = 0.1  # Anteil des Intervalls
+STOP_TIMEOUT = 30  # in Sek
+
+
+class Job:
+    def __init__(self, name, func, interval, jitter):
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.jitter = jitter
+        self.due = 0.0
+        self.runs = 0
+        self.failures = 0
+        self.last_seconds = None
+        self.max_seconds = 0.0
+        self.last_error = None
+
+    def next_due(self, now):
+        spread = self.interval * self.jitter
+        return now + self.interval + random.uniform(-spread, spread)
+
+
+class JobScheduler:
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.jobs = {}
+        self.heap = []      # (fällig, Name)
+        self.stopped = False
+        self.thread = None
+
+    def add(self, name, func, interval, delay=0, jitter=JITTER):
+        job = Job(name, func, interval, jitter)
+        with self.cond:
+            job.due = time.monotonic() + delay
+            self.jobs[name] = job
+            heapq.heappush(self.heap, (job.due, name))
+            self.cond.notify()
+
+    def start(self):
+        with self.cond:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name="job-scheduler", daemon=True)
+                self.thread.start()
+
+    def stop(self, timeout=STOP_TIMEOUT):
+        # Wartet auf eine gerade laufende Aufgabe, damit z.B. kein Snapshot halb geschrieben wird
+        with self.cond:
+            self.stopped = True
+            self.cond.notify()
+            thread = self.thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout)
+
+    def _run(self):
+        while True:
+            with self.cond:
+                while not self.stopped and (not self.heap or self.heap[0][0] > time.monotonic()):
+                    self.cond.wait(self.heap[0][0] - time.monotonic() if self.heap else None)
+                if self.stopped:
+                    return
+                _due, name = heapq.heappop(self.heap)
+                job = self.jobs[name]
+
+            started = time.perf_counter()
+            try:
+                job.func()
+                error = None
+            except Exception as e:
+                error = str(e)
+                print(f"Fehler in Hintergrundaufgabe {name}: {error}")
+            seconds = time.perf_counter() - started
+            metrics.JOB_SECONDS.observe(seconds, job=name)
+
+            with self.cond:
+                job.runs += 1
+                job.last_seconds = seconds
+                job.max_seconds = max(job.max_seconds, seconds)
+                if error is not None:
+                    job.failures += 1
+                    job.last_error = error
+                # Ab jetzt rechnen, damit eine lange Aufgabe keine Nachholläufe auslöst
+                job.due = job.next_due(time.monotonic())
+                heapq.heappush(self.heap, (job.due, name))
+
+    def metrics(self):
+        now = time.monotonic()
+        with self.cond:
+            return {
+                name: {
+                    "interval": job.interval,
+                    "runs": job.runs,
+                    "failures": job.failures,
+                    "last_seconds": job.last_seconds,
+                    "max_seconds": job.max_seconds,
+                    "last_error": job.last_error,
+                    "next_in": round(max(job.due - now, 0), 3)
+                } for name, job in self.jobs.items()
+            }
@@ -0,0 +1,122 @@
+import json
+import os
+import re
+import threading
+
+# Write-Ahead-Journal: Anfragen hängen Einträge nur an eine Liste im Speicher an,
+# ein Hintergrund-Thread schreibt sie gesammelt (Group Commit) und ruft fsync
+# höchstens alle FSYNC_INTERVAL Sekunden bzw. alle FSYNC_BATCH Einträge auf.
+
+FSYNC_INTERVAL = 1.0  # in Sek
+FSYNC_BATCH = 256
+JOURNAL_PATTERN = re.compile(r"^journal_(\d+)\.jsonl$")
+
+
+def journal_name(generation):
+    return f"journal_{generation:06d}.jsonl"
+
+
+class Journal:
+    def __init__(self, directory, start_seq=0, fsync_interval=FSYNC_INTERVAL, fsync_batch=FSYNC_BATCH):
+        self.directory = directory
+        self.fsync_interval = fsync_interval
+        self.fsync_batch = fsync_batch
+        os.makedirs(directory, exist_ok=True)
+
+        self.cond = threading.Condition()
+        self.io_lock = threading.Lock()
+        self.pending = []
+        self.files = {}
+        self.running = True
+
+        generations = self.generations()
+        self.generation = generations[-1] + 1 if generations else 0
+        self.seq = start_seq
+        for record in self.replay():
+            self.seq = max(self.seq, record["seq"])
+
+        self.thread = threading.Thread(target=self._run, name="journal-writer", daemon=True)
+        self.thread.start()
+
+    def generations(self):
+        found = []
+        for name in os.listdir(self.directory):
+            match = JOURNAL_PATTERN.match(name)
+            if match:
+                found.append(int(match.group(1)))
+        return sorted(found)
+
+    def replay(self, after_seq=0):
+        for generation in self.generations():
+            with open(os.path.join(self.directory, journal_name(generation)), "r") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # Abgeschnittener letzter Eintrag nach einem Absturz
+                        break
+                    if record.get("seq", 0) > after_seq:
+                        yield record
+
+    def append(self, record):
+        with self.cond:
+            self.seq += 1
+            record["seq"] = self.seq
+            self.pending.append((self.generation, json.dumps(record, separators=(",", ":"))))
+            if len(self.pending) >= self.fsync_batch:
+                self.cond.notify()
+            return self.seq
+
+    def rotate(self):
+        # Neue Einträge landen ab jetzt in einer neuen Datei; liefert die alte Generation
+        with self.cond:
+            self.generation += 1
+            return self.generation - 1
+
+    def _run(self):
+        while True:
+            with self.cond:
+                if self.running and len(self.pending) < self.fsync_batch:
+                    self.cond.wait(self.fsync_interval)
+                running = self.running
+            self.flush()
+            if not running:
+                return
+
+    def flush(self):
+        with self.io_lock:
+            with self.cond:
+                batch, self.pending = self.pending, []
+            if not batch:
+                return
+            touched = set()
+            for generation, line in batch:
+                f = self.files.get(generation)
+                if f is None:
+                    f = self.files[generation] = open(os.path.join(self.directory, journal_name(generation)), "a")
+                f.write(line + "\n")
+                touched.add(generation)
+            for generation in touched:
+                self.files[generation].flush()
+                os.fsync(self.files[generation].fileno())
+
+    def discard_until(self, generation):
+        self.flush()
+        with self.io_lock:
+            for old in self.generations():
+                if old > generation:
+                    continue
+                f = self.files.pop(old, None)
+                if f is not None:
+                    f.close()
+                os.remove(os.path.join(self.directory, journal_name(old)))
+
+    def close(self):
+        with self.cond:
+            self.running = False
+            self.cond.notify()
+        self.thread.join()
+        with self.io_lock:
+            for f in self.files.values():
+                f.close()
+            self.files = {}
@@ -0,0 +1,63 @@
+import threading
+import time
+from bisect import bisect_left, insort
+
+
+class Leaderboard:
+    # Rangliste im Speicher, sortiert nach (-geprüfte Zahlen, user_id);
+    # wird bei jedem Fortschritts-Delta nur an einer Stelle umsortiert
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = {}   # user_id -> [username, numbers_processed, primes_found]
+        self.order = []
+        self.version = time.time_ns()  # eindeutig auch über Neustarts hinweg
+
+    def load(self, rows):
+        with self.lock:
+            self.entries = {}
+            for user_id, username, numbers, primes in rows:
+                self.entries[user_id] = [username, numbers or 0, primes or 0]
+            self.order = sorted((-entry[1], user_id) for user_id, entry in self.entries.items())
+            self.version += 1
+
+    def add_user(self, user_id, username):
+        with self.lock:
+            if user_id in self.entries:
+                return
+            self.entries[user_id] = [username, 0, 0]
+            insort(self.order, (0, user_id))
+            self.version += 1
+
+    def apply(self, user_id, primes_found, numbers_processed):
+        with self.lock:
+            entry = self.entries.get(user_id)
+            if entry is None:
+                return
+            if numbers_processed:
+                key = (-entry[1], user_id)
+                del self.order[bisect_left(self.order, key)]
+                entry[1] += numbers_processed
+                insort(self.order, (-entry[1], user_id))
+            entry[2] += primes_found
+            self.version += 1
+
+    def _rank(self, key):
+        # Gleichstand: gleicher Rang wie der erste Benutzer mit derselben Zahl
+        return bisect_left(self.order, (key,)) + 1
+
+    def page(self, offset=0, limit=10):
+        with self.lock:
+            return self.version, [
+                (self._rank(key), self.entries[user_id][0], self.entries[user_id][1], self.entries[user_id][2])
+                for key, user_id in self.order[offset:offset + limit]
+            ]
+
+    def rank(self, user_id):
+        with self.lock:
+            entry = self.entries.get(user_id)
+            if entry is None:
+                return None
+            return self._rank(-entry[1]), entry[0], entry[1], entry[2]
+
+    def __len__(self):
+        return len(self.order)
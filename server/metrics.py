@@ -0,0 +1,142 @@
+import threading
+import time
+from contextlib import contextmanager
+
+# Laufzeit-Metriken im Prometheus-Textformat (ohne externe Bibliothek):
+# Zähler und Histogramme mit Labels, dazu ein Lock, das Warte- und Haltezeiten misst.
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+TIME_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+BYTE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+registry = []
+
+
+def escape(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def format_labels(names, values, extra=None):
+    pairs = list(zip(names, values)) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{escape(value)}"' for name, value in pairs) + "}"
+
+
+def format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.lock = threading.Lock()
+        self.values = {}
+        registry.append(self)
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels[name] for name in self.labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def collect(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self.lock:
+            for key, value in sorted(self.values.items()):
+                lines.append(f"{self.name}{format_labels(self.labels, key)} {format_value(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help, labels=(), buckets=TIME_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self.lock = threading.Lock()
+        self.values = {}  # Labels -> [Anzahl pro Bucket..., +Inf], Summe
+        registry.append(self)
+
+    def observe(self, value, **labels):
+        key = tuple(labels[name] for name in self.labels)
+        with self.lock:
+            counts, total = self.values.get(key) or ([0] * (len(self.buckets) + 1), 0)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            else:
+                counts[-1] += 1
+            self.values[key] = (counts, total + value)
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def collect(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self.lock:
+            for key, (counts, total) in sorted(self.values.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + ("+Inf",), counts):
+                    cumulative += count
+                    le = bound if bound == "+Inf" else format_value(bound)
+                    lines.append(f"{self.name}_bucket{format_labels(self.labels, key, ('le', le))} {cumulative}")
+                lines.append(f"{self.name}_sum{format_labels(self.labels, key)} {format_value(total)}")
+                lines.append(f"{self.name}_count{format_labels(self.labels, key)} {cumulative}")
+        return lines
+
+
+REQUESTS_TOTAL = Counter("prime_http_requests_total", "Anfragen pro Route und Statuscode", ("route", "method", "status"))
+REQUEST_SECONDS = Histogram("prime_http_request_seconds", "Bearbeitungszeit pro Route", ("route", "method"))
+SUBMIT_PAYLOAD_BYTES = Histogram("prime_submit_payload_bytes", "Größe der Abgaben an /submit_primes", ("format",), BYTE_BUCKETS)
+LOCK_WAIT_SECONDS = Histogram("prime_lock_wait_seconds", "Wartezeit auf ein Lock", ("lock",))
+LOCK_HOLD_SECONDS = Histogram("prime_lock_hold_seconds", "Haltezeit eines Locks", ("lock",))
+JOB_SECONDS = Histogram("prime_job_seconds", "Laufzeit von Hintergrundaufgaben", ("job",))
+STORE_SECONDS = Histogram("prime_store_append_seconds", "Zeit für das Anhängen an den Primzahl-Speicher")
+SQLITE_SECONDS = Histogram("prime_sqlite_seconds", "Zeit pro SQLite-Aufruf", ("call",))
+SQLITE_POOL_WAIT_SECONDS = Histogram("prime_sqlite_pool_wait_seconds", "Wartezeit auf eine freie Datenbankverbindung")
+
+
+class TimedLock:
+    # Verhält sich wie threading.Lock, misst aber Warte- und Haltezeit
+    def __init__(self, name):
+        self.name = name
+        self.lock = threading.Lock()
+        self.acquired_at = 0.0
+
+    def acquire(self, blocking=True, timeout=-1):
+        started = time.perf_counter()
+        acquired = self.lock.acquire(blocking, timeout)
+        if acquired:
+            self.acquired_at = time.perf_counter()
+            LOCK_WAIT_SECONDS.observe(self.acquired_at - started, lock=self.name)
+        return acquired
+
+    def release(self):
+        held = time.perf_counter() - self.acquired_at
+        self.lock.release()
+        LOCK_HOLD_SECONDS.observe(held, lock=self.name)
+
+    def locked(self):
+        return self.lock.locked()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+def render():
+    lines = []
+    for metric in registry:
+        lines.extend(metric.collect())
+    return "\n".join(lines) + "\n"
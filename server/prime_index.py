@@ -0,0 +1,177 @@
+import mmap
+import os
+import threading
+import time
+from bisect import bisect_left, bisect_right
+
+import numpy as np
+
+from prime_store import BLOCK_HEADER, IndexFollower, decode_block, segment_name
+
+# Abfragen über den Primzahl-Speicher: die Blockliste wird nach Bereichsanfang
+# sortiert und mit kumulierten Anzahlen gehalten (ein Eintrag pro Batch), die
+# Segment-Dateien werden per mmap gelesen statt in den Speicher geladen und
+# Blöcke vektorisiert dekodiert (ein 5M-Batch in wenigen Millisekunden).
+# Mit discover werden zusätzlich die Speicher anderer Prozesse mitgelesen.
+
+
+REFRESH_INTERVAL = 1  # in Sek
+
+
+class RangeNotCovered(LookupError):
+    pass
+
+
+class PrimeIndex:
+    def __init__(self, store, discover=None):
+        self.store = store
+        self.discover = discover
+        self.followers = {}
+        self.lock = threading.Lock()
+        self.maps = {}
+        self.seen = {}          # Verzeichnis -> Anzahl übernommener Index-Einträge
+        self.starts = []
+        self.ends = []
+        self.cumulative = [0]   # cumulative[i] = Anzahl Primzahlen in den Blöcken vor i, wird erst bei Bedarf nachgezogen
+        self.entries = []
+        self.contiguous_until = -1
+        self.last_block = None  # (Eintrag, Primzahlen) des zuletzt gelesenen Blocks
+        self.refreshed_at = float("-inf")
+
+    def refresh(self):
+        with self.lock:
+            now = time.monotonic()
+            if now - self.refreshed_at < REFRESH_INTERVAL:
+                return
+            self.refreshed_at = now
+            new = []
+            for source in self._sources():
+                entries = source.index.entries
+                seen = self.seen.get(source.directory, 0)
+                added = entries[seen:len(entries)]
+                self.seen[source.directory] = seen + len(added)
+                new.extend(entry + (source.directory,) for entry in added)
+            if not new:
+                return
+            new.sort(key=lambda e: e[0])
+            for entry in new:
+                self._insert(entry)
+            self._extend_contiguous()
+
+    def _sources(self):
+        if self.discover is None:
+            return [self.store]
+        for directory in self.discover():
+            if directory not in self.followers:
+                self.followers[directory] = IndexFollower(directory)
+        for follower in self.followers.values():
+            follower.refresh()
+        return [self.store] + list(self.followers.values())
+
+    def _insert(self, entry):
+        # Verspätete Blöcke an ihre Stelle einfügen; die kumulierten Anzahlen dahinter
+        # werden verworfen und erst bei der nächsten pi/nth_prime-Abfrage neu berechnet
+        i = bisect_right(self.starts, entry[0])
+        if i == len(self.starts):
+            self.entries.append(entry)
+            self.starts.append(entry[0])
+            self.ends.append(entry[1])
+        else:
+            self.entries.insert(i, entry)
+            self.starts.insert(i, entry[0])
+            self.ends.insert(i, entry[1])
+        del self.cumulative[i + 1:]
+
+    def _counts(self):
+        cumulative = self.cumulative
+        for i in range(len(cumulative) - 1, len(self.entries)):
+            cumulative.append(cumulative[-1] + self.entries[i][2])
+        return cumulative
+
+    def _extend_contiguous(self):
+        i = bisect_right(self.starts, self.contiguous_until + 1) - 1
+        while 0 <= i < len(self.starts) and self.starts[i] <= self.contiguous_until + 1:
+            self.contiguous_until = max(self.contiguous_until, self.ends[i])
+            i += 1
+
+    def _map(self, directory, segment, needed):
+        current = self.maps.get((directory, segment))
+        if current is None or len(current) < needed:
+            if current is not None:
+                current.close()
+            with open(os.path.join(directory, segment_name(segment)), "rb") as f:
+                current = self.maps[(directory, segment)] = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return current
+
+    def read_block(self, entry):
+        # Schmale Abfragen nacheinander (z.B. Intervall-Auswertung) treffen oft denselben Block
+        cached = self.last_block
+        if cached is not None and cached[0] == entry:
+            return cached[1]
+        start, _end, count, segment, offset, length, directory = entry
+        with self.lock:
+            data = self._map(directory, segment, offset + length)
+            raw = data[offset:offset + length]
+        primes = decode_block(start, raw[BLOCK_HEADER.size:])
+        if len(primes) != count:
+            raise ValueError(f"Beschädigter Block bei Segment {segment}, Offset {offset}")
+        self.last_block = (entry, primes)
+        return primes
+
+    def _block_for(self, n):
+        i = bisect_right(self.starts, n) - 1
+        if i < 0 or self.ends[i] < n:
+            raise RangeNotCovered(f"{n} wurde noch nicht berechnet")
+        return i
+
+    def is_prime(self, n):
+        self.refresh()
+        with self.lock:
+            entry = self.entries[self._block_for(n)]
+        primes = self.read_block(entry)
+        j = int(np.searchsorted(primes, n))
+        return j < len(primes) and int(primes[j]) == n
+
+    def pi(self, x):
+        self.refresh()
+        if x < 2:
+            return 0
+        with self.lock:
+            if x > self.contiguous_until:
+                raise RangeNotCovered(f"Primzahlen sind nur bis {self.contiguous_until} lückenlos berechnet")
+            i = self._block_for(x)
+            before, entry = self._counts()[i], self.entries[i]
+        return before + int(np.searchsorted(self.read_block(entry), x, side="right"))
+
+    def nth_prime(self, k):
+        self.refresh()
+        with self.lock:
+            cumulative = self._counts()
+            i = bisect_left(cumulative, k) - 1
+            if k < 1 or i >= len(self.entries) or self.ends[i] > self.contiguous_until:
+                raise RangeNotCovered(f"Die {k}. Primzahl liegt außerhalb des lückenlos berechneten Bereichs")
+            before, entry = cumulative[i], self.entries[i]
+        return int(self.read_block(entry)[k - before - 1])
+
+    def _slices(self, lo, hi):
+        self.refresh()
+        with self.lock:
+            i = max(bisect_right(self.starts, lo) - 1, 0)
+            j = bisect_right(self.starts, hi)
+            entries = [entry for entry in self.entries[i:j] if entry[1] >= lo]
+        for entry in entries:
+            primes = self.read_block(entry)
+            yield primes[np.searchsorted(primes, lo):np.searchsorted(primes, hi, side="right")]
+
+    def iter_primes(self, lo, hi):
+        for primes in self._slices(lo, hi):
+            yield primes.tolist()
+
+    def primes_between(self, lo, hi):
+        return np.concatenate(list(self._slices(lo, hi)) or [np.zeros(0, dtype=np.int64)])
+
+    def close(self):
+        with self.lock:
+            for data in self.maps.values():
+                data.close()
+            self.maps = {}
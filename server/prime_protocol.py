@@ -0,0 +1,93 @@
+import struct
+import zlib
+
+import numpy as np
+
+from prime_store import decode_varints, encode_varints
+
+# Binäres Übertragungsformat für /submit_primes (Content-Type application/x-prime-batch):
+#   Header: Magic "PRMB", Version, Kodierung, Start, Ende, Anzahl, CRC32 der Nutzdaten
+#   Kodierung 0: Bitmap der ungeraden Zahlen ab dem ersten ungeraden Wert >= Start
+#                (Bit i, LSB zuerst = Zahl first_odd + 2*i; die 2 ist implizit enthalten)
+#   Kodierung 1: Varint-Abstände wie im Primzahl-Speicher (erster Abstand zum Start)
+
+MIMETYPE = "application/x-prime-batch"
+MAGIC = b"PRMB"
+VERSION = 1
+ENCODING_BITMAP = 0
+ENCODING_VARINT = 1
+HEADER = struct.Struct("<4sBBxxQQII")
+
+
+class ProtocolError(ValueError):
+    pass
+
+
+def first_odd(start):
+    return start | 1
+
+
+def decode_bitmap(start, end, payload):
+    bits = np.unpackbits(np.frombuffer(payload, dtype=np.uint8), bitorder="little")
+    offsets = np.flatnonzero(bits).astype(np.int64)
+    primes = offsets * 2 + first_odd(start)
+    primes = primes[primes <= end]
+    if start <= 2 <= end:
+        primes = np.concatenate(([2], primes))
+    return primes
+
+
+def decode_gaps(start, payload):
+    if len(payload) and payload[-1] >= 0x80:
+        raise ProtocolError("Unvollständige Nutzdaten")
+    try:
+        gaps = decode_varints(payload)
+    except ValueError as e:
+        raise ProtocolError(str(e))
+    return np.cumsum(gaps) + start
+
+
+def decode_submission(body):
+    view = memoryview(body)
+    if len(view) < HEADER.size:
+        raise ProtocolError("Nachricht zu kurz")
+    magic, version, encoding, start, end, count, checksum = HEADER.unpack_from(view)
+    if magic != MAGIC or version != VERSION:
+        raise ProtocolError("Unbekanntes Format")
+    if start > end or end >= 1 << 63:
+        raise ProtocolError("Ungültiger Bereich")
+
+    payload = view[HEADER.size:]
+    if zlib.crc32(payload) != checksum:
+        raise ProtocolError("Prüfsumme stimmt nicht")
+
+    if encoding == ENCODING_BITMAP:
+        expected = ((end - first_odd(start)) // 2 + 1 + 7) // 8 if end >= first_odd(start) else 0
+        if len(payload) != expected:
+            raise ProtocolError("Bitmap hat falsche Länge")
+        primes = decode_bitmap(start, end, payload)
+    elif encoding == ENCODING_VARINT:
+        primes = decode_gaps(start, payload)
+    else:
+        raise ProtocolError("Unbekannte Kodierung")
+
+    if len(primes) != count:
+        raise ProtocolError("Anzahl stimmt nicht")
+    # Vergleich statt np.diff: ein Überlauf beim Aufsummieren großer Abstände fällt so als Rücksprung auf
+    if count and (primes[0] < start or primes[-1] > end or np.any(primes[1:] <= primes[:-1])):
+        raise ProtocolError("Primzahlen außerhalb des Bereichs")
+    return (start, end), primes
+
+
+def encode_submission(start, end, primes, encoding=ENCODING_VARINT):
+    primes = np.asarray(primes, dtype=np.int64)
+    if encoding == ENCODING_BITMAP:
+        odd = primes[primes % 2 == 1]
+        size = (end - first_odd(start)) // 2 + 1 if end >= first_odd(start) else 0
+        bits = np.zeros(size, dtype=np.uint8)
+        bits[(odd - first_odd(start)) // 2] = 1
+        payload = np.packbits(bits, bitorder="little").tobytes()
+    else:
+        payload = encode_varints(np.diff(primes, prepend=start))
+    header = HEADER.pack(MAGIC, VERSION, encoding, start, end, len(primes), zlib.crc32(payload))
+    return header + payload
@@ -0,0 +1,283 @@
+import os
+import struct
+import threading
+from bisect import bisect_right
+
+import numpy as np
+
+# Binärer Primzahl-Speicher: jedes Batch wird als Block abgelegt, die Primzahlen
+# als Varint-kodierte Abstände zum Batch-Anfang bzw. zur vorherigen Primzahl.
+# Blöcke liegen in Segment-Dateien, ein kleiner Index hält Bereich und Lage.
+
+SEGMENT_SIZE = 256 * 1024 * 1024
+BLOCK_HEADER = struct.Struct("<QQII")         # start, end, count, payload_len
+INDEX_RECORD = struct.Struct("<QQIIQI")       # start, end, count, segment, offset, length
+INDEX_FILE = "index.bin"
+VARINT_MAX_BYTES = 9                          # 9 * 7 Bit reichen für alle Werte bis 2**63 - 1
+
+
+def segment_name(segment):
+    return f"segment_{segment:05d}.bin"
+
+
+def encode_varints(values):
+    # Vektorisiert: erst die Länge jedes Werts in Bytes, dann je 7 Bit an ihre Position
+    values = np.asarray(values, dtype=np.int64)
+    if not values.size:
+        return b""
+    if values.min() < 0:
+        raise ValueError("Negative Werte lassen sich nicht als Varint kodieren")
+    largest = int(values.max())
+    if largest < 0x80:
+        return values.astype(np.uint8).tobytes()
+    lengths = np.ones(values.size, dtype=np.int64)
+    for k in range(1, (largest.bit_length() + 6) // 7):
+        lengths += values >= 1 << (7 * k)
+    positions = np.cumsum(lengths) - lengths
+    out = np.empty(int(positions[-1] + lengths[-1]), dtype=np.uint8)
+    out[positions] = values & 0x7F
+    for k in range(1, int(lengths.max())):
+        # Nur die längeren Werte: Fortsetzungsbit am vorherigen Byte setzen, nächste 7 Bit schreiben
+        longer = np.flatnonzero(lengths > k)
+        out[positions[longer] + k - 1] |= 0x80
+        out[positions[longer] + k] = (values[longer] >> (7 * k)) & 0x7F
+    return out.tobytes()
+
+
+def decode_varints(buf):
+    # -> int64-Array; Bytes ab 0x80 haben einen Nachfolger, ein unvollständiger letzter Wert wird ignoriert.
+    # Meist sind fast alle Werte ein Byte lang, nur die wenigen Fortsetzungsbytes werden einzeln verrechnet.
+    raw = np.frombuffer(buf, dtype=np.uint8)
+    more = raw >= 0x80
+    if not more.any():
+        return raw.astype(np.int64)
+    ends = np.flatnonzero(~more)
+    if not ends.size:
+        return np.zeros(0, dtype=np.int64)
+    values = raw[ends].astype(np.int64)
+    continued = np.flatnonzero(more[:ends[-1]])
+    owner = np.searchsorted(ends, continued)
+    first = np.where(owner > 0, ends[owner - 1] + 1, 0)
+    shift = 7 * (ends[owner] - first)
+    if shift.max(initial=0) >= 7 * VARINT_MAX_BYTES:
+        raise ValueError("Varint zu lang")
+    # Das letzte Byte eines Werts trägt die höchsten Bits
+    values[owner] = values[owner] << shift
+    np.add.at(values, owner, (raw[continued] & 0x7F).astype(np.int64) << (7 * (continued - first)))
+    return values
+
+
+def encode_block(start, primes):
+    return encode_varints(np.diff(np.asarray(primes, dtype=np.int64), prepend=start))
+
+
+def decode_block(start, payload):
+    # -> int64-Array, aufsteigend
+    return np.cumsum(decode_varints(payload)) + start
+
+
+class BlockIndex:
+    # entries in Schreibreihenfolge (PrimeIndex liest nur neue Einträge nach), dazu eine
+    # beim Einfügen mitgeführte, nach Bereichsanfang sortierte Sicht für Bereichsabfragen
+    def __init__(self):
+        self.entries = []
+        self.by_start = []
+        self.starts = []
+
+    def add(self, entry):
+        self.entries.append(entry)
+        if not self.starts or entry[0] >= self.starts[-1]:
+            self.by_start.append(entry)
+            self.starts.append(entry[0])
+        else:
+            i = bisect_right(self.starts, entry[0])
+            self.by_start.insert(i, entry)
+            self.starts.insert(i, entry[0])
+
+    def sorted_entries(self):
+        return self.by_start
+
+    def overlapping(self, lo=None, hi=None):
+        i = 0
+        if lo is not None:
+            # Letzter Block, der vor lo beginnt, kann lo noch enthalten
+            i = bisect_right(self.starts, lo)
+            while i > 0 and self.by_start[i - 1][1] >= lo:
+                i -= 1
+        for j in range(i, len(self.by_start)):
+            entry = self.by_start[j]
+            start, end = entry[0], entry[1]
+            if hi is not None and start > hi:
+                break
+            if lo is not None and end < lo:
+                continue
+            yield entry
+
+
+def load_index(directory):
+    index = BlockIndex()
+    path = os.path.join(directory, INDEX_FILE)
+    if not os.path.exists(path):
+        return index
+    with open(path, "rb") as f:
+        data = f.read()
+    usable = len(data) - len(data) % INDEX_RECORD.size
+    for entry in INDEX_RECORD.iter_unpack(data[:usable]):
+        index.add(entry)
+    if usable != len(data):
+        with open(path, "r+b") as f:
+            f.truncate(usable)
+    return index
+
+
+def count_entries(directory):
+    path = os.path.join(directory, INDEX_FILE)
+    return os.path.getsize(path) // INDEX_RECORD.size if os.path.exists(path) else 0
+
+
+def read_last_entry(directory):
+    # Nur der letzte vollständige Eintrag, ohne den ganzen Index zu lesen
+    path = os.path.join(directory, INDEX_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r+b") as f:
+        size = os.fstat(f.fileno()).st_size
+        usable = size - size % INDEX_RECORD.size
+        if usable != size:
+            f.truncate(usable)
+        if not usable:
+            return None
+        f.seek(usable - INDEX_RECORD.size)
+        return INDEX_RECORD.unpack(f.read(INDEX_RECORD.size))
+
+
+class IndexFollower:
+    # Liest den Index eines Speichers mit, in den ein anderer Prozess schreibt
+    def __init__(self, directory):
+        self.directory = directory
+        self.index = BlockIndex()
+        self.offset = 0
+
+    def refresh(self):
+        path = os.path.join(self.directory, INDEX_FILE)
+        if not os.path.exists(path):
+            return
+        with open(path, "rb") as f:
+            f.seek(self.offset)
+            data = f.read()
+        # Nur vollständige Einträge übernehmen, der Rest wird beim nächsten Mal gelesen
+        usable = len(data) - len(data) % INDEX_RECORD.size
+        for entry in INDEX_RECORD.iter_unpack(data[:usable]):
+            self.index.add(entry)
+        self.offset += usable
+
+
+class PrimeStoreAppender:
+    def __init__(self, directory, segment_size=SEGMENT_SIZE):
+        self.directory = directory
+        self.segment_size = segment_size
+        self.lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+        # Der vollständige Index wird erst bei der ersten Abfrage geladen (siehe index)
+        self._index = None
+        last = read_last_entry(directory)
+        if last:
+            self.segment = last[3]
+            valid_end = last[4] + last[5]
+        else:
+            self.segment = 0
+            valid_end = 0
+
+        # Unvollständige Blöcke nach einem Absturz abschneiden
+        segment_path = os.path.join(directory, segment_name(self.segment))
+        if os.path.exists(segment_path) and os.path.getsize(segment_path) > valid_end:
+            with open(segment_path, "r+b") as f:
+                f.truncate(valid_end)
+
+        self.segment_file = open(segment_path, "ab")
+        self.index_file = open(os.path.join(directory, INDEX_FILE), "ab")
+
+    @property
+    def index(self):
+        with self.lock:
+            if self._index is None:
+                self._index = load_index(self.directory)
+            return self._index
+
+    def append(self, start, end, primes):
+        payload = encode_block(start, primes)
+        header = BLOCK_HEADER.pack(start, end, len(primes), len(payload))
+
+        with self.lock:
+            if self.segment_file.tell() + len(header) + len(payload) > self.segment_size and self.segment_file.tell() > 0:
+                self._roll_segment()
+
+            offset = self.segment_file.tell()
+            self.segment_file.write(header)
+            self.segment_file.write(payload)
+            self.segment_file.flush()
+
+            entry = (start, end, len(primes), self.segment, offset, len(header) + len(payload))
+            self.index_file.write(INDEX_RECORD.pack(*entry))
+            self.index_file.flush()
+            if self._index is not None:
+                self._index.add(entry)
+        return entry
+
+    def _roll_segment(self):
+        self.segment_file.close()
+        self.segment += 1
+        self.segment_file = open(os.path.join(self.directory, segment_name(self.segment)), "ab")
+
+    def flush(self):
+        with self.lock:
+            self.segment_file.flush()
+            self.index_file.flush()
+            os.fsync(self.segment_file.fileno())
+            os.fsync(self.index_file.fileno())
+
+    def close(self):
+        with self.lock:
+            self.segment_file.close()
+            self.index_file.close()
+
+
+def read_block(directory, entry, handles=None):
+    segment, offset, length = entry[3], entry[4], entry[5]
+    path = os.path.join(directory, segment_name(segment))
+    if handles is not None:
+        f = handles.get(segment)
+        if f is None:
+            f = handles[segment] = open(path, "rb")
+    else:
+        f = open(path, "rb")
+    try:
+        f.seek(offset)
+        raw = f.read(length)
+    finally:
+        if handles is None:
+            f.close()
+    start, _end, count, payload_len = BLOCK_HEADER.unpack_from(raw)
+    primes = decode_block(start, raw[BLOCK_HEADER.size:BLOCK_HEADER.size + payload_len])
+    if len(primes) != count:
+        raise ValueError(f"Beschädigter Block bei Segment {segment}, Offset {offset}")
+    return primes
+
+
+def iter_blocks(directory, lo=None, hi=None):
+    index = load_index(directory)
+    handles = {}
+    try:
+        for entry in index.overlapping(lo, hi):
+            yield entry, read_block(directory, entry, handles)
+    finally:
+        for f in handles.values():
+            f.close()
+
+
+def iter_primes(directory, lo=None, hi=None):
+    for _entry, primes in iter_blocks(directory, lo, hi):
+        i = np.searchsorted(primes, lo) if lo is not None else 0
+        j = np.searchsorted(primes, hi, side="right") if hi is not None else len(primes)
+        yield from primes[i:j].tolist()
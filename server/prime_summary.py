@@ -0,0 +1,165 @@
+import math
+import threading
+import time
+
+import numpy as np
+
+# Kennzahlen pro Batch (Anzahl, Primzahlzwillinge, größte Lücke, erste/letzte
+# Primzahl), beim Speichern einmal vektorisiert berechnet. Abfragen über beliebige
+# Bereiche kombinieren diese Zusammenfassungen; nur die höchstens zwei Batches, die
+# über den Rand des Bereichs hinausragen, werden aus dem Primzahl-Speicher gelesen.
+# Zwillinge und Lücken über Batch-Grenzen hinweg ergeben sich aus erster/letzter Primzahl.
+
+REFRESH_INTERVAL = 1  # in Sek
+NO_PRIME = -1
+COLUMNS = ("starts", "ends", "counts", "twins", "max_gaps", "max_gap_after", "firsts", "lasts")
+
+
+def summarize(start, end, primes):
+    # -> (start, end, count, twins, max_gap, max_gap_after, first, last)
+    primes = np.asarray(primes, dtype=np.int64)
+    if not primes.size:
+        return start, end, 0, 0, 0, None, None, None
+    gaps = np.diff(primes)
+    if not gaps.size:
+        return start, end, 1, 0, 0, None, int(primes[0]), int(primes[0])
+    widest = int(np.argmax(gaps))
+    return (start, end, int(primes.size), int(np.count_nonzero(gaps == 2)), int(gaps[widest]), int(primes[widest]),
+            int(primes[0]), int(primes[-1]))
+
+
+def log_integral(lo, hi, steps=1000):
+    # Erwartete Anzahl Primzahlen in [lo, hi] nach dem Primzahlsatz (Integral über 1/ln t)
+    lo = max(lo, 2)
+    if hi <= lo:
+        return 0.0
+    t = np.linspace(lo, hi, steps + 1)
+    f = 1 / np.log(t)
+    return float(((f[1:] + f[:-1]) / 2 * np.diff(t)).sum())
+
+
+def x_over_ln_x(x):
+    return x / math.log(x) if x > 1 else 0.0
+
+
+class PrimeSummary:
+    def __init__(self, load_rows, read_primes=None):
+        self.load_rows = load_rows      # load_rows(after_id) -> [(id, *summary), ...] in Schreibreihenfolge
+        self.read_primes = read_primes  # read_primes(lo, hi) -> Primzahlen in [lo, hi]; ohne nur ganze Batches
+        self.lock = threading.Lock()
+        self.columns = {name: np.zeros(0, dtype=np.int64) for name in COLUMNS}   # nach Bereichsanfang sortiert
+        self.last_id = 0
+        self.refreshed_at = float("-inf")
+        self.arrays = None
+
+    def refresh(self):
+        with self.lock:
+            now = time.monotonic()
+            if now - self.refreshed_at < REFRESH_INTERVAL:
+                return
+            self.refreshed_at = now
+            new = self.load_rows(self.last_id)
+            if new:
+                self.last_id = new[-1][0]
+                self._merge(sorted((row[1:] for row in new), key=lambda row: row[0]))
+                self.arrays = None
+
+    def _merge(self, rows):
+        # Nur die neuen Zeilen umwandeln und an ihre Stelle in die sortierten Spalten einfügen
+        positions = np.searchsorted(self.columns["starts"], [row[0] for row in rows])
+        for name, values in zip(COLUMNS, zip(*rows)):
+            self.columns[name] = np.insert(self.columns[name], positions, [NO_PRIME if v is None else v for v in values])
+
+    def _build(self):
+        a = dict(self.columns)
+        # Letzte Primzahl vor jedem Batch, nur innerhalb lückenlos aneinandergrenzender Batches
+        n = len(a["starts"])
+        breaks = np.ones(n, dtype=bool)
+        breaks[1:] = a["starts"][1:] != a["ends"][:-1] + 1
+        run_start = np.maximum.accumulate(np.where(breaks, np.arange(n), 0)) if n else np.zeros(0, dtype=np.int64)
+        seen_last = np.maximum.accumulate(a["lasts"]) if n else a["lasts"]
+        prev_last = np.full(n, NO_PRIME, dtype=np.int64)
+        prev_last[1:] = seen_last[:-1]
+        prev_last[prev_last < a["starts"][run_start]] = NO_PRIME
+        a["prev_last"] = prev_last
+        a["boundary_gaps"] = np.where((prev_last != NO_PRIME) & (a["firsts"] != NO_PRIME), a["firsts"] - prev_last, 0)
+        self.arrays = a
+        return a
+
+    def _edge(self, lo, hi):
+        # Zusammenfassung des Teils eines Batches, der in [lo, hi] liegt
+        return summarize(lo, hi, self.read_primes(lo, hi))
+
+    def query(self, lo, hi):
+        self.refresh()
+        with self.lock:
+            a = self.arrays if self.arrays is not None else self._build()
+        n = len(a["starts"])
+        # Batches i..j-1 liegen vollständig in [lo, hi]; davor bzw. dahinter ragt höchstens je einer hinein
+        i = int(np.searchsorted(a["starts"], lo, side="left"))
+        j = int(np.searchsorted(a["ends"], hi, side="right"))
+        left = right = None
+        if self.read_primes is not None:
+            if i > 0 and a["ends"][i - 1] >= lo:
+                left = self._edge(lo, min(int(a["ends"][i - 1]), hi))
+            if j < n and a["starts"][j] <= hi and not (left is not None and j == i - 1):
+                right = self._edge(int(a["starts"][j]), hi)
+        s = slice(i, max(i, j))
+        edges = [edge for edge in (left, right) if edge is not None]
+
+        result = {"from": lo, "to": hi, "batches": (s.stop - s.start) + len(edges), "partial_batches": len(edges),
+                  "range": None, "covered_numbers": 0, "complete": False,
+                  "prime_count": 0, "twin_pairs": 0, "max_gap": 0, "max_gap_after": None,
+                  "first_prime": None, "last_prime": None}
+        if not result["batches"]:
+            return result
+
+        first = left[0] if left else int(a["starts"][i])
+        last = right[1] if right else (int(a["ends"][s.stop - 1]) if s.stop > s.start else left[1])
+        # Grenz-Lücken nur zählen, wenn die vorherige Primzahl selbst im Bereich liegt
+        inside = a["prev_last"][s] >= first
+        boundary_gaps = np.where(inside, a["boundary_gaps"][s], 0)
+        gaps = [(int(a["max_gaps"][s].max(initial=0)), None), (int(boundary_gaps.max(initial=0)), None)]
+        if gaps[0][0]:
+            gaps[0] = (gaps[0][0], int(a["max_gap_after"][i + int(np.argmax(a["max_gaps"][s]))]))
+        if gaps[1][0]:
+            gaps[1] = (gaps[1][0], int(a["prev_last"][i + int(np.argmax(boundary_gaps))]))
+        twins = int(a["twins"][s].sum() + np.count_nonzero(boundary_gaps == 2))
+        for edge in edges:
+            twins += edge[3]
+            gaps.append((edge[4], edge[5]))
+        if right and right[6] is not None and a["prev_last"][j] >= first:
+            # Lücke zwischen der letzten Primzahl davor und der ersten im rechten Randstück
+            prev = int(a["prev_last"][j])
+            twins += right[6] - prev == 2
+            gaps.append((right[6] - prev, prev))
+
+        firsts = a["firsts"][s]
+        firsts = firsts[firsts != NO_PRIME]
+        first_primes = [left[6] if left else None, int(firsts[0]) if firsts.size else None, right[6] if right else None]
+        lasts = a["lasts"][s]
+        last_primes = [left[7] if left else None, int(lasts.max()) if lasts.size and lasts.max() != NO_PRIME else None,
+                       right[7] if right else None]
+        max_gap, max_gap_after = max(gaps, key=lambda gap: gap[0])
+        covered = int((a["ends"][s] - a["starts"][s] + 1).sum()) + sum(edge[1] - edge[0] + 1 for edge in edges)
+
+        result.update({
+            "range": [first, last],
+            "covered_numbers": covered,
+            "complete": covered == hi - lo + 1,
+            "prime_count": int(a["counts"][s].sum()) + sum(edge[2] for edge in edges),
+            "twin_pairs": twins,
+            "max_gap": max_gap,
+            "max_gap_after": max_gap_after if max_gap else None,
+            "first_prime": next((p for p in first_primes if p is not None), None),
+            "last_prime": next((p for p in reversed(last_primes) if p is not None), None)
+        })
+
+        # Vergleich mit dem Primzahlsatz für den tatsächlich abgedeckten Bereich
+        result["expected_count"] = round(log_integral(first, last), 2)
+        result["x_over_ln_x"] = round(x_over_ln_x(last) - x_over_ln_x(first - 1), 2)
+        return result
+
+    def __len__(self):
+        with self.lock:
+            return len(self.columns["starts"])
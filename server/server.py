@@ -1,35 +1,40 @@
-from flask import Flask, jsonify, request, send_file, session, redirect, url_for
-from threading import Lock, Timer
+from flask import Flask, Response, g, jsonify, request, send_file, session, redirect, url_for, make_response
+import threading
+from threading import Lock
 import json
 import time
 import signal
 import sys
 import os
-import zipfile
-import tempfile
-import subprocess
+from concurrent.futures import ThreadPoolExecutor
 from database import *
-from datetime import datetime
+from prime_store import PrimeStoreAppender, count_entries
+from coordinator import SharedCoordinator, claim_slot
+from batch_scheduler import BatchScheduler
+from journal import Journal
+from ingest import IngestPipeline
+from verification import Verifier
+from events import Broadcaster, KEEPALIVE_INTERVAL, LONG_POLL_TIMEOUT, format_event
+from prime_summary import PrimeSummary, summarize
+import prime_protocol
+import metrics
+from prime_index import PrimeIndex, RangeNotCovered
+from batch_sizing import next_batch_size, update_throughput
+from stats_store import StatsStore, RESOLUTIONS, parse_time
+from diagram_cache import DiagramCache, DIAGRAM_TYPES
+from clients import ActiveClients, DistinctClients, HyperLogLog
+from jobs import JobScheduler
 import io
-import base64
-import matplotlib
-matplotlib.use('Agg') 
-import matplotlib.pyplot as plt
-import matplotlib.dates as mdates
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 STATE_FILE = os.path.join(BASE_DIR, "server_state.json")
 STATS_LOG_FILE = os.path.join(BASE_DIR, "stats_log.json")
-PRIMES_FILE = os.path.join(BASE_DIR, "all_primes.txt")
-
-DIAGRAM_FILES = [
-    "clients_over_time.png",
-    "batches_over_time.png",
-    "primes_over_time.png",
-    "numbers_processed_over_time.png",
-    "processed_vs_primes.png",
-    "batches_vs_clients.png"
-]
+STATS_LOG_DIR = os.path.join(BASE_DIR, "stats_log")
+PRIMES_STORE_DIR = os.path.join(BASE_DIR, "primes")
+JOURNAL_DIR = os.path.join(BASE_DIR, "journal")
+WORKER_SLOT_DIR = os.path.join(BASE_DIR, "workers")
+# Gesetzt = Betrieb mit mehreren Prozessen, der gemeinsame Zustand liegt in dieser SQLite-Datei
+COORDINATOR_DB = os.environ.get("PRIME_COORDINATOR_DB")
 
 app = Flask(
     __name__,
@@ -41,10 +46,56 @@ app.secret_key = <secret_key>
 
 BATCH_SIZE = 100000  
 CLIENT_TIMEOUT = 20  # in Sek
-lock = Lock()
-current_number = 0 
-active_clients = {}  
-unique_clients = set()  
+CLIENT_EXPIRY_INTERVAL = 5  # in Sek
+STATS_LOG_INTERVAL = 60  # in Sek
+CHECKPOINT_INTERVAL = 60  # in Sek
+EXPORT_WORKERS = 2
+LEADERBOARD_MAX_LIMIT = 100
+LEADERBOARD_RELOAD_INTERVAL = 10  # in Sek, nur bei mehreren Prozessen
+ANALYTICS_MAX_PARTS = 200
+SUMMARY_BACKFILL_BATCH = 1000
+MAX_BATCHES_PER_REQUEST = 8
+LIVE_LEADERBOARD_SIZE = 10
+lock = metrics.TimedLock("state")
+
+
+def on_verification_result(record, user_id, verified, submitted_count, expected_count):
+    try:
+        record_verification(record["start"], record["end"], user_id, verified, submitted_count, expected_count,
+                            time.strftime("%Y-%m-%d %H:%M:%S"))
+    except Exception as e:
+        print(f"Fehler beim Speichern der Prüfung: {str(e)}")
+
+
+# Vor Journal, Ingest und Jobs anlegen: der Prüf-Pool forkt seine Prozesse dabei sofort
+verifier = Verifier(on_verification_result)
+
+scheduler = BatchScheduler()
+active_clients = ActiveClients(CLIENT_TIMEOUT)
+unique_clients = DistinctClients()
+snapshot_seq = 0
+
+if COORDINATOR_DB:
+    coordinator = SharedCoordinator(COORDINATOR_DB)
+    worker_slot, worker_slot_file = claim_slot(WORKER_SLOT_DIR)
+else:
+    coordinator = None
+    worker_slot = 0
+# Nur der Prozess in Slot 0 schreibt Statistik-Log und Snapshot
+primary = worker_slot == 0
+
+
+def peer_store_dirs():
+    dirs = [PRIMES_STORE_DIR] + [
+        os.path.join(PRIMES_STORE_DIR, name) for name in sorted(os.listdir(PRIMES_STORE_DIR)) if name.startswith("slot_")
+    ]
+    return [directory for directory in dirs if directory != prime_store.directory]
+
+
+# Jeder Prozess schreibt in seinen eigenen Speicher und liest die der anderen mit
+prime_store = PrimeStoreAppender(PRIMES_STORE_DIR if primary else os.path.join(PRIMES_STORE_DIR, f"slot_{worker_slot:02d}"))
+prime_index = PrimeIndex(prime_store, discover=peer_store_dirs)
+prime_summary = PrimeSummary(load_batch_summaries, prime_index.primes_between)
 
 stats = {
     "total_primes_found": 0,
@@ -56,60 +107,260 @@ stats = {
     "last_update": None
 }
 
-if os.path.exists(STATS_LOG_FILE):
-    with open(STATS_LOG_FILE, "r") as f:
-        stats_log = json.load(f)
-else:
-    stats_log = []
+stats_log = StatsStore(STATS_LOG_DIR, legacy_file=STATS_LOG_FILE, readonly=not primary)
+diagram_cache = DiagramCache(stats_log)
+export_pool = ThreadPoolExecutor(max_workers=EXPORT_WORKERS, thread_name_prefix="diagram-export")
+export_lock = Lock()
+export_job = None
 
 if os.path.exists(STATE_FILE):
     with open(STATE_FILE, "r") as f:
         state_data = json.load(f)
-        current_number = state_data.get("current_number", 0)
+        scheduler = BatchScheduler.from_dict(
+            state_data.get("scheduler", {}),
+            next_number=state_data.get("current_number", 0)
+        )
+        snapshot_seq = state_data.get("journal_seq", 0)
         loaded_stats = state_data.get("stats", {})
         for key in stats:
             if key in loaded_stats and key != "total_clients":
                 stats[key] = loaded_stats[key]
+        if "clients" in state_data:
+            unique_clients = DistinctClients.from_dict(state_data["clients"])
+            stats["total_clients"] = unique_clients.count()
+
+journal = Journal(JOURNAL_DIR, start_seq=snapshot_seq)
+
+def apply_journal_record(record):
+    if record["op"] == "lease":
+        scheduler.restore_lease(record["start"], record["end"], record["deadline"])
+    elif record["op"] == "complete":
+        # Abschlüsse können bereits im Snapshot enthalten sein
+        if scheduler.is_completed(record["start"], record["end"]):
+            return
+        scheduler.complete(record["start"], record["end"])
+        stats["total_primes_found"] += record["primes"]
+        stats["highest_prime_found"] = max(stats["highest_prime_found"], record["highest"])
+        stats["total_numbers_processed"] += record["numbers"]
+        stats["total_batches_completed"] += 1
+        stats["last_update"] = record["time"]
+        if "client" in record:
+            # Im Journal steht nur die Register-Position im Client-Sketch, nicht die IP
+            seen = time.mktime(time.strptime(record["time"], "%Y-%m-%d %H:%M:%S"))
+            if unique_clients.update(*record["client"], seen):
+                stats["total_clients"] = unique_clients.count()
+    elif record["op"] == "reopen":
+        # Nicht gespeicherter Batch; die höchste Primzahl bleibt stehen
+        if not scheduler.reopen(record["start"], record["end"]):
+            return
+        stats["total_primes_found"] -= record["primes"]
+        stats["total_numbers_processed"] -= record["numbers"]
+        stats["total_batches_completed"] -= 1
+
+
+for record in journal.replay(snapshot_seq):
+    apply_journal_record(record)
+
+if coordinator and coordinator.import_state(scheduler, stats):
+    print("Bisheriger Zustand in den gemeinsamen Koordinator übernommen")
+
+
+def current_stats():
+    if coordinator:
+        return coordinator.stats(CLIENT_TIMEOUT)
+    return stats
+
+
+def live_snapshot():
+    # Läuft im Broadcaster-Thread, höchstens einmal pro Intervall
+    _version, top = get_leaderboard(0, LIVE_LEADERBOARD_SIZE)
+    return {"stats": dict(current_stats()), "leaderboard": leaderboard_rows(top)}
+
+
+def write_batches(jobs):
+    # -> Jobs, deren Batch nicht gespeichert werden konnte; die übrigen werden trotzdem geschrieben
+    summaries = []
+    failed = []
+    for job in jobs:
+        record, primes, user_id = job
+        try:
+            with metrics.STORE_SECONDS.time():
+                prime_store.append(record["start"], record["end"], primes)
+        except Exception as e:
+            print(f"Fehler beim Speichern von Batch {record['start']}-{record['end']}: {str(e)}")
+            failed.append(job)
+            continue
+        try:
+            summaries.append(summarize(record["start"], record["end"], primes))
+            verifier.maybe_submit(record, primes, user_id)
+            if user_id:
+                update_user_progress(user_id, record["primes"], record["numbers"])
+        except Exception as e:
+            print(f"Fehler bei der Nachbearbeitung von Batch {record['start']}-{record['end']}: {str(e)}")
+        if not coordinator:
+            journal.append(record)
+    try:
+        insert_batch_summaries(summaries)
+    except Exception as e:
+        # Fehlende Zusammenfassungen trägt backfill_summaries beim nächsten Start nach
+        print(f"Fehler beim Speichern der Zusammenfassungen: {str(e)}")
+    return failed
+
+
+def reopen_failed_batch(job):
+    # Endgültig nicht gespeichert: Bereich gilt nicht mehr als abgeschlossen und wird erneut vergeben
+    record = job[0]
+    reopen = {"op": "reopen", "start": record["start"], "end": record["end"],
+              "primes": record["primes"], "numbers": record["numbers"]}
+    if coordinator:
+        coordinator.reopen(reopen)
+    else:
+        with lock:
+            apply_journal_record(reopen)
+            journal.append(reopen)
+    print(f"Batch {record['start']}-{record['end']} nicht gespeichert, Bereich wird erneut vergeben")
+
+
+def backfill_summaries():
+    # Batches, die vor Einführung der Zusammenfassungen gespeichert wurden; ist nichts
+    # nachzutragen, bleibt der Index ungeladen
+    stored = sum(count_entries(directory) for directory in [prime_store.directory] + peer_store_dirs())
+    if count_batch_summaries() >= stored:
+        return
+    known = get_summarized_starts()
+    prime_index.refresh()
+    with prime_index.lock:
+        entries = [entry for entry in prime_index.entries if entry[0] not in known]
+    summaries = []
+    for entry in entries:
+        summaries.append(summarize(entry[0], entry[1], prime_index.read_block(entry)))
+        if len(summaries) >= SUMMARY_BACKFILL_BATCH:
+            insert_batch_summaries(summaries)
+            summaries = []
+    if summaries:
+        insert_batch_summaries(summaries)
+    if entries:
+        print(f"Zusammenfassungen für {len(entries)} Batches nachgetragen")
+
+
+ingest = IngestPipeline(write_batches, reopen_failed_batch)
+broadcaster = Broadcaster(live_snapshot)
 
 
 def save_state():
-    with open(STATE_FILE, "w") as f:
-        json.dump({"current_number": current_number, "stats": stats}, f)
+    if coordinator:
+        save_shared_state()
+        return
+
+    with lock:
+        snapshot = json.dumps({
+            "current_number": scheduler.next_number,
+            "stats": stats,
+            "scheduler": scheduler.to_dict(),
+            "clients": unique_clients.to_dict(),
+            "journal_seq": journal.seq
+        })
+        generation = journal.rotate()
+        ingest_ticket = ingest.enqueued
+
+    # Alle im Snapshot gezählten Batches müssen bereits gespeichert sein
+    ingest.wait_processed(ingest_ticket)
+
+    temp_path = STATE_FILE + ".tmp"
+    with open(temp_path, "w") as f:
+        f.write(snapshot)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, STATE_FILE)
+    journal.discard_until(generation)
+
+
+def save_shared_state():
+    ingest.wait_processed(ingest.enqueued)
+    prime_store.flush()
+    if not primary:
+        return
+    # Snapshot im gewohnten Format, damit auch wieder ein einzelner Prozess starten kann
+    snapshot = coordinator.export_state()
+    snapshot["journal_seq"] = journal.seq
+    temp_path = STATE_FILE + ".tmp"
+    with open(temp_path, "w") as f:
+        json.dump(snapshot, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, STATE_FILE)
 
 
 def save_stats_log():
+    if not primary:
+        return
+    current = current_stats()
     timestamp = time.strftime("%Y-%m-%d %H:%M:%S")
 
-    if stats_log and stats_log[-1]["timestamp"][:16] == timestamp[:16]: 
-        return  
-
     stats_log.append({
         "timestamp": timestamp,
-        "total_primes_found": stats["total_primes_found"],
-        "total_batches_completed": stats["total_batches_completed"],
-        "active_clients": stats["active_clients"],
-        "total_numbers_processed": stats["total_numbers_processed"]
+        "total_primes_found": current["total_primes_found"],
+        "total_batches_completed": current["total_batches_completed"],
+        "active_clients": current["active_clients"],
+        "total_numbers_processed": current["total_numbers_processed"]
     })
-    
-    with open(STATS_LOG_FILE, "w") as f:
-        json.dump(stats_log, f, indent=4)
 
 
-def cleanup_inactive_clients():
-    current_time = time.time()
+def expire_inactive_clients():
     with lock:
-        inactive = [ip for ip, last in active_clients.items() if current_time - last > CLIENT_TIMEOUT]
-        for ip in inactive:
-            del active_clients[ip]
-        
-        stats["active_clients"] = len(active_clients)
-    
-    Timer(60, cleanup_inactive_clients).start()
+        if active_clients.expire(time.time()):
+            stats["active_clients"] = len(active_clients)
 
 
-def periodic_save():
-    save_stats_log()
-    Timer(60, periodic_save).start()
+def sync_shared_clients():
+    # Sketch dieses Prozesses in den gemeinsamen übernehmen, danach abgelaufene Clients löschen
+    with lock:
+        sketch = HyperLogLog(registers=unique_clients.total.registers)
+    sketch = coordinator.merge_client_sketch(sketch)
+    with lock:
+        unique_clients.total.merge(sketch)
+    coordinator.prune_clients(time.time() - CLIENT_TIMEOUT)
+
+
+def reload_leaderboard():
+    # Fortschritt anderer Prozesse landet nur in der Datenbank
+    flush_user_progress()
+    load_leaderboard()
+
+
+def check_primes(primes, batch_range):
+    # -> Fehlermeldung oder None; der Bereich wird nie an die Primzahlen angepasst
+    lo, hi = batch_range
+    # Wie beim Binärformat nur nicht-negative ganze Zahlen (bool ist in Python ein int)
+    if any(type(p) is not int or p < 0 for p in primes):
+        return "Primzahlen müssen nicht-negative ganze Zahlen sein"
+    if any(a >= b for a, b in zip(primes, primes[1:])):
+        return "Primzahlen müssen streng aufsteigend sein"
+    if primes and (primes[0] < lo or primes[-1] > hi):
+        return "Primzahlen außerhalb des Bereichs"
+    return None
+
+
+def parse_range(value):
+    if isinstance(value, (list, tuple)) and len(value) == 2 and all(type(v) is int for v in value):
+        if 0 <= value[0] <= value[1]:
+            return value[0], value[1]
+    return None
+
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+
+@app.after_request
+def record_request_metrics(response):
+    started = g.pop('request_started', None)
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        metrics.REQUEST_SECONDS.observe(time.perf_counter() - started, route=route, method=request.method)
+        metrics.REQUESTS_TOTAL.inc(route=route, method=request.method, status=response.status_code)
+    return response
 
 
 @app.route('/')
@@ -155,137 +406,480 @@ def user_progress():
     
     progress = get_user_progress(session['user_id'])
     if progress:
+        verification = get_user_verification(session['user_id'])
         return jsonify({
             "total_primes_found": progress[0],
-            "total_numbers_processed": progress[1]
+            "total_numbers_processed": progress[1],
+            "batches_verified": verification[0] or 0,
+            "batches_rejected": verification[1] or 0
         })
     return jsonify({"error": "Fortschritt nicht gefunden"}), 404
 
-@app.route('/get_batch')
-def get_batch():
-    global current_number
+def lease_batches(batch_size, client_ip, count=1):
+    if coordinator:
+        return coordinator.acquire_many(batch_size, count, client_ip)
+
     with lock:
-        batch_size = session.get('batch_size', BATCH_SIZE)
-        
-        batch_range = (current_number, current_number + batch_size - 1)
-        current_number += batch_size
+        ranges = []
+        for _ in range(count):
+            batch_range = scheduler.acquire(batch_size, client_ip)
+            journal.append({
+                "op": "lease",
+                "start": batch_range[0],
+                "end": batch_range[1],
+                "deadline": scheduler.leases[batch_range[0]][1]
+            })
+            ranges.append(batch_range)
 
-        client_ip = request.remote_addr
         if client_ip:
-            active_clients[client_ip] = time.time()
+            active_clients.touch(client_ip, time.time())
             stats["active_clients"] = len(active_clients)
+        return ranges
 
-        save_state()
-        return jsonify({
-            "range": batch_range,
-            "size": batch_size
-        })
+
+def session_batch_size():
+    batch_size = session.get('batch_size')
+    if not batch_size:
+        batch_size = next_batch_size(session.get('throughput'), session.get('adaptive_size'))
+        session['adaptive_size'] = batch_size
+    return batch_size
+
+
+def parse_batch_count(default=1):
+    try:
+        count = int(request.args.get('n', default))
+    except ValueError:
+        return None
+    return count if 0 <= count <= MAX_BATCHES_PER_REQUEST else None
+
+
+def hand_out_batches(count):
+    if not count:
+        return []
+    ranges = lease_batches(session_batch_size(), request.remote_addr, count)
+    # Ohne Bereich in der Abgabe gilt der zuletzt einzeln ausgegebene Bereich
+    if len(ranges) == 1:
+        session['batch_range'] = ranges[0]
+    else:
+        session.pop('batch_range', None)
+    adaptive = 'batch_size' not in session
+    return [{"range": r, "size": r[1] - r[0] + 1, "adaptive": adaptive} for r in ranges]
+
+
+@app.route('/get_batch')
+def get_batch():
+    return jsonify(hand_out_batches(1)[0])
+
+
+@app.route('/get_batches')
+def get_batches():
+    count = parse_batch_count()
+    if count is None:
+        return jsonify({"error": f"n muss zwischen 0 und {MAX_BATCHES_PER_REQUEST} liegen"}), 400
+    return jsonify({"batches": hand_out_batches(count)})
+
+
+def accept_submission():
+    # -> (Antwort, Statuscode)
+    session_range = session.pop('batch_range', None)
+    batch_range = tuple(session_range) if session_range else None
+    binary = request.mimetype == prime_protocol.MIMETYPE
+    metrics.SUBMIT_PAYLOAD_BYTES.observe(request.content_length or 0, format="binary" if binary else "json")
+    if binary:
+        # Bleibt ein NumPy-Array; Reihenfolge und Bereich prüft decode_submission bereits vektorisiert
+        try:
+            batch_range, data = prime_protocol.decode_submission(request.get_data(cache=False))
+        except prime_protocol.ProtocolError as e:
+            return {"error": str(e)}, 400
+    else:
+        data = request.get_json()
+        if isinstance(data, dict):
+            batch_range = parse_range(data.get('range')) or batch_range
+            data = data.get('primes')
+        if not isinstance(data, list):
+            return {"error": "Invalid data format. Expected a JSON array."}, 400
+        if not batch_range:
+            return {"error": "Bereich der Abgabe fehlt"}, 400
+        error = check_primes(data, batch_range)
+        if error:
+            return {"error": error}, 400
+
+    # Gezählt wird nur der vergebene Bereich
+    batch_size = batch_range[1] - batch_range[0] + 1
+    # Auch nach einem Wechsel der IP-Adresse gehört der zuletzt ausgegebene Bereich dieser Sitzung
+    owned = session_range is not None and tuple(session_range) == tuple(batch_range)
+    record = {
+        "op": "complete",
+        "start": batch_range[0],
+        "end": batch_range[1],
+        "primes": len(data),
+        "highest": int(data[-1]) if len(data) else 0,
+        "numbers": batch_size,
+        "time": time.strftime("%Y-%m-%d %H:%M:%S")
+    }
+
+    if not ingest.reserve():
+        return {"error": "Server ausgelastet, bitte später erneut senden"}, 503
+
+    if coordinator:
+        result, deadline = coordinator.complete(record, request.remote_addr, owned)
+        if result == "completed":
+            ingest.put((record, data, session.get('user_id')))
+            leased_at = deadline - coordinator.lease_timeout
+            if request.remote_addr:
+                with lock:
+                    unique_clients.add(request.remote_addr, time.time())
+    else:
+        result, leased_at = complete_batch(record, data, owned)
+    if result == "duplicate":
+        ingest.release()
+        return {"status": "duplicate"}, 200
+    if result == "not_leased":
+        ingest.release()
+        return {"error": "Dieser Bereich ist nicht an diesen Client vergeben"}, 409
+
+    # Mit vorgeholten Batches beginnt die Rechnung erst nach der vorherigen Abgabe
+    now = time.time()
+    elapsed = now - max(leased_at, session.get('last_submit', 0))
+    session['throughput'] = update_throughput(session.get('throughput'), batch_size, elapsed)
+    session['last_submit'] = now
+    return {"status": "success"}, 200
+
+
+def submission_response(result, status):
+    response = jsonify(result)
+    if status == 503:
+        response.headers["Retry-After"] = "5"
+    return response, status
 
 
 @app.route('/submit_primes', methods=['POST'])
 def submit_primes():
-    global unique_clients
-    data = request.get_json()
-    if not data or not isinstance(data, list):
-        return jsonify({"error": "Invalid data format. Expected a JSON array."}), 400
+    return submission_response(*accept_submission())
+
 
+@app.route('/submit_and_fetch', methods=['POST'])
+def submit_and_fetch():
+    # Abgabe und nächste Batches in einer Anfrage, n = Anzahl neuer Batches (Standard 1)
+    count = parse_batch_count()
+    if count is None:
+        return jsonify({"error": f"n muss zwischen 0 und {MAX_BATCHES_PER_REQUEST} liegen"}), 400
+    result, status = accept_submission()
+    if status == 200:
+        result["batches"] = hand_out_batches(count)
+        result["highest_prime_found"] = current_stats().get("highest_prime_found")
+    return submission_response(result, status)
+
+
+def complete_batch(record, data, owned):
+    # -> ("completed" | "duplicate" | "not_leased", Zeitpunkt der Lease-Vergabe)
+    client_ip = request.remote_addr
     with lock:
-        stats["total_primes_found"] += len(data)
-        if data: 
-            stats["highest_prime_found"] = max(data)
-        
-        batch_size = session.get('batch_size', BATCH_SIZE)
-        stats["total_numbers_processed"] += batch_size
-        stats["total_batches_completed"] += 1
+        if scheduler.is_completed(record["start"], record["end"]):
+            return "duplicate", None
+
+        # Nur genau vergebene Bereiche annehmen; Leases aus einem Snapshot haben keinen Client
+        lease = scheduler.leases.get(record["start"])
+        if not lease or lease[0] != record["end"] or not (owned or lease[2] in (None, client_ip)):
+            return "not_leased", None
+        leased_at = lease[1] - scheduler.lease_timeout
 
-        client_ip = request.remote_addr
         if client_ip:
-            active_clients[client_ip] = time.time()
+            record["client"] = list(unique_clients.position(client_ip))
+            active_clients.touch(client_ip, time.time())
             stats["active_clients"] = len(active_clients)
+        apply_journal_record(record)
 
-        client_ip = request.remote_addr
-        if client_ip:
-            if client_ip not in unique_clients:
-                unique_clients.add(client_ip)
-                stats["total_clients"] = len(unique_clients)
-    
-        stats["last_update"] = time.strftime("%Y-%m-%d %H:%M:%S")
+        ingest.put((record, data, session.get('user_id')))
+    return "completed", leased_at
 
-        save_state()
-        save_stats_log()
 
-        with open(PRIMES_FILE, "a") as f:
-            for prime in data:
-                f.write(f"{prime}\n")
+@app.route('/get_stats')
+def get_stats():
+    return jsonify(current_stats())
 
-        if 'user_id' in session:
-            update_user_progress(session['user_id'], len(data), batch_size)
 
-    return jsonify({"status": "success"})
+@app.route('/metrics')
+def get_metrics():
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
 
 
-@app.route('/get_stats')
-def get_stats():
-    return jsonify(stats)
+@app.route('/get_ingest_stats')
+def get_ingest_stats():
+    return jsonify(ingest.metrics())
+
+
+@app.route('/get_event_stats')
+def get_event_stats():
+    return jsonify(broadcaster.metrics())
+
+
+@app.route('/get_job_stats')
+def get_job_stats():
+    return jsonify(jobs.metrics())
+
+
+@app.route('/get_client_stats')
+def get_client_stats():
+    if coordinator:
+        current = coordinator.stats(CLIENT_TIMEOUT)
+        return jsonify({"active_clients": current["active_clients"], "total_clients": current["total_clients"]})
+    with lock:
+        return jsonify({
+            "active_clients": len(active_clients),
+            "total_clients": unique_clients.count(),
+            "windows": unique_clients.window_counts(time.time())
+        })
+
+
+@app.route('/get_verification_stats')
+def get_verification_stats():
+    verified, rejected, rejections = get_verification_summary()
+    result = verifier.metrics()
+    result.update({
+        "total_verified": verified,
+        "total_rejected": rejected,
+        "recent_rejections": [{
+            "range": [row[0], row[1]],
+            "username": row[2],
+            "submitted_count": row[3],
+            "expected_count": row[4],
+            "checked_at": row[5]
+        } for row in rejections]
+    })
+    return jsonify(result)
+
+
+@app.route('/get_scheduler_stats')
+def get_scheduler_stats():
+    if coordinator:
+        return jsonify(coordinator.scheduler_stats())
+    with lock:
+        return jsonify({
+            "next_number": scheduler.next_number,
+            "outstanding_leases": scheduler.outstanding(),
+            "completed_ranges": len(scheduler.completed),
+            "lease_timeout": scheduler.lease_timeout
+        })
+
+
+@app.route('/is_prime')
+def is_prime():
+    n = request.args.get('n', type=int)
+    if n is None or n < 0:
+        return jsonify({"error": "Parameter n fehlt oder ist ungültig"}), 400
+    try:
+        return jsonify({"n": n, "is_prime": prime_index.is_prime(n)})
+    except RangeNotCovered as e:
+        return jsonify({"error": str(e)}), 404
+
+
+@app.route('/pi')
+def prime_pi():
+    x = request.args.get('x', type=int)
+    if x is None:
+        return jsonify({"error": "Parameter x fehlt oder ist ungültig"}), 400
+    try:
+        return jsonify({"x": x, "pi": prime_index.pi(x)})
+    except RangeNotCovered as e:
+        return jsonify({"error": str(e)}), 404
+
+
+@app.route('/nth_prime')
+def nth_prime():
+    k = request.args.get('k', type=int)
+    if k is None or k < 1:
+        return jsonify({"error": "Parameter k fehlt oder ist ungültig"}), 400
+    try:
+        return jsonify({"k": k, "prime": prime_index.nth_prime(k)})
+    except RangeNotCovered as e:
+        return jsonify({"error": str(e)}), 404
+
+
+@app.route('/primes')
+def list_primes():
+    lo = request.args.get('from', type=int)
+    hi = request.args.get('to', type=int)
+    if lo is None or hi is None or lo > hi:
+        return jsonify({"error": "Parameter from/to fehlen oder sind ungültig"}), 400
+
+    def generate():
+        for chunk in prime_index.iter_primes(lo, hi):
+            if chunk:
+                yield "\n".join(map(str, chunk)) + "\n"
+
+    return Response(generate(), mimetype="text/plain")
+
+
+def parse_analytics_range():
+    lo = request.args.get('from', type=int)
+    hi = request.args.get('to', type=int)
+    if lo is None or hi is None or lo < 0 or lo > hi:
+        return None
+    return lo, hi
+
+
+@app.route('/analytics/summary')
+def analytics_summary():
+    bounds = parse_analytics_range()
+    if bounds is None:
+        return jsonify({"error": "Parameter from/to fehlen oder sind ungültig"}), 400
+    return jsonify(prime_summary.query(*bounds))
+
+
+@app.route('/analytics/intervals')
+def analytics_intervals():
+    bounds = parse_analytics_range()
+    parts = request.args.get('parts', 10, type=int)
+    if bounds is None or not 1 <= parts <= ANALYTICS_MAX_PARTS:
+        return jsonify({"error": "Parameter from/to/parts fehlen oder sind ungültig"}), 400
+
+    lo, hi = bounds
+    width = -(-(hi - lo + 1) // parts)
+    return jsonify([
+        prime_summary.query(start, min(start + width - 1, hi))
+        for start in range(lo, hi + 1, width)
+    ])
+
+
+def live_payload(seq, snapshot, user_id):
+    payload = {"seq": seq, **snapshot}
+    rank = get_user_rank(user_id) if user_id else None
+    if rank:
+        payload["user"] = {
+            "rank": rank[0],
+            "total_numbers_processed": rank[2],
+            "total_primes_found": rank[3]
+        }
+    return payload
+
+
+@app.route('/events')
+def events():
+    # SSE-Stream, mit ?since=<seq> stattdessen Long-Poll (eine JSON-Antwort pro Änderung)
+    user_id = session.get('user_id')
+    since = request.args.get('since', type=int)
+    stream = since is None and request.accept_mimetypes.best == "text/event-stream"
+    if not broadcaster.subscribe():
+        response = jsonify({"error": "Zu viele Verbindungen, bitte später erneut versuchen"})
+        response.headers["Retry-After"] = "30"
+        return response, 503
+
+    if not stream:
+        try:
+            seq, snapshot = broadcaster.wait(since or 0, LONG_POLL_TIMEOUT)
+        finally:
+            broadcaster.unsubscribe()
+        if snapshot is None:
+            return jsonify({"seq": seq})
+        return jsonify(live_payload(seq, snapshot, user_id))
+
+    def generate():
+        try:
+            seq = 0
+            while True:
+                latest, snapshot = broadcaster.wait(seq, KEEPALIVE_INTERVAL)
+                if snapshot is None:
+                    yield ": keepalive\n\n"
+                    continue
+                seq = latest
+                yield format_event(seq, live_payload(seq, snapshot, user_id))
+        finally:
+            broadcaster.unsubscribe()
+
+    response = Response(generate(), mimetype="text/event-stream")
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
 
 
 @app.route('/get_stats_log')
 def get_stats_log():
-    return jsonify(stats_log)
+    resolution = request.args.get('resolution', 'minute')
+    if resolution not in RESOLUTIONS:
+        return jsonify({"error": "Ungültige Auflösung"}), 400
+    try:
+        since = parse_time(request.args.get('since'))
+        until = parse_time(request.args.get('until'))
+    except (ValueError, OverflowError, OSError):
+        # z.B. since=inf oder 1e20: localtime() kann solche Zeitpunkte nicht darstellen
+        return jsonify({"error": "Ungültiger Zeitpunkt"}), 400
+
+    return jsonify(stats_log.query(since, until, resolution))
+
+def leaderboard_rows(rows):
+    return [{
+        "rank": row[0],
+        "username": row[1],
+        "numbers_processed": row[2],
+        "primes_found": row[3]
+    } for row in rows]
+
 
 @app.route('/leaderboard')
 def leaderboard():
-    leaderboard_data = get_leaderboard()
-    return jsonify([{
-        "username": row[0],
-        "numbers_processed": row[1],
-        "primes_found": row[2]
-    } for row in leaderboard_data])
+    offset = request.args.get('offset', 0, type=int)
+    limit = request.args.get('limit', 10, type=int)
+    if offset < 0 or not 1 <= limit <= LEADERBOARD_MAX_LIMIT:
+        return jsonify({"error": "Ungültige Seite"}), 400
+
+    version, leaderboard_data = get_leaderboard(offset, limit)
+    response = jsonify(leaderboard_rows(leaderboard_data))
+    response.set_etag(f"{version}-{offset}-{limit}")
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+@app.route('/leaderboard/rank')
+def leaderboard_rank():
+    if 'user_id' not in session:
+        return jsonify({"error": "Nicht angemeldet"}), 401
+
+    rank = get_user_rank(session['user_id'])
+    if rank is None:
+        return jsonify({"error": "Fortschritt nicht gefunden"}), 404
+    return jsonify({
+        "rank": rank[0],
+        "username": rank[1],
+        "numbers_processed": rank[2],
+        "primes_found": rank[3]
+    })
+
+def render_diagram_export():
+    # Plot-Modul erst hier laden, damit matplotlib nur bei Bedarf im Speicher liegt
+    from create_diagrams import render_all, build_zip
+    _version, timestamps, data = diagram_cache.series()
+    return build_zip(render_all(timestamps, data))
+
+
+def get_diagram_export():
+    global export_job
+    version = stats_log.version
+    with export_lock:
+        # Gleichzeitige Downloads desselben Stands teilen sich einen Render-Auftrag
+        if export_job is None or export_job[0] != version:
+            export_job = (version, export_pool.submit(render_diagram_export))
+        job = export_job
+
+    try:
+        return job[1].result()
+    except Exception:
+        with export_lock:
+            if export_job is job:
+                export_job = None
+        raise
+
 
 @app.route('/generate_diagrams')
 def generate_diagrams():
     try:
-        result = subprocess.run(
-            ["python", "create_diagrams.py"],
-            capture_output=True,
-            text=True,
-            cwd=BASE_DIR
-        )
-        
-        if result.returncode != 0:
-            return f"Fehler: {result.stderr}", 500
-
-        temp_zip = tempfile.NamedTemporaryFile(delete=False, suffix=".zip")
-        zip_path = temp_zip.name
-
-        with zipfile.ZipFile(zip_path, 'w') as zipf:
-            for diagram in DIAGRAM_FILES:
-                full_path = os.path.join(BASE_DIR, diagram)
-                if os.path.exists(full_path):
-                    zipf.write(full_path, diagram)
-
-        def cleanup():
-            try:
-                if os.path.exists(zip_path):
-                    os.remove(zip_path)
-                
-                for diagram in DIAGRAM_FILES:
-                    file_path = os.path.join(BASE_DIR, diagram)
-                    if os.path.exists(file_path):
-                        os.remove(file_path)
-            except Exception as e:
-                print(f"Cleanup error: {str(e)}")
-
-        response = send_file(
-            zip_path,
+        zip_data = get_diagram_export()
+        return send_file(
+            io.BytesIO(zip_data),
             mimetype='application/zip',
             as_attachment=True,
             download_name='diagramme.zip'
         )
 
-        response.call_on_close(cleanup)
-        return response
-
     except Exception as e:
         return f"Kritischer Fehler: {str(e)}", 500
     
@@ -293,6 +887,10 @@ def generate_diagrams():
 def set_batch_size():
     data = request.get_json()
     size = data.get('size')
+
+    if size == 'auto':
+        session.pop('batch_size', None)
+        return jsonify({"status": "success"})
     
     if size not in [100, 500, 1000, 5000, 10000, 50000, 100000, 500000, 1000000, 1500000, 2000000, 2500000, 3000000, 3500000, 4000000, 4500000, 5000000]:
         return jsonify({"error": "Ungültige Batch-Größe"}), 400
@@ -303,104 +901,55 @@ def set_batch_size():
 
 @app.route('/diagram_live_all')
 def diagram_live_all():
-    import io
-    import base64
-    import matplotlib
-    matplotlib.use("Agg")
-    import matplotlib.pyplot as plt
-    import matplotlib.dates as mdates
-    from matplotlib import rcParams
-
     try:
-        with open(STATS_LOG_FILE, "r") as f:
-            stats = json.load(f)
-
-        timestamps = [datetime.strptime(entry["timestamp"], "%Y-%m-%d %H:%M:%S") for entry in stats]
-        data = {
-            "clients": [entry["active_clients"] for entry in stats],
-            "batches": [entry["total_batches_completed"] for entry in stats],
-            "primes": [entry["total_primes_found"] for entry in stats],
-            "numbers": [entry["total_numbers_processed"] for entry in stats]
-        }
+        diagrams = diagram_cache.get_all()
+        return jsonify({diagram_type: diagram.base64 for diagram_type, diagram in diagrams.items()})
 
-        diagram_types = [
-            "clients",
-            "batches",
-            "primes",
-            "numbers",
-            "processed_vs_primes",
-            "batches_vs_clients"
-        ]
-
-        def create_diagram(diagram_type):
-            fig = plt.figure(figsize=(10, 5))
-            ax = fig.add_subplot(111)
-            ax.xaxis.set_major_formatter(mdates.DateFormatter("%d.%m %H:%M"))
-            plt.xticks(rotation=45)
-            plt.tight_layout()
-            rcParams.update({'figure.autolayout': True})
-            plt.autoscale()
-
-
-            if diagram_type == "clients":
-                ax.plot(timestamps, data["clients"], "b-o", linewidth=2)
-                ax.set_title("Aktive Clients über die Zeit")
-                ax.set_ylabel("Anzahl Clients")
-
-            elif diagram_type == "batches":
-                ax.plot(timestamps, data["batches"], "g--s", linewidth=2)
-                ax.set_title("Abgeschlossene Batches")
-                ax.set_ylabel("Anzahl Batches")
-
-            elif diagram_type == "primes":
-                ax.plot(timestamps, data["primes"], "r-^", linewidth=2)
-                ax.set_title("Gefundene Primzahlen")
-                ax.set_ylabel("Anzahl Primzahlen")
-
-            elif diagram_type == "numbers":
-                ax.plot(timestamps, data["numbers"], "m-D", linewidth=2)
-                ax.set_title("Verarbeitete Zahlen")
-                ax.set_ylabel("Anzahl Zahlen")
-
-            elif diagram_type == "processed_vs_primes":
-                ax.plot(timestamps, data["numbers"], "m--", label="Verarbeitete Zahlen", linewidth=2)
-                ax.plot(timestamps, data["primes"], "r-", label="Gefundene Primzahlen", linewidth=2)
-                ax.set_title("Effizienzvergleich")
-                ax.set_ylabel("Anzahl")
-                ax.legend()
-
-            elif diagram_type == "batches_vs_clients":
-                ax.plot(timestamps, data["batches"], "g-", label="Batches", linewidth=2)
-                ax.plot(timestamps, data["clients"], "b--", label="Aktive Clients", linewidth=2)
-                ax.set_title("Auslastung der Clients")
-                ax.set_ylabel("Anzahl")
-                ax.legend()
-
-            ax.set_xlabel("Zeit")
-            ax.grid(True, alpha=0.3)
-
-            buf = io.BytesIO()
-            plt.savefig(buf, format="png", bbox_inches="tight")
-            plt.close(fig)
-            buf.seek(0)
-            return base64.b64encode(buf.read()).decode("utf-8")
-
-        images = {dtype: create_diagram(dtype) for dtype in diagram_types}
-        return jsonify(images)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
 
+
+@app.route('/diagram/<diagram_type>.png')
+def diagram_png(diagram_type):
+    if diagram_type not in DIAGRAM_TYPES:
+        return jsonify({"error": "Unbekanntes Diagramm"}), 404
+    try:
+        diagram = diagram_cache.get(diagram_type)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+    response = make_response(diagram.png)
+    response.mimetype = "image/png"
+    response.set_etag(diagram.etag)
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
 def signal_handler(sig, frame):
     print("\nFlask-Server wird beendet...")
+    jobs.stop()
     save_state()
     save_stats_log()
+    flush_user_progress()
+    verifier.close()
+    stats_log.close()
+    journal.close()
+    prime_store.close()
     sys.exit(0)
 
 signal.signal(signal.SIGINT, signal_handler)
-
-periodic_save()
-cleanup_inactive_clients()
+signal.signal(signal.SIGTERM, signal_handler)
+
+jobs = JobScheduler()
+jobs.add("save_stats_log", save_stats_log, STATS_LOG_INTERVAL)
+jobs.add("save_state", save_state, CHECKPOINT_INTERVAL)
+if coordinator:
+    jobs.add("reload_leaderboard", reload_leaderboard, LEADERBOARD_RELOAD_INTERVAL, delay=LEADERBOARD_RELOAD_INTERVAL)
+    jobs.add("sync_clients", sync_shared_clients, CLIENT_EXPIRY_INTERVAL)
+else:
+    jobs.add("expire_clients", expire_inactive_clients, CLIENT_EXPIRY_INTERVAL, delay=CLIENT_EXPIRY_INTERVAL)
+jobs.start()
+if primary:
+    threading.Thread(target=backfill_summaries, name="summary-backfill", daemon=True).start()
 
 if __name__ == '__main__':
     print("Flask wurde gestartet!")
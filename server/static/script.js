@@ -43,37 +43,84 @@ function stopCalculation() {
     logMessage("⛔ Berechnung wurde gestoppt.");
 }
 
+// Dauerbetrieb: kleiner Vorrat an Batches, jede Abgabe holt über /submit_and_fetch
+// gleich den Nachschub, und das nächste Batch startet ohne Pause
+const BATCH_QUEUE_SIZE = 2;
+const RETRY_DELAY_MS = 1000;
+let batchQueue = [];
+let requestedBatches = 0;
+
+function batchesWanted() {
+    const planned = batchQueue.length + requestedBatches;
+    let wanted = BATCH_QUEUE_SIZE - planned;
+    if (remainingBatches >= 0) {
+        wanted = Math.min(wanted, remainingBatches - planned);
+    }
+    return isRunning ? Math.max(wanted, 0) : 0;
+}
+
+function takeBatch() {
+    if (batchQueue.length > 0) {
+        return Promise.resolve(batchQueue.shift());
+    }
+    const count = Math.max(batchesWanted(), 1);
+    requestedBatches += count;
+    return fetch(`/get_batches?n=${count}`)
+        .then(response => response.json())
+        .then(data => {
+            batchQueue.push(...data.batches);
+            return batchQueue.shift();
+        })
+        .finally(() => {
+            requestedBatches -= count;
+        });
+}
+
 function processBatches() {
     if (!isRunning || (remainingBatches === 0)) {
         stopCalculation();
         return;
     }
 
-    calculateBatch(() => {
-        if (remainingBatches > 0) {
-            remainingBatches--;
-            updateStatus(`Noch ${remainingBatches} Batches...`);
-        }
+    takeBatch()
+        .then(batch => computeBatch(batch))
+        .then(({range, primes}) => {
+            if (remainingBatches > 0) {
+                remainingBatches--;
+                updateStatus(`Noch ${remainingBatches} Batches...`);
+            }
+            const submitted = submitAndFetch(primes, range, batchesWanted());
+            // Liegt schon ein Batch bereit, sofort weiterrechnen, sonst auf den Nachschub warten
+            if (batchQueue.length > 0) {
+                processBatches();
+            } else {
+                submitted.then(processBatches);
+            }
+        })
+        .catch(error => {
+            console.error("Fehler beim Abrufen des Batches:", error);
+            updateStatus("Fehler beim Abrufen des Batches!");
+            setTimeout(processBatches, RETRY_DELAY_MS);
+        });
+}
 
-        if (isRunning && (remainingBatches > 0 || remainingBatches === -1)) {
-            setTimeout(processBatches, 100);
-        } else {
-            stopCalculation();
-        }
+function computeBatch(batch) {
+    const [start, end] = batch.range;
+    document.getElementById('currentBatchSize').textContent = batch.size;
+    logMessage(`Erhaltenes Batch (${batch.size} Zahlen): ${start} bis ${end}`);
+    const startedAt = performance.now();
+    return findPrimesParallel(start, end).then(primes => {
+        const seconds = Math.max((performance.now() - startedAt) / 1000, 0.001);
+        logMessage(`Gefundene Primzahlen: ${primes.length} (${Math.round(batch.size / seconds).toLocaleString()} Zahlen/s)`);
+        return {range: batch.range, primes};
     });
 }
 
 function calculateBatch(callback) {
     fetch("/get_batch")
         .then(response => response.json())
-        .then(data => {
-            const [start, end] = data.range;
-            document.getElementById('currentBatchSize').textContent = data.size;
-            logMessage(`Erhaltenes Batch (${data.size} Zahlen): ${start} bis ${end}`);
-            const primes = findPrimes(start, end);
-            logMessage("Gefundene Primzahlen: " + primes.length);
-            submitPrimes(primes, callback);
-        })
+        .then(data => computeBatch(data))
+        .then(({range, primes}) => submitPrimes(primes, range, callback))
         .catch(error => {
             console.error("Fehler beim Abrufen des Batches:", error);
             updateStatus("Fehler beim Abrufen des Batches!");
@@ -81,6 +128,65 @@ function calculateBatch(callback) {
         });
 }
 
+const SIEVE_WORKER_COUNT = navigator.hardwareConcurrency || 4;
+let sieveWorkers = null;
+let sieveJobId = 0;
+const sieveJobs = new Map();
+
+function getSieveWorkers() {
+    if (sieveWorkers === null) {
+        sieveWorkers = [];
+        for (let i = 0; i < SIEVE_WORKER_COUNT; i++) {
+            const worker = new Worker("sieve_worker.js");
+            worker.onmessage = (event) => {
+                const {id, primes} = event.data;
+                sieveJobs.get(id).resolve(primes);
+                sieveJobs.delete(id);
+            };
+            worker.onerror = (event) => {
+                for (const [id, job] of sieveJobs) {
+                    job.reject(event);
+                    sieveJobs.delete(id);
+                }
+            };
+            sieveWorkers.push(worker);
+        }
+    }
+    return sieveWorkers;
+}
+
+// Teilt das Batch auf alle Worker auf und fügt die Teilergebnisse in Reihenfolge zusammen
+function findPrimesParallel(start, end) {
+    if (typeof Worker === "undefined") {
+        return Promise.resolve(findPrimes(start, end));
+    }
+
+    const workers = getSieveWorkers();
+    const chunkSize = Math.ceil((end - start + 1) / workers.length);
+    const parts = [];
+    for (let i = 0; i < workers.length; i++) {
+        const chunkStart = start + i * chunkSize;
+        if (chunkStart > end) break;
+        const chunkEnd = Math.min(chunkStart + chunkSize - 1, end);
+        const id = ++sieveJobId;
+        parts.push(new Promise((resolve, reject) => {
+            sieveJobs.set(id, {resolve, reject});
+            workers[i].postMessage({id, start: chunkStart, end: chunkEnd});
+        }));
+    }
+
+    return Promise.all(parts).then(results => {
+        const total = results.reduce((sum, part) => sum + part.length, 0);
+        const primes = new Float64Array(total);
+        let offset = 0;
+        for (const part of results) {
+            primes.set(part, offset);
+            offset += part.length;
+        }
+        return primes;
+    });
+}
+
 function findPrimes(start, end) {
     let primes = [];
     for (let num = start; num <= end; num++) {
@@ -101,28 +207,79 @@ function isPrime(n) {
     return true;
 }
 
-function submitPrimes(primes, callback) {
-    if (!Array.isArray(primes) || primes.length === 0) {
-        logMessage("Keine Primzahlen gefunden.");
-        updateStatus("Keine Primzahlen gefunden.");
+const PRIME_BATCH_MIMETYPE = "application/x-prime-batch";
+const PRIME_BATCH_HEADER_SIZE = 32;
+
+const CRC32_TABLE = (() => {
+    const table = new Uint32Array(256);
+    for (let i = 0; i < 256; i++) {
+        let c = i;
+        for (let k = 0; k < 8; k++) {
+            c = (c & 1) ? (0xEDB88320 ^ (c >>> 1)) : (c >>> 1);
+        }
+        table[i] = c >>> 0;
+    }
+    return table;
+})();
+
+function crc32(bytes) {
+    let crc = 0xFFFFFFFF;
+    for (let i = 0; i < bytes.length; i++) {
+        crc = CRC32_TABLE[(crc ^ bytes[i]) & 0xFF] ^ (crc >>> 8);
+    }
+    return (crc ^ 0xFFFFFFFF) >>> 0;
+}
+
+// Binärformat siehe prime_protocol.py: Header + Varint-kodierte Abstände
+function encodePrimeBatch(range, primes) {
+    const [start, end] = range;
+    const buffer = new Uint8Array(PRIME_BATCH_HEADER_SIZE + primes.length * 4);
+    let pos = PRIME_BATCH_HEADER_SIZE;
+    let prev = start;
+    for (const prime of primes) {
+        let gap = prime - prev;
+        prev = prime;
+        while (gap >= 0x80) {
+            buffer[pos++] = (gap & 0x7F) | 0x80;
+            gap >>>= 7;
+        }
+        buffer[pos++] = gap;
+    }
+
+    const payload = buffer.subarray(PRIME_BATCH_HEADER_SIZE, pos);
+    const header = new DataView(buffer.buffer);
+    buffer.set([0x50, 0x52, 0x4D, 0x42], 0);  // "PRMB"
+    header.setUint8(4, 1);                      // Version
+    header.setUint8(5, 1);                      // Kodierung: Varint
+    header.setBigUint64(8, BigInt(start), true);
+    header.setBigUint64(16, BigInt(end), true);
+    header.setUint32(24, primes.length, true);
+    header.setUint32(28, crc32(payload), true);
+    return buffer.subarray(0, pos);
+}
+
+function submitPrimes(primes, range, callback) {
+    if (!Array.isArray(primes) && !(primes instanceof Float64Array)) {
+        updateStatus("Ungültiges Ergebnis!");
         if (callback) callback();
         return;
     }
+    if (primes.length === 0) {
+        logMessage("Keine Primzahlen gefunden.");
+    }
 
     updateStatus("Primzahlen werden gesendet...");
     fetch("/submit_primes", {
         method: "POST",
         headers: {
-            "Content-Type": "application/json"
+            "Content-Type": PRIME_BATCH_MIMETYPE
         },
-        body: JSON.stringify(primes)
+        body: encodePrimeBatch(range, primes)
     })
         .then(response => response.json())
         .then(data => {
             logMessage("Server-Antwort: " + JSON.stringify(data));
             updateStatus("Berechnung abgeschlossen!");
-            updateUserPanel();
-            updateHighestPrime();
             if (callback) callback();
         })
         .catch(error => {
@@ -132,6 +289,37 @@ function submitPrimes(primes, callback) {
         });
 }
 
+function submitAndFetch(primes, range, count) {
+    requestedBatches += count;
+    updateStatus("Primzahlen werden gesendet...");
+    return fetch(`/submit_and_fetch?n=${count}`, {
+        method: "POST",
+        headers: {
+            "Content-Type": PRIME_BATCH_MIMETYPE
+        },
+        body: encodePrimeBatch(range, primes)
+    })
+        .then(response => response.json())
+        .then(data => {
+            const {batches, highest_prime_found, ...result} = data;
+            logMessage("Server-Antwort: " + JSON.stringify(result));
+            updateStatus("Batch abgegeben, Berechnung läuft weiter...");
+            if (batches) {
+                batchQueue.push(...batches);
+            }
+            if (highest_prime_found !== undefined) {
+                document.getElementById('highestPrime').textContent = highest_prime_found;
+            }
+        })
+        .catch(error => {
+            console.error("Fehler beim Senden der Primzahlen:", error);
+            updateStatus("Fehler beim Senden der Primzahlen!");
+        })
+        .finally(() => {
+            requestedBatches -= count;
+        });
+}
+
 function generateAndDownloadDiagrams() {
     updateStatus("Diagramme werden generiert...");
     fetch("/generate_diagrams")
@@ -204,6 +392,7 @@ function login() {
             if (data.status === 'success') {
                 hideModal();
                 updateUserPanel();
+                connectEvents();
             } else {
                 alert(data.error);
             }
@@ -237,6 +426,7 @@ function logout() {
         .then(() => {
             document.getElementById('userPanel').style.display = 'none';
             document.querySelector('.auth-buttons').style.display = 'flex';
+            connectEvents();
         });
 }
 
@@ -254,39 +444,80 @@ function toggleLeaderboard() {
 function updateLeaderboard() {
     fetch('/leaderboard')
         .then(response => response.json())
-        .then(data => {
-            const leaderboardList = document.getElementById('leaderboardList');
-            leaderboardList.innerHTML = data.map((user, index) => `
-                <li>
-                    ${user.username}
-                    <br>
-                    <small>Geprüfte Zahlen: ${user.numbers_processed.toLocaleString()} | 
-                    Gefundene Primzahlen: ${user.primes_found.toLocaleString()}</small>
-                </li>
-            `).join('');
-        });
+        .then(data => renderLeaderboard(data));
 }
 
-function updateHighestPrime() {
-    fetch('/get_stats')
-        .then(response => response.json())
-        .then(data => {
-            document.getElementById('highestPrime').textContent = data.highest_prime_found;
-        });
+function renderLeaderboard(data) {
+    const leaderboardList = document.getElementById('leaderboardList');
+    leaderboardList.innerHTML = data.map((user, index) => `
+        <li>
+            ${user.username}
+            <br>
+            <small>Geprüfte Zahlen: ${user.numbers_processed.toLocaleString()} | 
+            Gefundene Primzahlen: ${user.primes_found.toLocaleString()}</small>
+        </li>
+    `).join('');
 }
 
-setInterval(updateHighestPrime, 5000);
+// Live-Daten kommen per Server-Sent Events von /events; ohne EventSource oder wenn
+// der Stream abgelehnt wird, per Long-Poll (/events?since=<seq>)
+const EVENTS_RETRY_MS = 5000;
+let eventSource = null;
+let eventsGeneration = 0;
 
-updateHighestPrime();
+function applyLiveUpdate(data) {
+    if (data.stats) {
+        document.getElementById('highestPrime').textContent = data.stats.highest_prime_found;
+    }
+    if (data.leaderboard && leaderboardVisible) {
+        renderLeaderboard(data.leaderboard);
+    }
+    if (data.user) {
+        document.getElementById('userPrimes').textContent = data.user.total_primes_found;
+        document.getElementById('userNumbersProcessed').textContent = data.user.total_numbers_processed.toLocaleString();
+    }
+}
 
-setInterval(() => {
-    if (leaderboardVisible) {
-        updateLeaderboard();
+function connectEvents() {
+    const generation = ++eventsGeneration;
+    if (eventSource) {
+        eventSource.close();
+        eventSource = null;
     }
-}, 30000);
+    if (!window.EventSource) {
+        pollEvents(generation, null);
+        return;
+    }
+    eventSource = new EventSource('/events');
+    eventSource.addEventListener('update', event => applyLiveUpdate(JSON.parse(event.data)));
+    eventSource.onerror = () => {
+        // Bei Verbindungsabbrüchen verbindet sich EventSource selbst neu, nur bei Ablehnung nicht
+        if (eventSource && eventSource.readyState === EventSource.CLOSED) {
+            eventSource = null;
+            pollEvents(generation, null);
+        }
+    };
+}
+
+function pollEvents(generation, since) {
+    if (generation !== eventsGeneration) return;
+    fetch(since === null ? '/events?since=0' : `/events?since=${since}`)
+        .then(response => {
+            if (!response.ok) throw new Error(response.status);
+            return response.json();
+        })
+        .then(data => {
+            applyLiveUpdate(data);
+            pollEvents(generation, data.seq);
+        })
+        .catch(() => setTimeout(() => pollEvents(generation, since), EVENTS_RETRY_MS));
+}
+
+connectEvents();
 
 function updateBatchSize() {
-    const size = parseInt(document.getElementById('batchSizeSelect').value);
+    const value = document.getElementById('batchSizeSelect').value;
+    const size = value === 'auto' ? 'auto' : parseInt(value);
 
     fetch('/set_batch_size', {
         method: 'POST',
@@ -298,8 +529,13 @@ function updateBatchSize() {
         .then(response => response.json())
         .then(data => {
             if (data.status === 'success') {
-                updateStatus(`Batch-Größe auf ${size} Zahlen aktualisiert`);
-                document.getElementById('currentBatchSize').textContent = size;
+                if (size === 'auto') {
+                    updateStatus('Batch-Größe wird automatisch angepasst');
+                    document.getElementById('currentBatchSize').textContent = 'automatisch';
+                } else {
+                    updateStatus(`Batch-Größe auf ${size} Zahlen aktualisiert`);
+                    document.getElementById('currentBatchSize').textContent = size;
+                }
 
             } else {
                 alert('Fehler beim Aktualisieren der Batch-Größe');
@@ -307,25 +543,30 @@ function updateBatchSize() {
         });
 }
 
-async function loadAllDiagrams() {
-    const res = await fetch("/diagram_live_all");
-    const data = await res.json();
+const DIAGRAM_TYPES = [
+    "clients",
+    "batches",
+    "primes",
+    "numbers",
+    "processed_vs_primes",
+    "batches_vs_clients"
+];
+
+function loadAllDiagrams() {
     const container = document.getElementById("diagram-container");
     container.innerHTML = "";
 
-    if (data.error) {
-        container.innerText = "Fehler: " + data.error;
-        return;
-    }
-
-    for (const [key, base64] of Object.entries(data)) {
+    for (const key of DIAGRAM_TYPES) {
         const title = document.createElement("h3");
         title.innerText = key.replace(/_/g, " ");
         const img = document.createElement("img");
-        img.src = "data:image/png;base64," + base64;
+        img.src = `/diagram/${key}.png`;
         img.style.maxWidth = "100%";
         img.style.border = "1px solid #ccc";
         img.style.marginBottom = "20px";
+        img.onerror = () => {
+            container.innerText = "Fehler beim Laden der Diagramme";
+        };
         container.appendChild(title);
         container.appendChild(img);
     }
@@ -0,0 +1,69 @@
+// Segmentiertes Sieb des Eratosthenes für einen Teilbereich eines Batches.
+// Die Basis-Primzahlen bis sqrt(Ende) bleiben zwischen Aufträgen erhalten.
+
+const SEGMENT_ODDS = 1 << 18;
+
+let basePrimes = new Uint32Array(0);
+let baseLimit = 1;
+const segment = new Uint8Array(SEGMENT_ODDS);
+
+function ensureBasePrimes(limit) {
+    if (limit <= baseLimit) return;
+    limit = Math.max(limit, baseLimit * 2);
+    const composite = new Uint8Array(limit + 1);
+    const found = [];
+    for (let i = 2; i <= limit; i++) {
+        if (composite[i]) continue;
+        found.push(i);
+        for (let j = i * i; j <= limit; j += i) {
+            composite[j] = 1;
+        }
+    }
+    basePrimes = Uint32Array.from(found);
+    baseLimit = limit;
+}
+
+function sieveRange(lo, hi) {
+    const primes = [];
+    if (hi < 2 || lo > hi) return new Float64Array(0);
+    if (lo <= 2 && hi >= 2) primes.push(2);
+
+    let first = Math.max(lo, 3);
+    if (first % 2 === 0) first++;
+    ensureBasePrimes(Math.floor(Math.sqrt(hi)) + 1);
+
+    // Jedes Segment enthält nur ungerade Zahlen: Index i steht für segStart + 2 * i
+    for (let segStart = first; segStart <= hi; segStart += 2 * SEGMENT_ODDS) {
+        const segEnd = Math.min(segStart + 2 * (SEGMENT_ODDS - 1), hi);
+        const size = Math.floor((segEnd - segStart) / 2) + 1;
+        segment.fill(0, 0, size);
+
+        for (let k = 1; k < basePrimes.length; k++) {
+            const p = basePrimes[k];
+            if (p * p > segEnd) break;
+            let m = p * p;
+            if (m < segStart) {
+                const r = segStart % p;
+                m = r === 0 ? segStart : segStart + p - r;
+            }
+            if (m % 2 === 0) m += p;
+            for (let j = (m - segStart) / 2; j < size; j += p) {
+                segment[j] = 1;
+            }
+        }
+
+        for (let i = 0; i < size; i++) {
+            if (!segment[i]) {
+                const n = segStart + 2 * i;
+                if (n > 1) primes.push(n);
+            }
+        }
+    }
+    return Float64Array.from(primes);
+}
+
+self.onmessage = (event) => {
+    const {id, start, end} = event.data;
+    const primes = sieveRange(start, end);
+    self.postMessage({id, primes}, [primes.buffer]);
+};
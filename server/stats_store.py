@@ -0,0 +1,182 @@
+import json
+import os
+import threading
+import time
+
+# Zeitreihen-Speicher für das Statistik-Log: eine JSONL-Datei pro Auflösung,
+# nur Anhängen. Minutenwerte werden beim Abschluss einer Stunde bzw. eines
+# Tages zu einem Eintrag verdichtet (Zählerstände = letzter Wert, Clients = Maximum).
+
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+RESOLUTIONS = {
+    "minute": 16,   # Länge des Zeitstempel-Präfixes, das einen Bucket bestimmt
+    "hour": 13,
+    "day": 10
+}
+COUNTER_KEYS = ["total_primes_found", "total_batches_completed", "total_numbers_processed"]
+
+
+def parse_time(value):
+    if value is None or value == "":
+        return None
+    try:
+        return time.strftime(TIMESTAMP_FORMAT, time.localtime(float(value)))
+    except ValueError:
+        time.strptime(value, TIMESTAMP_FORMAT)
+        return value
+
+
+def seek_since(f, size, since):
+    # Binäre Suche über die sortierten Zeilen der Datei
+    lo, hi = 0, size
+    while lo < hi:
+        mid = (lo + hi) // 2
+        f.seek(mid)
+        if mid:
+            f.readline()
+        line = f.readline()
+        if not line or json.loads(line)["timestamp"] >= since:
+            hi = mid
+        else:
+            lo = mid + 1
+    f.seek(lo)
+    if lo:
+        f.readline()
+
+
+def read_entries(path, since=None, until=None, limit=None):
+    result = []
+    if not os.path.exists(path):
+        return result
+    size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        if since:
+            seek_since(f, size, since)
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            if since and entry["timestamp"] < since:
+                continue
+            if until and entry["timestamp"] > until:
+                break
+            result.append(entry)
+            if limit and len(result) >= limit:
+                break
+    return result
+
+
+class StatsStore:
+    # readonly: nur lesen, ein anderer Prozess schreibt (Betrieb mit mehreren Prozessen)
+    def __init__(self, directory, legacy_file=None, readonly=False):
+        self.directory = directory
+        self.readonly = readonly
+        self.lock = threading.Lock()
+        self.appended = 0
+        os.makedirs(directory, exist_ok=True)
+
+        self.files = {}
+        self.last = {}
+        self.open_bucket = {}
+        if readonly:
+            return
+        for resolution in RESOLUTIONS:
+            path = self.path(resolution)
+            self.last[resolution] = self._read_last(path)
+            self.files[resolution] = open(path, "a")
+
+        if legacy_file and os.path.exists(legacy_file) and self.last["minute"] is None:
+            with open(legacy_file, "r") as f:
+                for entry in json.load(f):
+                    self.append(entry)
+
+        # Offene Stunden-/Tages-Buckets aus den letzten Minutenwerten wiederherstellen
+        last_minute = self.last["minute"]
+        if last_minute:
+            for resolution in ("hour", "day"):
+                prefix = last_minute["timestamp"][:RESOLUTIONS[resolution]]
+                done = self.last[resolution]
+                if self.open_bucket.get(resolution) or (done and done["timestamp"][:RESOLUTIONS[resolution]] == prefix):
+                    continue
+                for entry in self.query(since=prefix, resolution="minute"):
+                    self._merge(resolution, entry)
+
+    @property
+    def version(self):
+        if self.readonly:
+            path = self.path("minute")
+            return os.path.getsize(path) if os.path.exists(path) else 0
+        return self.appended
+
+    def path(self, resolution):
+        return os.path.join(self.directory, f"{resolution}.jsonl")
+
+    def _read_last(self, path):
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            return None
+        with open(path, "rb") as f:
+            f.seek(max(0, os.path.getsize(path) - 4096))
+            lines = f.read().splitlines()
+        for line in reversed(lines):
+            try:
+                return json.loads(line)
+            except ValueError:
+                continue
+        return None
+
+    def _write(self, resolution, entry):
+        f = self.files[resolution]
+        f.write(json.dumps(entry) + "\n")
+        f.flush()
+        self.last[resolution] = entry
+
+    def _merge(self, resolution, entry):
+        bucket = self.open_bucket.get(resolution)
+        if bucket is None:
+            self.open_bucket[resolution] = dict(entry)
+            return
+        for key in COUNTER_KEYS:
+            bucket[key] = entry[key]
+        bucket["active_clients"] = max(bucket["active_clients"], entry["active_clients"])
+
+    def _roll_up(self, entry):
+        for resolution in ("hour", "day"):
+            width = RESOLUTIONS[resolution]
+            bucket = self.open_bucket.get(resolution)
+            if bucket and bucket["timestamp"][:width] != entry["timestamp"][:width]:
+                self._write(resolution, bucket)
+                self.open_bucket[resolution] = None
+            self._merge(resolution, entry)
+
+    def append(self, entry):
+        with self.lock:
+            last = self.last["minute"]
+            if last and last["timestamp"][:16] >= entry["timestamp"][:16]:
+                return False
+            self._write("minute", entry)
+            self._roll_up(entry)
+            self.appended += 1
+            return True
+
+    def query(self, since=None, until=None, resolution="minute", limit=None):
+        if resolution not in RESOLUTIONS:
+            raise ValueError(f"Unbekannte Auflösung: {resolution}")
+        with self.lock:
+            if resolution in self.files:
+                self.files[resolution].flush()
+            bucket = self.open_bucket.get(resolution)
+            bucket = dict(bucket) if bucket else None
+        result = read_entries(self.path(resolution), since, until, limit)
+
+        # Noch nicht abgeschlossenen Bucket mitliefern
+        if bucket and (not limit or len(result) < limit):
+            if (not since or bucket["timestamp"] >= since) and (not until or bucket["timestamp"] <= until):
+                if not result or result[-1]["timestamp"] < bucket["timestamp"]:
+                    result.append(bucket)
+        return result
+
+    def close(self):
+        with self.lock:
+            for f in self.files.values():
+                f.close()
@@ -0,0 +1,134 @@
+import atexit
+import hashlib
+import math
+import multiprocessing
+import random
+import signal
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+# Stichprobenartige Prüfung abgegebener Batches: ein Teil der Batches wird in
+# einem Prozess-Pool mit einem vektorisierten segmentierten Sieb neu berechnet
+# und über Anzahl und Hash der Primzahlen mit der Abgabe verglichen.
+
+VERIFY_FRACTION = 0.05
+VERIFY_WORKERS = 2
+MAX_PENDING = 64     # mehr offene Prüfungen werden nicht angenommen, statt die Abgabe aufzuhalten
+SEGMENT_ODDS = 1 << 20
+
+
+def batch_digest(primes):
+    return hashlib.blake2b(np.asarray(primes, dtype="<u8").tobytes(), digest_size=16).hexdigest()
+
+
+def small_primes(limit):
+    sieve = np.ones(limit + 1, dtype=bool)
+    sieve[:2] = False
+    for p in range(2, math.isqrt(limit) + 1):
+        if sieve[p]:
+            sieve[p * p::p] = False
+    return np.flatnonzero(sieve)
+
+
+def sieve_range(start, end):
+    # Segmentiertes Sieb nur über die ungeraden Zahlen, Index i = first + 2*i
+    first = max(start, 3) | 1
+    parts = [np.array([2], dtype=np.int64)] if start <= 2 <= end else []
+    if end >= first:
+        odd_primes = small_primes(math.isqrt(end) + 1)[1:]
+        size = (end - first) // 2 + 1
+        for lo in range(0, size, SEGMENT_ODDS):
+            hi = min(lo + SEGMENT_ODDS, size)
+            seg_start = first + 2 * lo
+            segment = np.ones(hi - lo, dtype=bool)
+            limit = math.isqrt(first + 2 * (hi - 1))
+            for p in odd_primes[:np.searchsorted(odd_primes, limit, side="right")].tolist():
+                m = max(p * p, (seg_start + p - 1) // p * p)
+                if m % 2 == 0:
+                    m += p
+                segment[(m - seg_start) // 2::p] = False
+            parts.append(np.flatnonzero(segment).astype(np.int64) * 2 + seg_start)
+    return np.concatenate(parts) if parts else np.zeros(0, dtype=np.int64)
+
+
+def init_worker():
+    # Geforkte Pool-Prozesse erben die Signal-Handler des Servers; beenden soll nur der Server selbst
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+
+
+def verify_batch(start, end, count, digest):
+    primes = sieve_range(start, end)
+    return len(primes) == count and batch_digest(primes) == digest, len(primes)
+
+
+class Verifier:
+    def __init__(self, on_result, fraction=VERIFY_FRACTION, workers=VERIFY_WORKERS, max_pending=MAX_PENDING):
+        self.on_result = on_result
+        self.fraction = fraction
+        self.max_pending = max_pending
+        # fork statt spawn/forkserver, sonst würde server.py in jedem Pool-Prozess erneut ausgeführt.
+        # Mit fork startet der Pool beim ersten Auftrag alle Prozesse auf einmal; das geschieht hier,
+        # solange noch kein anderer Thread läuft, dessen gehaltene Sperren die Kinder erben könnten.
+        # Der Server legt den Verifier deshalb vor allen Hintergrund-Threads an.
+        self.pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("fork"),
+                                        initializer=init_worker)
+        if threading.active_count() > 1:
+            print("Warnung: Prüf-Prozesse werden neben laufenden Threads geforkt")
+        self.pool.submit(int).result()
+        # Auch ohne Signal-Handler (normales Ende, Fehler beim Start) keine Pool-Prozesse zurücklassen
+        atexit.register(self.close)
+        self.lock = threading.Lock()
+        self.pending = 0
+        self.sampled = 0
+        self.skipped = 0
+        self.verified = 0
+        self.rejected = 0
+
+    def maybe_submit(self, record, primes, user_id):
+        if random.random() >= self.fraction:
+            return False
+        with self.lock:
+            if self.pending >= self.max_pending:
+                self.skipped += 1
+                return False
+            self.pending += 1
+            self.sampled += 1
+        count, digest = len(primes), batch_digest(primes)
+        future = self.pool.submit(verify_batch, record["start"], record["end"], count, digest)
+        future.add_done_callback(lambda f: self._done(f, record, count, user_id))
+        return True
+
+    def _done(self, future, record, count, user_id):
+        try:
+            ok, expected = future.result()
+        except Exception as e:
+            print(f"Fehler bei der Prüfung von {record['start']} bis {record['end']}: {str(e)}")
+            with self.lock:
+                self.pending -= 1
+            return
+        with self.lock:
+            self.pending -= 1
+            if ok:
+                self.verified += 1
+            else:
+                self.rejected += 1
+        if not ok:
+            print(f"Batch {record['start']} bis {record['end']} abgelehnt: {count} statt {expected} Primzahlen oder falscher Hash")
+        self.on_result(record, user_id, ok, count, expected)
+
+    def metrics(self):
+        with self.lock:
+            return {
+                "fraction": self.fraction,
+                "sampled": self.sampled,
+                "skipped": self.skipped,
+                "pending": self.pending,
+                "verified": self.verified,
+                "rejected": self.rejected
+            }
+
+    def close(self):
+        self.pool.shutdown(wait=False, cancel_futures=True)
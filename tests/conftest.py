@@ -0,0 +1,24 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# Die Server-Module liegen flach in server/; database.py legt users.db beim Import im
+# aktuellen Verzeichnis an, deshalb laufen die Tests in einem eigenen Verzeichnis
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "server"))
+os.chdir(tempfile.mkdtemp(prefix="prime-tests-"))
+
+
+def primes_between(lo, hi):
+    sieve = bytearray([1]) * (hi + 1)
+    sieve[:2] = b"\x00\x00"
+    for p in range(2, int(hi ** 0.5) + 1):
+        if sieve[p]:
+            sieve[p * p::p] = bytearray(len(range(p * p, hi + 1, p)))
+    return [p for p in range(max(lo, 2), hi + 1) if sieve[p]]
+
+
+@pytest.fixture
+def primes():
+    return primes_between
@@ -0,0 +1,25 @@
+import time
+
+from clients import DistinctClients
+
+
+def test_registers_replayed_after_the_snapshot_restore_the_count():
+    now = time.time()
+    ips = [f"10.0.{i // 256}.{i % 256}" for i in range(3000)]
+    live = DistinctClients()
+    for ip in ips[:1000]:
+        live.add(ip, now)
+    snapshot = live.to_dict()
+
+    # Nach dem Snapshot nur noch im Journal: die Register-Positionen statt der IPs
+    journal = []
+    for ip in ips[1000:]:
+        journal.append(list(live.position(ip)))
+        live.add(ip, now)
+
+    recovered = DistinctClients.from_dict(snapshot)
+    assert recovered.count() < live.count()
+    for index, rank in journal:
+        recovered.update(index, rank, now)
+    assert recovered.to_dict() == live.to_dict()
+    assert abs(recovered.count() - 3000) < 3000 * 0.05
@@ -0,0 +1,71 @@
+import ingest
+from batch_scheduler import BatchScheduler, IntervalSet
+from coordinator import SharedCoordinator
+from ingest import IngestPipeline
+
+
+def test_interval_set_remove_splits_intervals():
+    intervals = IntervalSet([(0, 99)])
+    assert intervals.remove(40, 59)
+    assert intervals.to_list() == [[0, 39], [60, 99]]
+    assert not intervals.remove(30, 49)
+    assert intervals.remove(0, 39)
+    assert intervals.to_list() == [[60, 99]]
+
+
+def test_failed_append_releases_the_range(monkeypatch):
+    monkeypatch.setattr(ingest, "RETRY_DELAY", 0)
+    scheduler = BatchScheduler()
+    first = scheduler.acquire(100)
+    second = scheduler.acquire(100)
+    scheduler.complete(*first)
+    scheduler.complete(*second)
+    stored = []
+
+    def write(jobs):
+        # Der Speicher lehnt das erste Batch jedes Mal ab
+        failed = [job for job in jobs if job == first]
+        stored.extend(job for job in jobs if job != first)
+        return failed
+
+    pipeline = IngestPipeline(write, lambda job: scheduler.reopen(*job))
+    pipeline.reserve()
+    pipeline.put(first)
+    pipeline.reserve()
+    pipeline.put(second)
+    assert pipeline.wait_processed(2, timeout=5)
+
+    assert stored == [second]
+    assert pipeline.metrics()["failed"] == 1
+    assert pipeline.metrics()["retried"] == ingest.MAX_ATTEMPTS - 1
+    assert not scheduler.is_completed(*first)
+    assert scheduler.is_completed(*second)
+    # Der freigegebene Bereich wird vor neuen Zahlen vergeben
+    assert scheduler.acquire(100) == first
+    assert scheduler.acquire(100) == (200, 299)
+
+
+def test_coordinator_reopen(tmp_path):
+    coordinator = SharedCoordinator(str(tmp_path / "coordinator.db"))
+    scheduler = BatchScheduler()
+    coordinator.import_state(scheduler, {"total_primes_found": 0, "highest_prime_found": 0, "total_batches_completed": 0,
+                                         "total_numbers_processed": 0, "last_update": None})
+    start, end = coordinator.acquire(100, "10.0.0.1")
+    record = {"start": start, "end": end, "primes": 25, "numbers": 100, "highest": 97, "time": "now"}
+    assert coordinator.complete(record, "10.0.0.1")[0] == "completed"
+
+    assert coordinator.reopen(record)
+    assert not coordinator.reopen(record)
+    assert not coordinator.is_completed(start, end)
+    current = coordinator.stats(20)
+    assert (current["total_primes_found"], current["total_numbers_processed"], current["total_batches_completed"]) == (0, 0, 0)
+    assert coordinator.acquire(100, "10.0.0.2") == (start, end)
+
+
+def test_reopen_of_a_replayed_lease_reissues_it():
+    # Nach einem Neustart fehlt der Abschluss im Journal, die Lease ist noch offen
+    scheduler = BatchScheduler()
+    first = scheduler.acquire(100)
+    scheduler.acquire(100)
+    assert not scheduler.reopen(*first)
+    assert scheduler.acquire(100) == first
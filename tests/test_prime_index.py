@@ -0,0 +1,40 @@
+import random
+
+import pytest
+
+import prime_index
+from prime_index import PrimeIndex, RangeNotCovered
+from prime_store import PrimeStoreAppender, iter_primes
+
+
+@pytest.fixture
+def index(tmp_path, monkeypatch, primes):
+    monkeypatch.setattr(prime_index, "REFRESH_INTERVAL", 0)
+    store = PrimeStoreAppender(str(tmp_path))
+    # Batches in zufälliger Reihenfolge, wie sie von verschiedenen Clients zurückkommen
+    ranges = [(lo, lo + 9999) for lo in range(0, 200000, 10000)]
+    random.Random(7).shuffle(ranges)
+    for lo, hi in ranges:
+        store.append(lo, hi, primes(lo, hi))
+    yield PrimeIndex(store)
+    store.close()
+
+
+def test_queries_match_a_full_sieve(index, primes):
+    expected = primes(0, 199999)
+    assert index.pi(199999) == len(expected)
+    for x in [0, 1, 2, 9999, 10000, 104729, 150001]:
+        assert index.pi(x) == sum(1 for p in expected if p <= x)
+    for k in [1, 2, 1000, 10000, len(expected)]:
+        assert index.nth_prime(k) == expected[k - 1]
+    assert index.is_prime(104729) and not index.is_prime(104730)
+    assert sum(index.iter_primes(19990, 20030), []) == [p for p in expected if 19990 <= p <= 20030]
+    assert index.primes_between(19990, 20030).tolist() == [p for p in expected if 19990 <= p <= 20030]
+    assert list(iter_primes(index.store.directory, 19990, 20030)) == [p for p in expected if 19990 <= p <= 20030]
+
+
+def test_queries_outside_the_computed_range(index):
+    with pytest.raises(RangeNotCovered):
+        index.is_prime(200000)
+    with pytest.raises(RangeNotCovered):
+        index.nth_prime(10 ** 6)
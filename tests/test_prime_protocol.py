@@ -0,0 +1,58 @@
+import zlib
+
+import numpy as np
+import pytest
+
+import prime_protocol
+from prime_store import decode_varints, encode_varints
+
+
+def python_varints(values):
+    out = bytearray()
+    for value in values:
+        while value >= 0x80:
+            out.append((value & 0x7F) | 0x80)
+            value >>= 7
+        out.append(value)
+    return bytes(out)
+
+
+def test_varints_match_the_stored_format():
+    values = [0, 1, 127, 128, 300, 16383, 16384, 2 ** 35 + 7, 2 ** 63 - 1, 2, 5]
+    payload = encode_varints(values)
+    assert payload == python_varints(values)
+    assert decode_varints(payload).tolist() == values
+    # Ein abgeschnittener letzter Wert wird ignoriert
+    assert decode_varints(payload + b"\x81").tolist() == values
+
+
+def test_varint_submission_with_wide_gaps(primes):
+    start, end = 10 ** 6, 10 ** 6 + 200000
+    expected = primes(start, end)
+    # Abstände ab 128 Byte brauchen zwei Bytes
+    expected = [start + 1] + expected[::20]
+    body = prime_protocol.encode_submission(start, end, expected)
+    batch_range, decoded = prime_protocol.decode_submission(body)
+    assert batch_range == (start, end)
+    assert isinstance(decoded, np.ndarray)
+    assert decoded.tolist() == expected
+
+
+def submission(start, end, gaps):
+    payload = encode_varints(gaps)
+    header = prime_protocol.HEADER.pack(prime_protocol.MAGIC, prime_protocol.VERSION, prime_protocol.ENCODING_VARINT,
+                                        start, end, len(gaps), zlib.crc32(payload))
+    return header + payload
+
+
+def test_overflowing_gaps_are_rejected():
+    with pytest.raises(prime_protocol.ProtocolError):
+        prime_protocol.decode_submission(submission(0, 2 ** 63 - 1, [2 ** 62, 2 ** 62, 2 ** 62, 5]))
+
+
+def test_unfinished_varint_is_rejected():
+    payload = b"\x05\x81"
+    header = prime_protocol.HEADER.pack(prime_protocol.MAGIC, prime_protocol.VERSION, prime_protocol.ENCODING_VARINT,
+                                        0, 100, 1, zlib.crc32(payload))
+    with pytest.raises(prime_protocol.ProtocolError):
+        prime_protocol.decode_submission(header + payload)
@@ -0,0 +1,75 @@
+import random
+
+import database
+import prime_summary
+from prime_summary import PrimeSummary, summarize
+
+
+def clear_summaries():
+    with database.db_connection("test") as conn, conn:
+        conn.execute("DELETE FROM batch_summary")
+
+
+def insert(primes, *ranges):
+    database.insert_batch_summaries([summarize(lo, hi, primes(lo, hi)) for lo, hi in ranges])
+
+
+def test_batches_completed_out_of_order_are_loaded(monkeypatch, primes):
+    monkeypatch.setattr(prime_summary, "REFRESH_INTERVAL", 0)
+    clear_summaries()
+    summary = PrimeSummary(database.load_batch_summaries)
+
+    insert(primes, (1000, 1999), (3000, 3999))
+    assert summary.query(0, 3999)["prime_count"] == len(primes(1000, 1999)) + len(primes(3000, 3999))
+
+    # Später abgeschlossene Batches mit kleinerem Anfang, darunter der Batch ab 0
+    insert(primes, (2000, 2999), (0, 999))
+    result = summary.query(0, 3999)
+    assert result["batches"] == 4
+    assert result["complete"]
+    assert result["prime_count"] == len(primes(0, 3999)) == 550
+    assert result["first_prime"] == 2
+    assert len(summary) == 4
+
+
+def test_duplicate_batches_are_ignored(monkeypatch, primes):
+    monkeypatch.setattr(prime_summary, "REFRESH_INTERVAL", 0)
+    clear_summaries()
+    summary = PrimeSummary(database.load_batch_summaries)
+    insert(primes, (0, 999), (0, 999))
+    assert len(summary.load_rows(0)) == 1
+    assert summary.query(0, 999)["prime_count"] == 168
+
+
+def expected(primes, runs, lo, hi):
+    # Referenz: Primzahlen je lückenlosem Abschnitt, Lücken nur innerhalb eines Abschnitts
+    found, twins, gap = [], 0, (0, None)
+    for start, end in runs:
+        part = primes(max(start, lo), min(end, hi)) if start <= hi and end >= lo else []
+        for a, b in zip(part, part[1:]):
+            twins += b - a == 2
+            gap = max(gap, (b - a, a), key=lambda g: g[0])
+        found.extend(part)
+    return {"prime_count": len(found), "twin_pairs": twins, "max_gap": gap[0], "max_gap_after": gap[1],
+            "first_prime": found[0] if found else None, "last_prime": found[-1] if found else None}
+
+
+def test_partial_batches_are_read_from_the_store(monkeypatch, primes):
+    monkeypatch.setattr(prime_summary, "REFRESH_INTERVAL", 0)
+    clear_summaries()
+    # Lücke von 3000 bis 3999, dahinter ein eigener Abschnitt
+    insert(primes, (2000, 2999), (0, 999), (4000, 4999), (1000, 1999))
+    summary = PrimeSummary(database.load_batch_summaries, primes)
+    runs = [(0, 2999), (4000, 4999)]
+
+    rng = random.Random(1)
+    bounds = [(0, 4999), (500, 520), (990, 1010), (1500, 1502), (1998, 2005), (2500, 4200), (3100, 3900), (3999, 4000)]
+    bounds += [tuple(sorted(rng.sample(range(5000), 2))) for _ in range(200)]
+    for lo, hi in bounds:
+        result = summary.query(lo, hi)
+        assert {key: result[key] for key in expected(primes, runs, lo, hi)} == expected(primes, runs, lo, hi), (lo, hi)
+
+    # Parts schmaler als ein Batch, wie bei /analytics/intervals
+    parts = [summary.query(lo, lo + 99) for lo in range(0, 1000, 100)]
+    assert [part["prime_count"] for part in parts] == [25, 21, 16, 16, 17, 14, 16, 14, 15, 14]
+    assert all(part["partial_batches"] == 1 and part["complete"] for part in parts)
@@ -0,0 +1,219 @@
+import argparse
+import http.cookiejar
+import json
+import math
+import os
+import struct
+import sys
+import time
+import urllib.error
+import urllib.request
+import zlib
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+
+# Kommandozeilen-Client: holt Batches über /get_batch, siebt sie in einem
+# Prozess-Pool (ein Sieb pro Kern) und schickt das Ergebnis im Binärformat
+# aus server/prime_protocol.py (Kodierung 0 = Bitmap der ungeraden Zahlen) zurück.
+
+MIMETYPE = "application/x-prime-batch"
+MAGIC = b"PRMB"
+VERSION = 1
+ENCODING_BITMAP = 0
+HEADER = struct.Struct("<4sBBxxQQII")
+
+SEGMENT_ODDS = 1 << 20
+PREFETCH = 1
+MAX_BATCHES_PER_REQUEST = 8  # wie in server.py
+RETRY_DELAY = 5  # in Sek
+REQUEST_TIMEOUT = 60  # in Sek
+
+base_primes = np.zeros(0, dtype=np.int64)
+base_limit = 1
+
+
+def small_primes(limit):
+    sieve = np.ones(limit + 1, dtype=bool)
+    sieve[:2] = False
+    for p in range(2, math.isqrt(limit) + 1):
+        if sieve[p]:
+            sieve[p * p::p] = False
+    return np.flatnonzero(sieve)
+
+
+def ensure_base_primes(limit):
+    global base_primes, base_limit
+    if limit > base_limit:
+        base_limit = max(limit, base_limit * 2)
+        base_primes = small_primes(base_limit)
+
+
+def sieve_odds(start, end):
+    # Ergebnis: bool-Array, Index i steht für first_odd + 2*i (first_odd = start | 1)
+    first = start | 1
+    if end < first:
+        return np.zeros(0, dtype=bool)
+    size = (end - first) // 2 + 1
+    ensure_base_primes(math.isqrt(end) + 1)
+    odd_primes = base_primes[1:]
+
+    result = np.empty(size, dtype=bool)
+    for lo in range(0, size, SEGMENT_ODDS):
+        hi = min(lo + SEGMENT_ODDS, size)
+        seg_start = first + 2 * lo
+        seg_end = first + 2 * (hi - 1)
+        segment = result[lo:hi]
+        segment[:] = True
+        for p in odd_primes[:np.searchsorted(odd_primes, math.isqrt(seg_end), side="right")].tolist():
+            m = max(p * p, (seg_start + p - 1) // p * p)
+            if m % 2 == 0:
+                m += p
+            segment[(m - seg_start) // 2::p] = False
+    if first == 1:
+        result[0] = False
+    return result
+
+
+def sieve_batch(start, end):
+    started = time.perf_counter()
+    odds = sieve_odds(start, end)
+    count = int(np.count_nonzero(odds)) + (1 if start <= 2 <= end else 0)
+    payload = np.packbits(odds, bitorder="little").tobytes()
+    return start, end, count, payload, time.perf_counter() - started
+
+
+def encode_bitmap(start, end, count, payload):
+    return HEADER.pack(MAGIC, VERSION, ENCODING_BITMAP, start, end, count, zlib.crc32(payload)) + payload
+
+
+class Client:
+    def __init__(self, server):
+        self.server = server.rstrip("/")
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+
+    def request(self, path, data=None, content_type="application/json"):
+        while True:
+            req = urllib.request.Request(self.server + path, data=data)
+            if data is not None:
+                req.add_header("Content-Type", content_type)
+            try:
+                with self.opener.open(req, timeout=REQUEST_TIMEOUT) as response:
+                    return json.load(response)
+            except urllib.error.HTTPError as e:
+                if e.code != 503:
+                    raise
+                delay = int(e.headers.get("Retry-After") or RETRY_DELAY)
+                print(f"Server ausgelastet, neuer Versuch in {delay} Sek")
+            except (urllib.error.URLError, OSError) as e:
+                delay = RETRY_DELAY
+                print(f"Server nicht erreichbar ({e}), neuer Versuch in {delay} Sek")
+            time.sleep(delay)
+
+    def post_json(self, path, payload):
+        return self.request(path, json.dumps(payload).encode())
+
+    def login(self, username, password):
+        try:
+            self.post_json("/login", {"username": username, "password": password})
+        except urllib.error.HTTPError as e:
+            if e.code == 401:
+                return False
+            raise
+        return True
+
+    def get_batches(self, count):
+        return [batch["range"] for batch in self.request(f"/get_batches?n={count}")["batches"]]
+
+    def submit_and_fetch(self, start, end, count, payload, fetch):
+        # Abgabe und bis zu fetch neue Batches in einer Anfrage
+        try:
+            result = self.request(f"/submit_and_fetch?n={fetch}", encode_bitmap(start, end, count, payload), MIMETYPE)
+        except urllib.error.HTTPError as e:
+            # Bereich inzwischen neu vergeben (Lease abgelaufen): verwerfen und weitermachen
+            if e.code != 409:
+                raise
+            return "abgelehnt", self.get_batches(fetch) if fetch else []
+        return result.get("status"), [batch["range"] for batch in result.get("batches", [])]
+
+
+def run(client, processes, prefetch, max_batches=None):
+    fetched = 0
+    total_numbers = 0
+    started = time.perf_counter()
+    target = processes + prefetch
+    queue = deque()
+
+    def wanted(in_flight):
+        count = target - in_flight - len(queue)
+        if max_batches is not None:
+            count = min(count, max_batches - fetched)
+        return max(0, min(count, MAX_BATCHES_PER_REQUEST))
+
+    with ProcessPoolExecutor(processes) as pool:
+        pending = set()
+        while True:
+            # Pro Kern ein laufendes Batch plus Vorrat, damit kein Kern auf neue Batches warten muss
+            while len(pending) < target:
+                if not queue:
+                    count = wanted(len(pending))
+                    if not count:
+                        break
+                    batches = client.get_batches(count)
+                    fetched += len(batches)
+                    queue.extend(batches)
+                start, end = queue.popleft()
+                pending.add(pool.submit(sieve_batch, start, end))
+            if not pending:
+                break
+
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                start, end, count, payload, elapsed = future.result()
+                status, batches = client.submit_and_fetch(start, end, count, payload, wanted(len(pending)))
+                fetched += len(batches)
+                queue.extend(batches)
+                numbers = end - start + 1
+                total_numbers += numbers
+                rate = numbers / max(elapsed, 0.001)
+                overall = total_numbers / max(time.perf_counter() - started, 0.001)
+                print(f"{start} bis {end}: {count} Primzahlen in {elapsed:.2f} Sek "
+                      f"({rate:,.0f} Zahlen/s, gesamt {overall:,.0f} Zahlen/s) [{status}]")
+    return total_numbers
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Primzahl-Worker für die Kommandozeile")
+    parser.add_argument("--server", default="http://localhost:5000")
+    parser.add_argument("--username")
+    parser.add_argument("--password", default=os.environ.get("PRIME_WORKER_PASSWORD"))
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--prefetch", type=int, default=PREFETCH)
+    parser.add_argument("--batch-size", help="feste Batch-Größe oder 'auto'")
+    parser.add_argument("--batches", type=int, help="nach dieser Anzahl Batches beenden")
+    args = parser.parse_args()
+
+    client = Client(args.server)
+    if args.username:
+        if not client.login(args.username, args.password or ""):
+            print("Ungültige Anmeldedaten")
+            return 1
+        print(f"Angemeldet als {args.username}")
+    if args.batch_size:
+        size = args.batch_size if args.batch_size == "auto" else int(args.batch_size)
+        try:
+            client.post_json("/set_batch_size", {"size": size})
+        except urllib.error.HTTPError:
+            print("Ungültige Batch-Größe")
+            return 1
+
+    try:
+        run(client, args.processes, args.prefetch, args.batches)
+    except KeyboardInterrupt:
+        print("Worker beendet")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())